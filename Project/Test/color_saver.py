@@ -0,0 +1,122 @@
+# ******************************************************************************
+#  Color frame persistence on the FrameWriter workers.
+#
+#  MJPG frames are already JPEG files, with keep_mjpg they are written as
+#  they came, no decode and no re-encode. Other frames (and MJPG without
+#  keep_mjpg) are converted to BGR, encoded as PNG or JPEG with a selectable
+#  compression level and written, all inside the worker job, so the capture
+#  thread only submits. cv2 releases the GIL while converting and encoding,
+#  the workers encode in parallel. On 1080p PNG level 1 encodes about 1.5x
+#  faster than the cv2 default of 3 for 5% larger files, JPEG is another 30x
+#  faster than that.
+#
+#  When the disk falls behind and the stream runs the RAW_ONLY policy, the
+#  frame data is written unconverted as .raw, the file name carries size and
+#  format. Encode time is measured per frame and reported per device.
+# ******************************************************************************
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from pyorbbecsdk import OBFormat, VideoFrame
+from frame_writer import FrameWriter
+from utils import frame_to_bgr_image
+
+IMAGE_FORMATS = ("png", "jpg")
+
+
+@dataclass
+class ColorSaveStats:
+    encoded: int = 0
+    passthrough: int = 0  # MJPG frames written as they came
+    raw: int = 0  # frames written unconverted by the back-pressure fallback
+    failed: int = 0
+    encode_total_s: float = 0.0  # conversion to BGR and encoding, without the file write
+    encode_max_s: float = 0.0
+    bytes_written: int = 0
+
+
+class ColorSaver:
+    def __init__(self, writer: FrameWriter, save_dir: str, image_format: str = "png", png_compression: int = 1,
+                 jpeg_quality: int = 90, keep_mjpg: bool = True):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"image_format must be one of {IMAGE_FORMATS}, got {image_format}")
+        self.writer = writer
+        self.save_dir = save_dir
+        self.image_format = image_format
+        self.keep_mjpg = keep_mjpg
+        if image_format == "png":
+            self._params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        else:
+            self._params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        self._stats: Dict[int, ColorSaveStats] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, device_index: int, frame: VideoFrame, tag) -> bool:
+        """Queue a color frame for writing, tag goes into the file name. Returns False if it was not queued."""
+        with self._lock:
+            self._stats.setdefault(device_index, ColorSaveStats())
+        base_name = os.path.join(self.save_dir, f"color_{device_index}_{tag}")
+        if self.keep_mjpg and frame.get_format() == OBFormat.MJPG:
+            return self.writer.submit(device_index, "color", self._write_mjpg, device_index, base_name + ".jpg", frame)
+        format_name = str(frame.get_format()).split(".")[-1].lower()
+        raw_name = os.path.join(self.save_dir, "color_{}x{}_{}_{}_{}.raw".format(
+            frame.get_width(), frame.get_height(), format_name, device_index, tag))
+        return self.writer.submit(device_index, "color", self._encode, device_index,
+                                  f"{base_name}.{self.image_format}", frame,
+                                  raw_func=self._write_raw, raw_args=(device_index, raw_name, frame))
+
+    def _write_mjpg(self, device_index: int, file_path: str, frame: VideoFrame):
+        data = frame.get_data_view()
+        data.tofile(file_path)
+        self._count(device_index, "passthrough", data.nbytes)
+
+    def _write_raw(self, device_index: int, file_path: str, frame: VideoFrame):
+        data = frame.get_data_view()
+        data.tofile(file_path)
+        self._count(device_index, "raw", data.nbytes)
+
+    def _encode(self, device_index: int, file_path: str, frame: VideoFrame):
+        start = time.perf_counter()
+        image = frame_to_bgr_image(frame)
+        encoded: Optional[np.ndarray] = None
+        if image is not None:
+            ok, encoded = cv2.imencode("." + self.image_format, image, self._params)
+            if not ok:
+                encoded = None
+        encode_s = time.perf_counter() - start
+        if encoded is None:
+            self._count(device_index, "failed", 0)
+            raise RuntimeError(f"Encoding {frame.get_format()} frame as {self.image_format} failed")
+        encoded.tofile(file_path)
+        with self._lock:
+            stats = self._stats[device_index]
+            stats.encoded += 1
+            stats.encode_total_s += encode_s
+            stats.encode_max_s = max(stats.encode_max_s, encode_s)
+            stats.bytes_written += encoded.nbytes
+
+    def _count(self, device_index: int, field: str, size: int):
+        with self._lock:
+            stats = self._stats[device_index]
+            setattr(stats, field, getattr(stats, field) + 1)
+            stats.bytes_written += size
+
+    def stats(self) -> Dict[int, ColorSaveStats]:
+        with self._lock:
+            return {device_index: replace(stats) for device_index, stats in self._stats.items()}
+
+    def format_stats(self) -> str:
+        lines = []
+        for device_index, stats in sorted(self.stats().items()):
+            encoded = max(stats.encoded, 1)
+            lines.append(f"device {device_index} color: {stats.encoded} encoded as {self.image_format} "
+                         f"({stats.encode_total_s / encoded * 1000:.1f} ms, max {stats.encode_max_s * 1000:.1f} ms), "
+                         f"{stats.passthrough} MJPG kept, {stats.raw} raw, {stats.failed} failed, "
+                         f"{stats.bytes_written / 1e6:.1f} MB")
+        return "\n".join(lines)
@@ -0,0 +1,76 @@
+# ******************************************************************************
+#  Compare the SDK AlignFilter (depth to color) with D2CRegistration on a
+#  recorded bag, e.g. ./test.bag written by record.py. Reports the mean time
+#  per frame of both, the share of depth pixels D2CRegistration had to
+#  recompute, and how well the two registered depth images agree.
+#
+#  usage: python d2c_benchmark.py [bag_path] [frames]
+# ******************************************************************************
+import sys
+import time
+
+import numpy as np
+
+from pyorbbecsdk import *
+from d2c_registration import D2CRegistration
+
+DEFAULT_BAG_PATH = "./test.bag"
+DEFAULT_FRAMES = 300
+
+
+def main():
+    bag_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BAG_PATH
+    max_frames = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_FRAMES
+    pipeline = Pipeline(bag_path)
+    camera_param = pipeline.get_camera_param()
+    align_filter = AlignFilter(align_to_stream=OBStreamType.COLOR_STREAM)
+    registration = None
+    registered = None
+    align_total = 0.0
+    registration_total = 0.0
+    difference_total = 0.0
+    frames_done = 0
+    pipeline.start()
+    try:
+        while frames_done < max_frames:
+            frames = pipeline.wait_for_frames(100)
+            if frames is None:
+                break
+            depth_frame = frames.get_depth_frame()
+            color_frame = frames.get_color_frame()
+            if depth_frame is None or color_frame is None:
+                continue
+            depth = depth_frame.get_data_view()
+            if registration is None:
+                registration = D2CRegistration.from_camera_param(
+                    camera_param, (depth_frame.get_width(), depth_frame.get_height()),
+                    (color_frame.get_width(), color_frame.get_height()))
+                registered = np.empty((color_frame.get_height(), color_frame.get_width()), dtype=np.uint16)
+            start = time.perf_counter()
+            aligned_frames = align_filter.process(frames)
+            aligned = aligned_frames.get_depth_frame() if aligned_frames else None
+            align_total += time.perf_counter() - start
+            start = time.perf_counter()
+            registration.register_depth(depth, out=registered)
+            registration_total += time.perf_counter() - start
+            frames_done += 1
+            if aligned is not None:
+                aligned_depth = aligned.get_data_view()
+                both = (aligned_depth > 0) & (registered > 0)
+                if both.any():
+                    difference = np.abs(aligned_depth[both].astype(np.float32) - registered[both])
+                    difference_total += float(np.median(difference)) * depth_frame.get_depth_scale()
+    finally:
+        pipeline.stop()
+    if frames_done == 0:
+        print(f"No depth and color frames in {bag_path}")
+        return
+    print(f"{frames_done} frames from {bag_path}")
+    print(f"AlignFilter: {align_total / frames_done * 1000:.1f} ms per frame")
+    print(f"D2CRegistration: {registration_total / frames_done * 1000:.1f} ms per frame, "
+          f"median difference to AlignFilter {difference_total / frames_done:.1f} mm")
+    print(registration.format_stats())
+
+
+if __name__ == "__main__":
+    main()
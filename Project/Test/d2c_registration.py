@@ -0,0 +1,179 @@
+# ******************************************************************************
+#  Software depth-to-color registration with a reusable pixel mapping.
+#
+#  Femto Mega only aligns depth to color in software (OBAlignMode.SW_MODE)
+#  and the SDK Align filter gives no visibility into what that costs. Here
+#  the depth rays are undistorted and rotated into the color camera once,
+#  mapping a depth pixel with depth z to color is then
+#
+#      (X, Y, Z) = z * (R @ ray) + t,  (u, v) = K_color(distort(X / Z, Y / Z))
+#
+#  evaluated for the whole image at once. The mapping of the previous frame
+#  is kept and only pixels whose depth moved far enough to shift their color
+#  pixel by more than reuse_tolerance_px are recomputed, a static scene costs
+#  a comparison per pixel. The mapping colors depth points for fused clouds
+#  (color_points) or renders depth into the color image (register_depth),
+#  the latter is what the SDK Align filter produces.
+# ******************************************************************************
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ray_cache import default_ray_cache, distortion_tuple, intrinsics_tuple
+
+MAX_DEPTH_VALUE = 65535
+
+
+@dataclass
+class RegistrationStats:
+    frames: int = 0
+    full_updates: int = 0
+    recomputed_pixels: int = 0
+    total_pixels: int = 0
+    map_total_s: float = 0.0
+
+
+def distort_normalized(x: np.ndarray, y: np.ndarray, distortion) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply Brown-Conrady distortion, OpenCV coefficient order, to normalized image coordinates."""
+    k1, k2, p1, p2, k3, k4, k5, k6 = distortion
+    r2 = x * x + y * y
+    radial = (1 + r2 * (k1 + r2 * (k2 + r2 * k3))) / (1 + r2 * (k4 + r2 * (k5 + r2 * k6)))
+    xy = x * y
+    xd = x * radial + 2 * p1 * xy + p2 * (r2 + 2 * x * x)
+    yd = y * radial + p1 * (r2 + 2 * y * y) + 2 * p2 * xy
+    return xd, yd
+
+
+class D2CRegistration:
+    def __init__(self, depth_intrinsic, color_intrinsic, rotation, translation,
+                 depth_size: Optional[Tuple[int, int]] = None, color_size: Optional[Tuple[int, int]] = None,
+                 depth_distortion=None, color_distortion=None, reuse_tolerance_px: float = 0.25,
+                 max_changed_fraction: float = 0.5):
+        """rotation and translation (mm) map depth camera coordinates to color camera coordinates,
+        depth_size and color_size are (width, height) of the streams when they differ from the intrinsics."""
+        self.depth_intrinsics = intrinsics_tuple(depth_intrinsic, *(depth_size or (None, None)))
+        self.color_intrinsics = intrinsics_tuple(color_intrinsic, *(color_size or (None, None)))
+        self.color_distortion = distortion_tuple(color_distortion)
+        self.depth_distortion = distortion_tuple(depth_distortion)
+        self.max_changed_fraction = max_changed_fraction
+        rotation = np.asarray(rotation, dtype=np.float32).reshape(3, 3)
+        self.translation = np.asarray(translation, dtype=np.float32).reshape(3)
+        self._unit_rays = default_ray_cache.get(self.depth_intrinsics, self.depth_distortion).reshape(-1, 2)
+        self._rays = self._unit_rays @ rotation[:, :2].T + rotation[:, 2]
+        fx, fy = self.color_intrinsics[0], self.color_intrinsics[1]
+        baseline = float(np.linalg.norm(self.translation))
+        # moving a pixel from depth z1 to z2 shifts it by at most f * |t| * |1/z1 - 1/z2| in the color image
+        self._inverse_tolerance = reuse_tolerance_px / (max(fx, fy) * baseline) if baseline > 0 else np.inf
+        width, height = self.depth_intrinsics[4], self.depth_intrinsics[5]
+        self._map = np.full((height * width, 2), np.nan, dtype=np.float32)
+        self._inverse = np.zeros(height * width, dtype=np.float32)
+        self._stats = RegistrationStats()
+
+    @classmethod
+    def from_camera_param(cls, camera_param, depth_size: Optional[Tuple[int, int]] = None,
+                          color_size: Optional[Tuple[int, int]] = None, **kwargs) -> "D2CRegistration":
+        return cls(camera_param.depth_intrinsic, camera_param.rgb_intrinsic, camera_param.transform.rot,
+                   camera_param.transform.transform, depth_size, color_size, camera_param.depth_distortion,
+                   camera_param.rgb_distortion, **kwargs)
+
+    def _check_depth(self, depth: np.ndarray):
+        shape = (self.depth_intrinsics[5], self.depth_intrinsics[4])
+        if depth.dtype != np.uint16 or depth.shape != shape:
+            raise ValueError(f"Expected a {shape} uint16 depth image, got {depth.dtype} {depth.shape}")
+
+    def _compute(self, index: np.ndarray, z: np.ndarray):
+        points = np.take(self._rays, index, axis=0)
+        points *= z[:, None]
+        points += self.translation
+        x = points[:, 0] / points[:, 2]
+        y = points[:, 1] / points[:, 2]
+        if any(self.color_distortion):
+            x, y = distort_normalized(x, y, self.color_distortion)
+        fx, fy, cx, cy = self.color_intrinsics[:4]
+        mapped = np.empty((len(index), 2), dtype=np.float32)
+        mapped[:, 0] = x * fx + cx
+        mapped[:, 1] = y * fy + cy
+        self._map[index] = mapped
+
+    def map(self, depth: np.ndarray, depth_scale: float = 1.0) -> np.ndarray:
+        """(H, W, 2) float32 color pixel (u, v) of every depth pixel, NaN where depth is 0.
+
+        The array is reused by the next call, copy it to keep it.
+        """
+        self._check_depth(depth)
+        start = time.perf_counter()
+        flat = depth.reshape(-1)
+        inverse = np.zeros(flat.shape, dtype=np.float32)
+        np.divide(np.float32(1.0 / depth_scale), flat, out=inverse, where=flat != 0)
+        moved = np.abs(inverse - self._inverse) > self._inverse_tolerance
+        # a pixel that became invalid or valid always counts as changed
+        moved |= (inverse == 0) != (self._inverse == 0)
+        changed = np.flatnonzero(moved)
+        stats = self._stats
+        stats.frames += 1
+        stats.total_pixels += len(flat)
+        if len(changed) > self.max_changed_fraction * len(flat):
+            changed = np.arange(len(flat))
+            stats.full_updates += 1
+        if len(changed):
+            valid = changed[inverse[changed] != 0]
+            self._map[changed[inverse[changed] == 0]] = np.nan
+            self._compute(valid, 1.0 / inverse[valid])
+            self._inverse[changed] = inverse[changed]
+        stats.recomputed_pixels += len(changed)
+        stats.map_total_s += time.perf_counter() - start
+        return self._map.reshape(depth.shape + (2,))
+
+    def color_points(self, depth: np.ndarray, color_image: np.ndarray, depth_scale: float = 1.0) -> np.ndarray:
+        """(N, 6) float32 x/y/z/r/g/b depth camera points of the pixels that land inside the BGR color image."""
+        if color_image.shape[:2] != (self.color_intrinsics[5], self.color_intrinsics[4]):
+            raise ValueError(f"Expected a {self.color_intrinsics[4]}x{self.color_intrinsics[5]} color image, "
+                             f"got {color_image.shape}")
+        mapped = self.map(depth, depth_scale).reshape(-1, 2)
+        index, u, v = self._inside(mapped)
+        points = np.empty((len(index), 6), dtype=np.float32)
+        points[:, 2] = depth.reshape(-1)[index] * np.float32(depth_scale)
+        points[:, :2] = self._unit_rays[index] * points[:, 2:3]
+        points[:, 3:] = color_image[v, u, ::-1]
+        return points
+
+    def register_depth(self, depth: np.ndarray, depth_scale: float = 1.0,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Depth rendered into the color image, (color height, color width) uint16 in the input units.
+
+        Where several depth pixels hit one color pixel the nearest wins, color pixels nothing maps to are 0.
+        """
+        shape = (self.color_intrinsics[5], self.color_intrinsics[4])
+        if out is None:
+            out = np.empty(shape, dtype=np.uint16)
+        elif out.shape != shape or out.dtype != np.uint16:
+            raise ValueError(f"out must be a {shape} uint16 array, got {out.dtype} {out.shape}")
+        mapped = self.map(depth, depth_scale).reshape(-1, 2)
+        index, u, v = self._inside(mapped)
+        out.fill(MAX_DEPTH_VALUE)
+        # z-buffer, the nearest depth pixel of every color pixel wins
+        np.minimum.at(out.reshape(-1), v * shape[1] + u, depth.reshape(-1)[index])
+        out[out == MAX_DEPTH_VALUE] = 0
+        return out
+
+    def _inside(self, mapped: np.ndarray):
+        u = np.rint(mapped[:, 0])
+        v = np.rint(mapped[:, 1])
+        width, height = self.color_intrinsics[4], self.color_intrinsics[5]
+        # NaN compares False, so unmapped pixels are dropped here as well
+        index = np.flatnonzero((u >= 0) & (u < width) & (v >= 0) & (v < height))
+        return index, u[index].astype(np.intp), v[index].astype(np.intp)
+
+    def stats(self) -> RegistrationStats:
+        stats = self._stats
+        return RegistrationStats(stats.frames, stats.full_updates, stats.recomputed_pixels, stats.total_pixels,
+                                 stats.map_total_s)
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        frames = max(stats.frames, 1)
+        recomputed = stats.recomputed_pixels / max(stats.total_pixels, 1) * 100
+        return (f"d2c: {stats.frames} frames, {stats.full_updates} full updates, {recomputed:.1f}% pixels "
+                f"recomputed, map {stats.map_total_s / frames * 1000:.1f} ms")
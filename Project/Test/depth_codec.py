@@ -0,0 +1,123 @@
+# ******************************************************************************
+#  Lossless uint16 depth codec for the depth dump path.
+#
+#  Femto Mega depth is mostly smooth surfaces inside a ring of invalid (0)
+#  pixels. The codec stores the valid mask as packed bits and only the valid
+#  pixels as values, each predicted by the previous valid pixel in raster
+#  order. The prediction residuals are zigzag mapped (small magnitudes become
+#  small unsigned numbers) and split into a low byte and a high byte plane
+#  before zlib. The high plane is almost all zeros and the low plane has
+#  few long matches, so zlib runs with Z_RLE, which is both faster and
+#  smaller than the default strategy here. zlib and the numpy passes release
+#  the GIL, several FrameWriter workers encode frames in parallel.
+#
+#  A .obdz file is one encoded frame:
+#
+#    header  b"OBDZ", version, codec, width, height, depth_scale,
+#            valid pixel count, compressed mask size
+#    mask    zlib of the packed valid mask (CODEC_DELTA_ZLIB only)
+#    values  zlib of the shuffled residuals, or the raw uint16 image for
+#            CODEC_RAW
+#
+#  Depth is stored in device units as delivered, depth * depth_scale is mm,
+#  so saving never converts or copies the frame.
+# ******************************************************************************
+import struct
+import zlib
+from typing import Tuple
+
+import numpy as np
+
+DEPTH_MAGIC = b"OBDZ"
+DEPTH_CODEC_VERSION = 1
+CODEC_RAW = 0
+CODEC_DELTA_ZLIB = 1
+DEFAULT_LEVEL = 1  # zlib level, with Z_RLE higher levels gain next to nothing
+DEPTH_HEADER = struct.Struct("<4sBBxxHHfII")  # magic, version, codec, width, height, scale, valid, mask size
+
+
+def _check_depth(depth: np.ndarray):
+    if depth.dtype != np.uint16 or depth.ndim != 2:
+        raise ValueError(f"Expected a (H, W) uint16 depth image, got {depth.dtype} {depth.shape}")
+
+
+def _compress(data, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, zlib.Z_RLE)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _raw_header(depth: np.ndarray, depth_scale: float) -> bytes:
+    height, width = depth.shape
+    return DEPTH_HEADER.pack(DEPTH_MAGIC, DEPTH_CODEC_VERSION, CODEC_RAW, width, height, depth_scale, depth.size, 0)
+
+
+def encode_depth(depth: np.ndarray, depth_scale: float = 1.0, level: int = DEFAULT_LEVEL) -> bytes:
+    """Encode a (H, W) uint16 depth image, level 0 stores it uncompressed.
+
+    depth_scale is stored as is, depth * depth_scale is mm like VideoFrame.get_depth_scale().
+    """
+    _check_depth(depth)
+    height, width = depth.shape
+    if level == 0:
+        return _raw_header(depth, depth_scale) + np.ascontiguousarray(depth).tobytes()
+    flat = depth.reshape(-1)
+    valid = np.flatnonzero(flat)
+    values = np.take(flat, valid)
+    # residual to the previous valid pixel, wrapping uint16 arithmetic keeps it lossless
+    residuals = np.empty_like(values)
+    if len(values):
+        residuals[0] = values[0]
+        np.subtract(values[1:], values[:-1], out=residuals[1:])
+    signed = residuals.view(np.int16)
+    zigzag = ((signed << 1) ^ (signed >> 15)).view(np.uint16)
+    planes = zigzag.view(np.uint8).reshape(-1, 2).T  # row 0 low bytes, row 1 high bytes
+    mask = _compress(np.packbits(flat != 0), level)
+    header = DEPTH_HEADER.pack(DEPTH_MAGIC, DEPTH_CODEC_VERSION, CODEC_DELTA_ZLIB, width, height, depth_scale,
+                               len(values), len(mask))
+    return b"".join((header, mask, _compress(np.ascontiguousarray(planes), level)))
+
+
+def decode_depth(data) -> Tuple[np.ndarray, float]:
+    """(H, W) uint16 depth image and depth_scale of an encoded frame."""
+    data = memoryview(data)
+    if len(data) < DEPTH_HEADER.size:
+        raise ValueError("Truncated depth frame")
+    magic, version, codec, width, height, depth_scale, count, mask_size = DEPTH_HEADER.unpack_from(data)
+    if magic != DEPTH_MAGIC or version != DEPTH_CODEC_VERSION:
+        raise ValueError(f"Not a version {DEPTH_CODEC_VERSION} depth frame")
+    payload = data[DEPTH_HEADER.size:]
+    if codec == CODEC_RAW:
+        if len(payload) != width * height * 2:
+            raise ValueError(f"Raw depth frame holds {len(payload)} bytes, expected {width * height * 2}")
+        return np.frombuffer(payload, dtype=np.uint16).reshape(height, width).copy(), depth_scale
+    if codec != CODEC_DELTA_ZLIB:
+        raise ValueError(f"Unknown depth codec {codec}")
+    mask = np.unpackbits(np.frombuffer(zlib.decompress(payload[:mask_size]), dtype=np.uint8),
+                         count=width * height)
+    planes = np.frombuffer(zlib.decompress(payload[mask_size:]), dtype=np.uint8)
+    if len(planes) != count * 2:
+        raise ValueError(f"Depth frame holds {len(planes) // 2} values, expected {count}")
+    zigzag = np.empty(count, dtype=np.uint16)
+    zigzag.view(np.uint8).reshape(-1, 2).T[...] = planes.reshape(2, -1)
+    residuals = (zigzag >> 1) ^ (np.uint16(0) - (zigzag & 1))
+    depth = np.zeros(width * height, dtype=np.uint16)
+    depth[np.flatnonzero(mask)] = np.cumsum(residuals, dtype=np.uint16)
+    return depth.reshape(height, width), depth_scale
+
+
+def write_depth(file_path: str, depth: np.ndarray, depth_scale: float = 1.0, level: int = DEFAULT_LEVEL):
+    """Write one frame, depth may be the read-only VideoFrame.get_data_view() of the frame."""
+    if level == 0:
+        # straight from the frame buffer, no encoded copy
+        _check_depth(depth)
+        with open(file_path, "wb") as f:
+            f.write(_raw_header(depth, depth_scale))
+            f.write(np.ascontiguousarray(depth).data)
+        return
+    with open(file_path, "wb") as f:
+        f.write(encode_depth(depth, depth_scale, level))
+
+
+def read_depth(file_path: str) -> Tuple[np.ndarray, float]:
+    with open(file_path, "rb") as f:
+        return decode_depth(f.read())
@@ -0,0 +1,123 @@
+# ******************************************************************************
+#  Compression ratio and throughput of depth_codec against plain zlib and
+#  16-bit PNG on recorded depth: the .raw dumps of
+#  four_net_devices_sync_save_data.py (depth_images/) or the depth frames of
+#  a .bag, synthetic Femto Mega depth when nothing is given. Encoding is
+#  also timed with WORKERS threads, the way FrameWriter runs it.
+#
+#  usage: python depth_codec_benchmark.py [depth_images_dir | file.raw | file.bag ...]
+# ******************************************************************************
+import glob
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import cv2
+import numpy as np
+
+from depth_codec import decode_depth, encode_depth
+
+DEPTH_WIDTH = 640
+DEPTH_HEIGHT = 576
+MAX_FRAMES = 120
+WORKERS = 4
+RAW_NAME = re.compile(r"depth_(\d+)x(\d+)_")
+
+
+def load_raw(file_path: str) -> np.ndarray:
+    match = RAW_NAME.search(os.path.basename(file_path))
+    if match is None:
+        raise ValueError(f"{file_path}: no depth_<width>x<height>_ in the file name")
+    width, height = int(match.group(1)), int(match.group(2))
+    return np.fromfile(file_path, dtype=np.uint16).reshape(height, width)
+
+
+def load_bag(file_path: str) -> List[np.ndarray]:
+    from pyorbbecsdk import OBMediaType, PlaybackReader
+    # playback runs at the recorded frame rate, MAX_FRAMES depth frames take MAX_FRAMES / fps seconds
+    reader = PlaybackReader(file_path, OBMediaType.DEPTH_STREAM)
+    frames = []
+    for frame_set in reader:
+        depth_frame = frame_set.get_depth_frame()
+        if depth_frame is not None:
+            frames.append(np.array(depth_frame.get_data_view()))
+        if len(frames) >= MAX_FRAMES:
+            break
+    reader.close()
+    return frames
+
+
+def make_synthetic(count: int) -> List[np.ndarray]:
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:DEPTH_HEIGHT, 0:DEPTH_WIDTH].astype(np.float32)
+    outside = np.hypot(x - DEPTH_WIDTH / 2, y - DEPTH_HEIGHT / 2) > 330  # wide FOV circular mask
+    frames = []
+    for k in range(count):
+        depth = 1500 + 400 * np.sin(x / 90 + k * 0.05) + 300 * np.cos(y / 70) + 0.8 * x
+        depth[200:380, 250:400] = 900 + 0.3 * y[200:380, 250:400]
+        depth += rng.normal(0, 1.5, depth.shape)
+        depth = depth.astype(np.uint16)
+        depth[outside | (rng.random(depth.shape) < 0.03)] = 0
+        frames.append(depth)
+    return frames
+
+
+def load_frames(paths: List[str]) -> List[np.ndarray]:
+    frames = []
+    for path in paths:
+        if os.path.isdir(path):
+            frames.extend(load_raw(file_path) for file_path in sorted(glob.glob(os.path.join(path, "depth_*.raw"))))
+        elif path.endswith(".bag"):
+            frames.extend(load_bag(path))
+        else:
+            frames.append(load_raw(path))
+    return frames[:MAX_FRAMES]
+
+
+def report(name: str, frames: List[np.ndarray], encode, decode=None):
+    raw_bytes = sum(depth.nbytes for depth in frames)
+    start = time.perf_counter()
+    encoded = [encode(depth) for depth in frames]
+    encode_s = time.perf_counter() - start
+    line = (f"{name:<24} ratio {raw_bytes / sum(len(data) for data in encoded):5.2f}  "
+            f"encode {raw_bytes / encode_s / 1e6:7.1f} MB/s")
+    if decode is not None:
+        start = time.perf_counter()
+        for depth, data in zip(frames, encoded):
+            if not np.array_equal(decode(data), depth):
+                raise RuntimeError(f"{name} is not lossless")
+        line += f"  decode {raw_bytes / (time.perf_counter() - start) / 1e6:7.1f} MB/s"
+    print(line)
+
+
+def report_threaded(frames: List[np.ndarray]):
+    raw_bytes = sum(depth.nbytes for depth in frames)
+    with ThreadPoolExecutor(WORKERS) as executor:
+        start = time.perf_counter()
+        list(executor.map(encode_depth, frames))
+        encode_s = time.perf_counter() - start
+    print(f"{'depth_codec ' + str(WORKERS) + ' threads':<24} encode {raw_bytes / encode_s / 1e6:7.1f} MB/s")
+
+
+def main():
+    frames = load_frames(sys.argv[1:]) if len(sys.argv) > 1 else make_synthetic(30)
+    if not frames:
+        print("No depth frames found")
+        return
+    height, width = frames[0].shape
+    print(f"{len(frames)} depth frames {width}x{height}, "
+          f"{np.mean([np.count_nonzero(depth) / depth.size for depth in frames]) * 100:.0f}% valid pixels, "
+          f"{os.cpu_count()} CPUs")
+    report("zlib level 1", frames, lambda depth: zlib.compress(depth, 1))
+    report("png level 1", frames, lambda depth: cv2.imencode(".png", depth, [cv2.IMWRITE_PNG_COMPRESSION, 1])[1],
+           lambda data: cv2.imdecode(data, cv2.IMREAD_UNCHANGED))
+    report("depth_codec", frames, encode_depth, lambda data: decode_depth(data)[0])
+    report_threaded(frames)
+
+
+if __name__ == "__main__":
+    main()
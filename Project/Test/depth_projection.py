@@ -0,0 +1,100 @@
+# ******************************************************************************
+#  Depth image to world coordinates without PointCloudFilter.
+#
+#  A pinhole camera maps pixel (u, v) with depth z to z * (x, y, 1), where
+#  (x, y) is the undistorted ray of the pixel. The rays only depend on the
+#  intrinsics and the resolution and come from ray_cache, DepthProjector
+#  additionally rotates them by the camera extrinsic, after which a frame is
+#  projected straight into the world frame with one multiply-add over the
+#  valid pixels:
+#
+#      world = z * (R @ (x, y, 1)) + t
+#
+#  stride > 1 projects every stride-th pixel in both directions, for low
+#  latency previews. Depth is uint16 in device units, depth_scale converts it
+#  to mm like VideoFrame.get_depth_scale().
+# ******************************************************************************
+from typing import Optional
+
+import numpy as np
+
+from ray_cache import Intrinsics, default_ray_cache, intrinsics_tuple
+
+
+def _check_depth(depth: np.ndarray, intrinsics: Intrinsics):
+    if depth.dtype != np.uint16 or depth.shape != (intrinsics[5], intrinsics[4]):
+        raise ValueError(f"Expected a ({intrinsics[5]}, {intrinsics[4]}) uint16 depth image, "
+                         f"got {depth.dtype} {depth.shape}")
+
+
+def _valid_pixels(depth: np.ndarray, stride: int):
+    """Flat indices of the non-zero pixels of every stride-th row and column, and their depth."""
+    # flat indices + np.take gather about 2.5x faster than boolean mask indexing
+    if stride == 1:
+        valid = np.flatnonzero(depth)
+        return valid, np.take(depth.reshape(-1), valid)
+    sampled = depth[::stride, ::stride]
+    valid = np.flatnonzero(sampled)
+    return valid, np.take(sampled.reshape(-1), valid)
+
+
+def depth_to_points(depth: np.ndarray, intrinsic, depth_scale: float = 1.0, stride: int = 1, distortion=None,
+                    serial_number: str = "") -> np.ndarray:
+    """(N, 3) float32 camera space points of the non-zero pixels of a (H, W) uint16 depth image."""
+    if depth.dtype != np.uint16 or depth.ndim != 2:
+        raise ValueError(f"Expected a (H, W) uint16 depth image, got {depth.dtype} {depth.shape}")
+    height, width = depth.shape
+    rays = default_ray_cache.get(intrinsic, distortion, width, height, serial_number)
+    valid, z = _valid_pixels(depth, stride)
+    if stride > 1:
+        # back to indices of the full resolution table, no strided copy of it
+        columns = -(-width // stride)
+        valid = (valid // columns) * (stride * width) + (valid % columns) * stride
+    points = np.empty((len(valid), 3), dtype=np.float32)
+    np.multiply(z, np.float32(depth_scale), out=points[:, 2])
+    np.multiply(np.take(rays.reshape(-1, 2), valid, axis=0), points[:, 2:], out=points[:, :2])
+    return points
+
+
+class DepthProjector:
+    """Projects one camera's depth images into the world frame, keeps the rays rotated by its extrinsic."""
+
+    def __init__(self, intrinsic, extrinsic: Optional[np.ndarray] = None, width: Optional[int] = None,
+                 height: Optional[int] = None, stride: int = 1, distortion=None, serial_number: str = ""):
+        if stride < 1:
+            raise ValueError("stride must be positive")
+        self.intrinsics = intrinsics_tuple(intrinsic, width, height)
+        self.stride = stride
+        self._unit_rays = default_ray_cache.get(self.intrinsics, distortion, serial_number=serial_number)
+        self.set_extrinsic(np.eye(4) if extrinsic is None else extrinsic)
+
+    @classmethod
+    def from_camera_param(cls, camera_param, extrinsic: Optional[np.ndarray] = None, width: Optional[int] = None,
+                          height: Optional[int] = None, stride: int = 1, serial_number: str = "") -> "DepthProjector":
+        return cls(camera_param.depth_intrinsic, extrinsic, width, height, stride, camera_param.depth_distortion,
+                   serial_number)
+
+    def set_extrinsic(self, extrinsic: np.ndarray):
+        """Camera-to-world 4x4 matrix, e.g. after ICP refinement."""
+        extrinsic = np.asarray(extrinsic, dtype=np.float32)
+        if extrinsic.shape != (4, 4):
+            raise ValueError(f"Expected a 4x4 extrinsic, got shape {extrinsic.shape}")
+        self.extrinsic = extrinsic
+        rays = self._unit_rays[::self.stride, ::self.stride]
+        rotation = extrinsic[:3, :3]
+        # R @ (x, y, 1) for every sampled pixel, contiguous so frames can gather from it
+        self._rays = (rays @ rotation[:, :2].T + rotation[:, 2]).reshape(-1, 3)
+        self._translation = extrinsic[:3, 3].copy() if extrinsic[:3, 3].any() else None
+
+    def project(self, depth: np.ndarray, depth_scale: float = 1.0) -> np.ndarray:
+        """(N, 3) float32 world points of the non-zero pixels of a (H, W) uint16 depth image."""
+        _check_depth(depth, self.intrinsics)
+        valid, z = _valid_pixels(depth, self.stride)
+        points = np.take(self._rays, valid, axis=0)
+        points *= z.astype(np.float32)[:, None] * np.float32(depth_scale)
+        if self._translation is not None:
+            points += self._translation
+        return points
+
+    def project_frame(self, depth_frame) -> np.ndarray:
+        return self.project(depth_frame.get_data_view(), depth_frame.get_depth_scale())
@@ -15,24 +15,63 @@
 # ******************************************************************************
 import json
 import os
-from queue import Queue
-from typing import List
+from collections import deque
+from typing import Deque, List, Optional
 import time
-import cv2
-import numpy as np
 
 from pyorbbecsdk import *
-from utils import frame_to_bgr_image
+from utils import ColorConverter, colorize_depth_frame
+from frame_matcher import FrameBundle, FrameMatcher, trigger_delays_from_config
+from ring_buffer import RingBuffer
+from preview_compositor import PreviewCompositor
+from mjpg_decoder import MjpgDecodePool
+from frame_writer import BackPressurePolicy
+from take_recording import TakeRecorder
+from extrinsics_store import ExtrinsicsStore
+from live_fusion import LiveFusionStage, frame_set_points
 
 MAX_DEVICES = 8
 curr_device_cnt = 8
 
 MAX_QUEUE_SIZE = 5
+# max hardware timestamp difference within one trigger, after trigger_to_image_delay_us
+SYNC_TOLERANCE_US = 2000
 ESC_KEY = 27
+# all devices share one window, color on top of depth for every device
+PREVIEW_TILE_WIDTH = 480
+PREVIEW_TILE_HEIGHT = 270
+PREVIEW_COLUMNS = 4
+PREVIEW_MAX_FPS = 15
+# fixed depth range of the preview color map, in mm
+PREVIEW_MIN_DEPTH = 200
+PREVIEW_MAX_DEPTH = 5000
+# MJPG color is decoded at 1/4 scale, 1920x1080 lands exactly on a 480x270 tile
+PREVIEW_DECODE_REDUCE = 4
+DECODE_WORKERS = 4
+STATS_INTERVAL_S = 5.0
+# record depth and color of every trigger into one indexed .obmc file per take
+RECORD_TAKE = False
+RECORD_DIR = os.path.join(os.getcwd(), "takes")
+RECORD_MAX_PENDING = 16  # triggers waiting for the recorder thread before the oldest is dropped
+# fuse the point clouds of every trigger into one world frame cloud while capturing
+LIVE_FUSION = False
+FUSION_CAMERA_POINTS = 50000  # point budget of every camera, reduced on a voxel grid
+FUSION_VOXEL_SIZE = 5.0  # mm, merges the overlap of neighbouring cameras in the fused cloud, 0 keeps every point
+FUSION_MAX_LATENCY_S = 0.1  # triggers the fusion worker gets to later than this are dropped
+FUSION_WITH_COLOR = False  # (N, 6) colored points, needs a color format PointCloudFilter can convert
 
-color_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
-depth_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
+# FrameSets handed over from the SDK callback thread of each device
+frames_rings: List[RingBuffer] = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(MAX_DEVICES)]
+# FrameBundles holding one FrameSet per device for the same trigger
+pending_bundles: Deque[FrameBundle] = deque(maxlen=MAX_QUEUE_SIZE)
+# matched bundles pushed out of pending_bundles before the render loop took them
+dropped_bundles = 0
+frame_matcher: Optional[FrameMatcher] = None
 has_color_sensor: List[bool] = [False for _ in range(MAX_DEVICES)]
+# one converter per color stream, reusing its output buffer
+color_converters: List[Optional[ColorConverter]] = [None for _ in range(MAX_DEVICES)]
+take_recorder: Optional[TakeRecorder] = None
+fusion_stage: Optional[LiveFusionStage] = None
 stop_rendering = False
 multi_device_sync_config = {}
 # config_file_path current file path
@@ -40,6 +79,10 @@ config_file_path = os.path.join(
     os.path.abspath(os.path.dirname(__file__)),
     "../config/multi_device_sync_config.json",
 )
+extrinsics_file_path = os.path.join(
+    os.path.abspath(os.path.dirname(__file__)),
+    "../config/multi_device_extrinsics.json",
+)
 
 
 def sync_mode_from_str(sync_mode_str: str) -> OBMultiDeviceSyncMode:
@@ -64,86 +107,103 @@ def sync_mode_from_str(sync_mode_str: str) -> OBMultiDeviceSyncMode:
 
 
 def on_new_frame_callback(frames: FrameSet, index: int):
-    global color_frames_queue, depth_frames_queue
-    global MAX_QUEUE_SIZE
+    global frames_rings
     assert index < MAX_DEVICES
-    color_frame = frames.get_color_frame()
-    depth_frame = frames.get_depth_frame()
-    if color_frame is not None:
-        if color_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            color_frames_queue[index].get()
-        color_frames_queue[index].put(color_frame)
-    if depth_frame is not None:
-        if depth_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            depth_frames_queue[index].get()
-        depth_frames_queue[index].put(depth_frame)
+    frames_rings[index].push(frames)
+
+
+def collect_bundles():
+    global frames_rings, pending_bundles, dropped_bundles
+    for i in range(curr_device_cnt):
+        frames = frames_rings[i].pop()
+        while frames is not None:
+            frame = frames.get_depth_frame() or frames.get_color_frame()
+            if frame is not None:
+                for bundle in frame_matcher.push(i, frame.get_timestamp_us(), frames):
+                    if len(pending_bundles) == pending_bundles.maxlen:
+                        dropped_bundles += 1
+                    pending_bundles.append(bundle)
+            frames = frames_rings[i].pop()
 
 
 
 def rendering_frames():
-    global color_frames_queue, depth_frames_queue
+    global pending_bundles
     global curr_device_cnt
     global stop_rendering
-    
-    while not stop_rendering:
-        #start_time = time.time()
-        for i in range(curr_device_cnt):
-            
-            color_frame = None
-            depth_frame = None
-            if not color_frames_queue[i].empty():
-                color_frame = color_frames_queue[i].get()
-            if not depth_frames_queue[i].empty():
-                depth_frame = depth_frames_queue[i].get()
-            if color_frame is None and depth_frame is None:
-                continue
-            color_image = None
-            depth_image = None
-            color_width, color_height = 0, 0
-            if color_frame is not None:
-                # start_time = time.time()
-                color_width, color_height = (
-                    color_frame.get_width(),
-                    color_frame.get_height(),
-                )
-                color_image = frame_to_bgr_image(color_frame)
-            if depth_frame is not None:
-                width = depth_frame.get_width()
-                height = depth_frame.get_height()
-                scale = depth_frame.get_depth_scale()
-                timestamp = depth_frame.get_timestamp()
-                print(f"device{i} timestamp:{timestamp}")
-                depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
-                depth_data = depth_data.reshape((height, width))
-
-                depth_data = depth_data.astype(np.float32) * scale
-
-                depth_image = cv2.normalize(
-                    depth_data, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U
-                )
-                depth_image = cv2.applyColorMap(depth_image, cv2.COLORMAP_JET)
-
-            if color_image is not None and depth_image is not None:
-                window_size = (color_width // 2, color_height // 2 )
-                color_image = cv2.resize(color_image, window_size)
-                depth_image = cv2.resize(depth_image, window_size)
-                image = np.vstack((color_image, depth_image))
-                # end_time=time.time()
-                # fps=1.0/(end_time - start_time)
-                # print(f"device{i} timestamp:{timestamp} fps:{fps}")
-            elif depth_image is not None and not has_color_sensor[i]:
-                image = depth_image
-            else:
+
+    compositor = PreviewCompositor(
+        "Devices",
+        curr_device_cnt,
+        PREVIEW_TILE_WIDTH,
+        PREVIEW_TILE_HEIGHT,
+        columns=PREVIEW_COLUMNS,
+        max_fps=PREVIEW_MAX_FPS,
+    )
+    # MJPG color of all devices is decoded in parallel, at the scale of the preview tiles
+    decode_pool = MjpgDecodePool(curr_device_cnt, DECODE_WORKERS, reduce=PREVIEW_DECODE_REDUCE)
+    # newest FrameSet of every device not drawn yet
+    latest_frames: List[Optional[FrameSet]] = [None] * curr_device_cnt
+    last_stats_time = time.time()
+    try:
+        while not stop_rendering:
+            collect_bundles()
+            while pending_bundles:
+                bundle = pending_bundles.popleft()
+                if bundle.missing:
+                    print(f"Trigger {bundle.timestamp_us} us missed by devices {bundle.missing}")
+                if take_recorder is not None:
+                    take_recorder.write_bundle(bundle)
+                if fusion_stage is not None:
+                    fusion_stage.push_bundle(bundle)
+                for i, frames in enumerate(bundle.frames):
+                    if frames is not None:
+                        latest_frames[i] = frames
+            if not compositor.due():
+                time.sleep(0.001)
                 continue
-            cv2.imshow("Device {}".format(i), image)
-            
-            #print(f"device{i} timestamp:{timestamp}")
-            key = cv2.waitKey(1)
+            for i in range(curr_device_cnt):
+                frames = latest_frames[i]
+                if frames is None:
+                    continue
+                latest_frames[i] = None
+                color_frame = frames.get_color_frame()
+                depth_frame = frames.get_depth_frame()
+                if color_frame is not None and color_frame.get_format() == OBFormat.MJPG:
+                    decode_pool.submit(i, color_frame)
+                elif color_frame is not None:
+                    color_image = color_converters[i].convert(color_frame)
+                    if color_image is not None:
+                        compositor.draw(i, 0, color_image)
+                if depth_frame is not None:
+                    colorize_depth_frame(
+                        depth_frame,
+                        PREVIEW_MIN_DEPTH,
+                        PREVIEW_MAX_DEPTH,
+                        size=compositor.tile_size,
+                        out=compositor.tile(i, 1),
+                    )
+            # depth of every device was colorized while the workers decoded
+            for i in range(curr_device_cnt):
+                while decode_pool.pending(i):
+                    decoded = decode_pool.get(i)
+                    if decoded is not None and decoded.image is not None:
+                        compositor.draw(i, 0, decoded.image)
+                compositor.label(i, "Device {}".format(i))
+            if time.time() - last_stats_time >= STATS_INTERVAL_S:
+                print(decode_pool.format_stats())
+                if dropped_bundles:
+                    print(f"{dropped_bundles} matched triggers dropped before recording, fusion and preview")
+                if take_recorder is not None:
+                    print(take_recorder.format_stats())
+                if fusion_stage is not None:
+                    print(fusion_stage.format_stats())
+                last_stats_time = time.time()
+            key = compositor.show()
             if key == ord("q") or key == ESC_KEY:
                 return
-        #end_time=time.time()
-        #fps=1.0/(end_time - start_time)
-        #print("fps ",fps)
+    finally:
+        decode_pool.close(wait=False)
 
 # 开启视频流
 def start_streams(pipelines: List[Pipeline], configs: List[Config]):
@@ -177,6 +237,10 @@ def main():
     global config_file_path
     global curr_device_cnt
     global has_color_sensor
+    global color_converters
+    global frame_matcher
+    global take_recorder
+    global fusion_stage
 
     read_config(config_file_path)
     ctx = Context()
@@ -200,6 +264,7 @@ def main():
         return
     pipelines: List[Pipeline] = []
     configs: List[Config] = []
+    serial_numbers: List[str] = []
     i = 0
     # 读json的配置
     for device in device_list:
@@ -207,6 +272,7 @@ def main():
         pipeline = Pipeline(device)
         config = Config()
         serial_number = device.get_device_info().get_serial_number()
+        serial_numbers.append(serial_number)
         sync_config_json = multi_device_sync_config[serial_number]
         sync_config = device.get_multi_device_sync_config()
         print(sync_config_json["config"]["mode"])
@@ -230,6 +296,7 @@ def main():
             )
             config.enable_stream(color_profile)
             has_color_sensor[i] = True
+            color_converters[i] = ColorConverter.from_profile(color_profile)
         except OBError as e:
             print(e)
             has_color_sensor[i] = False
@@ -241,14 +308,48 @@ def main():
         configs.append(config)
         i += 1
     global stop_rendering
+    frame_matcher = FrameMatcher(
+        len(pipelines),
+        SYNC_TOLERANCE_US,
+        trigger_delays_from_config(multi_device_sync_config, serial_numbers),
+    )
+
+    if RECORD_TAKE:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        take_path = os.path.join(RECORD_DIR, time.strftime("take_%Y%m%d_%H%M%S.obmc"))
+        take_recorder = TakeRecorder(take_path, serial_numbers, max_pending=RECORD_MAX_PENDING,
+                                     policy=BackPressurePolicy.DROP_OLDEST)
+        print(f"Recording to {take_path}")
+
+    extrinsics = None
+    if LIVE_FUSION:
+        # every device needs extrinsics, checked before the streams start
+        extrinsics = ExtrinsicsStore.load(extrinsics_file_path).stack(serial_numbers)
 
     start_streams(pipelines, configs)
     try:
+        if LIVE_FUSION:
+            camera_params = [pipeline.get_camera_param() for pipeline in pipelines]
+            fusion_stage = LiveFusionStage(
+                extrinsics,
+                frame_set_points(camera_params, with_color=FUSION_WITH_COLOR),
+                points_budget=[FUSION_CAMERA_POINTS] * len(pipelines),
+                max_latency_s=FUSION_MAX_LATENCY_S,
+                voxel_size=FUSION_VOXEL_SIZE,
+            )
         rendering_frames()
         stop_streams(pipelines)
     except KeyboardInterrupt:
         stop_rendering = True
         stop_streams(pipelines)
+    finally:
+        if take_recorder is not None:
+            take_recorder.close()
+            print(take_recorder.format_stats())
+        if fusion_stage is not None:
+            fusion_stage.close()
+            print(fusion_stage.format_stats())
+        print(f"{dropped_bundles} matched triggers dropped before recording, fusion and preview")
 
 
 if __name__ == "__main__":
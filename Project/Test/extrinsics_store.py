@@ -0,0 +1,108 @@
+# ******************************************************************************
+#  Camera extrinsics keyed by serial number.
+#
+#  The calibration file follows multi_device_sync_config.json: a "devices"
+#  list with one entry per camera, holding its serial_number and a 4x4
+#  camera-to-world matrix (mm). The file is parsed once, matrices are kept as
+#  float32 and stack() returns the (N, 4, 4) array for a given device order,
+#  cached until the store changes, ready for FusionEngine.fuse.
+# ******************************************************************************
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+
+EXTRINSICS_VERSION = "1.0"
+
+
+def read_sync_serials(config_file: str) -> List[str]:
+    """Serial numbers in multi_device_sync_config.json, in file order."""
+    with open(config_file, "r") as f:
+        config = json.load(f)
+    return [device["serial_number"] for device in config["devices"]]
+
+
+def extrinsic_from_euler(euler_angles_deg: Sequence[float], translation: Sequence[float],
+                         order: str = "zyx") -> np.ndarray:
+    """4x4 float32 camera-to-world matrix from Euler angles in degrees and a translation in mm."""
+    transform = np.eye(4, dtype=np.float32)
+    transform[:3, :3] = R.from_euler(order, euler_angles_deg, degrees=True).as_matrix()
+    transform[:3, 3] = translation
+    return transform
+
+
+class ExtrinsicsStore:
+    def __init__(self, extrinsics: Optional[Dict[str, np.ndarray]] = None):
+        self._extrinsics: Dict[str, np.ndarray] = {}
+        self._stacked: Dict[Tuple[str, ...], np.ndarray] = {}
+        for serial_number, matrix in (extrinsics or {}).items():
+            self.set(serial_number, matrix)
+
+    @classmethod
+    def load(cls, file_path: str) -> "ExtrinsicsStore":
+        with open(file_path, "r") as f:
+            config = json.load(f)
+        store = cls()
+        for device in config["devices"]:
+            try:
+                store.set(device["serial_number"], device["extrinsic"])
+            except ValueError as e:
+                raise ValueError(f"{file_path}: {e}") from None
+        return store
+
+    def save(self, file_path: str):
+        # one matrix row per line, json.dump(indent=...) would put every number on its own line
+        devices = []
+        for serial_number, matrix in self._extrinsics.items():
+            rows = ",\n".join(" " * 16 + json.dumps(row) for row in matrix.tolist())
+            devices.append(" " * 8 + "{\n"
+                           + " " * 12 + f"\"serial_number\": {json.dumps(serial_number)},\n"
+                           + " " * 12 + "\"extrinsic\": [\n" + rows + "\n" + " " * 12 + "]\n"
+                           + " " * 8 + "}")
+        with open(file_path, "w") as f:
+            f.write("{\n"
+                    f"    \"version\": \"{EXTRINSICS_VERSION}\",\n"
+                    "    \"unit\": \"mm\",\n"
+                    "    \"devices\": [\n" + ",\n".join(devices) + "\n    ]\n}\n")
+
+    def set(self, serial_number: str, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.shape != (4, 4):
+            raise ValueError(f"Extrinsic of {serial_number} must be 4x4, got shape {matrix.shape}")
+        if not np.allclose(matrix[3], [0, 0, 0, 1]):
+            raise ValueError(f"Extrinsic of {serial_number} is not a rigid transform, last row {matrix[3]}")
+        self._extrinsics[serial_number] = matrix
+        self._stacked.clear()
+
+    def get(self, serial_number: str) -> np.ndarray:
+        return self._extrinsics[serial_number]
+
+    def __contains__(self, serial_number: str) -> bool:
+        return serial_number in self._extrinsics
+
+    def __len__(self) -> int:
+        return len(self._extrinsics)
+
+    def serial_numbers(self) -> List[str]:
+        return list(self._extrinsics)
+
+    def missing(self, serial_numbers: Sequence[str]) -> List[str]:
+        return [serial_number for serial_number in serial_numbers if serial_number not in self._extrinsics]
+
+    def validate(self, serial_numbers: Sequence[str]):
+        """Raise ValueError naming every serial number without extrinsics."""
+        missing = self.missing(serial_numbers)
+        if missing:
+            raise ValueError(f"No extrinsics for devices {', '.join(missing)}")
+
+    def stack(self, serial_numbers: Sequence[str]) -> np.ndarray:
+        """(N, 4, 4) float32 extrinsics in the given device order, do not modify the returned array."""
+        key = tuple(serial_numbers)
+        stacked = self._stacked.get(key)
+        if stacked is None:
+            self.validate(key)
+            stacked = np.stack([self._extrinsics[serial_number] for serial_number in key])
+            stacked.setflags(write=False)
+            self._stacked[key] = stacked
+        return stacked
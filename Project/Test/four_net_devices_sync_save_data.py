@@ -18,33 +18,48 @@
 import json  # 导入json模块，用于处理JSON格式的数据
 import os  # 导入os模块，提供与操作系统交互的功能，如文件路径操作  
 import time  # 导入time模块，提供与时间相关的函数 
-from queue import Queue  # 从queue模块导入Queue类，用于创建线程安全的队列  
-from threading import Lock # 从threading模块导入Lock类，用于实现线程间的同步
-from typing import List # 从typing模块导入List，用于类型注解，表示列表类型
+from collections import deque  # 从collections模块导入deque，用于缓存已匹配好的帧组
+from typing import Deque, List, Optional # 从typing模块导入List，用于类型注解，表示列表类型
 
-import cv2 # 导入OpenCV库，用于图像处理
-import numpy as np  # 导入numpy库，用于高效的数组和矩阵运算 
 import open3d as o3d  # 导入Open3D库，用于处理3D数据和点云
 
 from pyorbbecsdk import * # 从pyorbbecsdk模块导入所有内容，pyorbbecsdk是与Orbbec摄像头交互的SDK  
-from utils import frame_to_bgr_image  # 从utils模块导入frame_to_bgr_image函数，该函数可能用于将帧转换为BGR格式的图像  
-
-
-from plyfile import PlyData, PlyElement
-# 定义一个全局锁，用于保护frames_queue的访问，确保线程安全
-frames_queue_lock = Lock()
+from ply_io import write_ply  # 二进制PLY点云写入
+from frame_writer import BackPressurePolicy, FrameWriter  # 异步写盘器
+from color_saver import ColorSaver  # 彩色帧写盘：MJPG原样保存，其余格式在写盘线程中编码PNG/JPEG
+from frame_matcher import FrameBundle, FrameMatcher, trigger_delays_from_config  # 按硬件时间戳跨设备匹配帧
+from ring_buffer import RingBuffer  # 无锁单生产者单消费者环形缓冲区，满时覆盖最旧的帧
+from depth_codec import write_depth  # 无损深度压缩，预测残差+zlib
 
 # Configuration settings
 MAX_DEVICES = 4 # 允许连接的最大设备数量
-MAX_QUEUE_SIZE = 5  # 每个设备帧队列的最大容量 
+MAX_QUEUE_SIZE = 5  # 每个设备环形缓冲区和已匹配帧组队列的最大容量 
+SYNC_TOLERANCE_US = 2000  # 同一次触发的帧之间允许的最大时间戳差（微秒，已扣除trigger_to_image_delay_us）
 ESC_KEY = 27  # ESC键的ASCII码，用于检测用户是否希望退出程序
+WRITER_WORKERS = 8  # 写盘工作线程数
+MAX_PENDING_WRITES = 8  # 每个设备每路流最多排队的写任务数
+STATS_INTERVAL_S = 5.0  # 写盘统计打印间隔（秒）
+KEEP_MJPG = True  # 彩色流为MJPG时直接保存为.jpg，不解码也不重新编码
+COLOR_IMAGE_FORMAT = "png"  # 需要编码时的图像格式，"png"无损，"jpg"快约30倍
+COLOR_PNG_COMPRESSION = 1  # PNG压缩级别0-9，1比cv2默认的3快约1.5倍，文件大5%左右
+COLOR_JPEG_QUALITY = 90  # JPEG质量0-100
+DEPTH_COMPRESSION_LEVEL = 1  # 深度无损压缩的zlib级别，0为不压缩（仍带文件头）
+# 写盘跟不上时每路流的处理策略：彩色退化为原始数据，深度阻塞等待不丢帧，点云丢弃最旧的任务
+WRITE_POLICIES = {
+    "color": BackPressurePolicy.RAW_ONLY,
+    "depth": BackPressurePolicy.BLOCK,
+    "points": BackPressurePolicy.DROP_OLDEST,
+}
 # 设置保存点云、深度图像和彩色图像的目录路径  
 save_points_dir = os.path.join(os.getcwd(), "point_clouds")  # 点云数据保存目录
 save_depth_image_dir = os.path.join(os.getcwd(), "depth_images") # 深度图像保存目录
 save_color_image_dir = os.path.join(os.getcwd(), "color_images") # 彩色图像保存目录
 #save_color_image_dir = "E:\\color_images"
 
-frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]# 初始化frames_queue列表，为每个可能的设备创建一个队列 
+frames_rings: List[RingBuffer] = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(MAX_DEVICES)]  # 每个设备一个环形缓冲区，SDK回调线程写入，处理线程读取，无需加锁
+pending_bundles: Deque[FrameBundle] = deque(maxlen=MAX_QUEUE_SIZE)  # 已按时间戳匹配好的帧组，每个帧组包含同一次触发下各设备的FrameSet
+dropped_bundles = 0  # 处理跟不上时被挤出pending_bundles、没有交给writer的帧组数
+frame_matcher: Optional[FrameMatcher] = None  # 跨设备帧匹配器，在main中按设备的触发延时创建
 stop_processing = False   # 定义一个全局标志，用于控制是否停止处理帧
 curr_device_cnt = 4    # 当前设备计数器，用于在多个设备间分配帧队列
 
@@ -104,42 +119,38 @@ def sync_mode_from_str(sync_mode_str: str) -> OBMultiDeviceSyncMode:  #函数接
 
 # Frame processing and saving  #帧处理和保存，通常用于从多个摄像头设备中捕获并保存颜色图像和深度图像
 #这个函数被设计为在一个循环中运行，直到一个全局变量stop_processing被设置为True，表示应该停止处理帧。
-def process_frames(pipelines):  #参数pipelines预期是一个列表，包含了与每个摄像头设备相关联的处理管道（可能是用于配置摄像头或处理捕获到的帧的对象）。
-    global frames_queue
+#编码和写盘交给writer的工作线程完成，本线程只负责取帧和提交写任务，磁盘慢时不会拖慢所有相机的取帧。
+def process_frames(pipelines, writer: FrameWriter, color_saver: ColorSaver, serial_numbers: List[str]):  #参数pipelines预期是一个列表，包含了与每个摄像头设备相关联的处理管道；writer是异步写盘器；color_saver负责彩色帧的编码和保存；serial_numbers是每个设备的序列号
+    global pending_bundles
     global stop_processing
     global curr_device_cnt, save_points_dir, save_depth_image_dir, save_color_image_dir
     #声明了将要使用的全局变量
-    # frames_queue是一个队列或类似结构，用于存储从每个摄像头捕获的帧；
+    # pending_bundles是一个队列，用于存储按时间戳匹配好的多设备帧组；
     # stop_processing是一个标志，用于控制是否继续处理帧；
     # curr_device_cnt是当前连接的摄像头设备数量；
     # save_points_dir
     # save_depth_image_dir、save_color_image_dir分别是用于保存深度图像和颜色图像的目录路径。
+    for save_dir in (save_points_dir, save_depth_image_dir, save_color_image_dir):
+        os.makedirs(save_dir, exist_ok=True)  # 保存目录不存在则创建
+    last_stats_time = time.time()
     while not stop_processing:  #使用while循环来不断处理帧，直到stop_processing为True。
         now = time.time()  #记录当前的时间
+        collect_bundles()  # 从各设备的环形缓冲区取帧并按时间戳匹配
+        bundle = pending_bundles.popleft() if pending_bundles else None  # 取出一组同一次触发的帧
+        if bundle is None:
+            time.sleep(0.001)  # 没有凑齐的帧组时短暂等待，避免空转
+        if bundle is not None and bundle.missing:
+            print(f"Trigger {bundle.timestamp_us} us missed by devices {bundle.missing}")  # 报告错过本次触发的设备
         for device_index in range(curr_device_cnt):  #以curr_device_cnt为值，range生成一个curr_device_cnt大小的序列，依次赋值给device_index，直到循环结束
-            with frames_queue_lock:  #使用锁（frames_queue_lock）来安全地从对应设备的帧队列中获取帧。
-                frames = frames_queue[device_index].get() if not frames_queue[device_index].empty() else None   # 尝试从指定设备的队列中获取帧，如果队列为空则返回None
+            frames = bundle.frames[device_index] if bundle is not None else None  # 本设备在该帧组中的FrameSet，错过触发时为None
             if frames is None:
-                continue  #如果frames为None（即没有从队列中获取到帧），则跳过当前迭代，继续处理下一个设备或等待下一个循环迭代。
+                continue  #如果frames为None（即该设备没有这次触发的帧），则跳过当前迭代，继续处理下一个设备或等待下一个循环迭代。
             color_frame = frames.get_color_frame() if frames else None  # 如果frames不为None，则获取彩色帧
             depth_frame = frames.get_depth_frame() if frames else None  # 如果frames不为None，则获取深度帧
             pipeline = pipelines[device_index]  #存储了与每个设备相关的处理管道  
-            print(f"Device {device_index} frames")  # 打印正在处理哪个设备的帧
 
             if color_frame:
-                color_image = frame_to_bgr_image(color_frame)  # 将彩色帧转换为BGR图像
-                if color_image is not None and isinstance(color_image, np.ndarray):
-                    if not os.path.exists(save_color_image_dir) :
-                        os.mkdir(save_color_image_dir)
-                color_filename = os.path.join(save_color_image_dir,    # 构造保存彩色帧的图像文件名 
-                                              f"color_{device_index}_{color_frame.get_timestamp()}.png")
-                cv2.imwrite(color_filename, color_image) # 使用OpenCV的cv2.imwrite函数保存图像 
-                '''if cv2.imwrite(color_filename, color_image):  
-                    print(f"Image saved successfully: {color_filename}")  
-                else:  
-                    print(f"Failed to save image: {color_filename}")  
-            else:  
-                print("color_image is not a valid image array")'''
+                color_saver.submit(device_index, color_frame, color_frame.get_timestamp())  # 交给写盘线程保存，MJPG原样写入，其余格式在工作线程中编码
 
             if depth_frame:    # 检查是否存在深度帧 
                 timestamp = depth_frame.get_timestamp()  # 获取深度帧的时间戳
@@ -147,44 +158,50 @@ def process_frames(pipelines):  #参数pipelines预期是一个列表，包含
                 height = depth_frame.get_height()  # 获取深度帧的高度  
                 timestamp2 = depth_frame.get_timestamp_us()  #冗余项
                 scale = depth_frame.get_depth_scale()  # 获取深度帧的缩放比例  
-                data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)  # 从深度帧的原始数据中提取数据，并重新塑形为二维数组  
-                #np.frombuffer是NumPy库中的一个函数，它用于从字节缓冲区（如字节对象或兼容的数组接口）中创建一个一维数组。
-                #depth_frame.get_data()方法返回一个包含深度帧原始数据的字节缓冲区。这些原始数据通常是以某种格式（如16位无符号整数，即np.uint16）编码的深度值。
-                data = data.reshape((height, width))
-                #reshape是NumPy数组的一个方法，允许改变数组的形状而不改变其数据。在这个例子中将一维数组data重新塑形为二维数组，以匹配深度帧的宽度和高度。
-                data = data.astype(np.float32) * scale  #将数据转换类型为np.float32，再乘以缩放比例
-                data = data.astype(np.uint16)   #将数据转换类型为np.uint16
-                
-                if not os.path.exists(save_depth_image_dir):  # 检查保存深度帧原始数据的目录是否存在，如果不存在则创建 
-                    os.mkdir(save_depth_image_dir)
-                raw_filename = save_depth_image_dir +"/depth_{}x{}_device_{}_{}.raw".format(width, height,device_index, timestamp2)
-                data.tofile(raw_filename)
+                data = depth_frame.get_data_view()  # 零拷贝的(height, width) uint16只读视图，视图保持帧有效直到写盘完成
+                # 保存设备原始的uint16深度，缩放比例写入文件头（深度*scale=毫米），不再转float32再转回uint16，省去两次整帧拷贝
+                depth_filename = save_depth_image_dir +"/depth_{}x{}_device_{}_{}.obdz".format(width, height,device_index, timestamp2)
+                writer.submit(device_index, "depth", write_depth, depth_filename, data, scale,
+                              DEPTH_COMPRESSION_LEVEL)  # 在工作线程中无损压缩并写入深度数据，多个工作线程并行压缩
                 
                 camera_param = pipeline.get_camera_param()  # 获取相机参数，并从frames中获取点云
-                points = frames.get_point_cloud(camera_param)
+                points = frames.get_point_cloud(camera_param, remove_zero_depth=True)  # 在C++中直接去掉深度为0的点
                 if len(points) == 0:
                     print("no depth points")
                     continue  # 检查点云是否为空,如果点云为空，输出并跳过后续的点云处理 
-                points_array = np.array([tuple(point) for point in points],
-                                        dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4')])    # 将点云转换为NumPy数组，每个点都是一个包含x, y, z的元组，然后转换为结构化数组
-                                        #每个字段的数据类型都是'f4'，即32位浮点数（在NumPy中，'f4'是np.float32的别名）。points_filename = save_points_dir + "/points_{}x{}_device_{}_{}.ply".format(width, height,device_index, timestamp)
-                points_filename = os.path.join(save_points_dir, f"points_{timestamp}.ply")
-                el = PlyElement.describe(points_array, 'vertex')
-                PlyData([el], text=True).write(points_filename)
-        print(f"Processing time: {time.time() - now:.3f}s")  # 记录并打印处理时间 
+                points_filename = os.path.join(save_points_dir, f"points_{serial_numbers[device_index]}_{timestamp}.ply")  # 文件名带上序列号，避免同步触发的设备互相覆盖，拼接时按序列号查外参
+                writer.submit(device_index, "points", write_ply, points_filename, points)  # 在工作线程中以二进制PLY写入(N,3)点云数组
+        if now - last_stats_time >= STATS_INTERVAL_S:  # 定期打印每个设备每路流的排队/写入/丢弃计数
+            print(writer.format_stats())
+            print(color_saver.format_stats())  # 打印每个设备彩色帧的编码耗时和保存方式
+            print(frame_matcher.format_stats())  # 打印完整/不完整帧组数和每个设备错过的触发数
+            if dropped_bundles:
+                print(f"{dropped_bundles} matched triggers dropped before saving")  # 处理跟不上被丢弃的帧组
+            last_stats_time = now
 
 
 def on_new_frame_callback(frames: FrameSet, index: int):
     #这个函数是一个回调函数。
     # 当新的帧集（FrameSet）从某个数据流设备接收到时，会被调用。
     # 它接收两个参数：frames（一个FrameSet对象，代表新接收到的帧集）和index（一个整数，表示设备的索引）。
-    global frames_queue
-    global MAX_QUEUE_SIZE
+    global frames_rings
     assert index < MAX_DEVICES  # 确保索引不超过最大设备数
-    with frames_queue_lock: # 使用锁来确保线程安全，确保在修改frames_queue时不会发生线程冲突。
-        if frames_queue[index].qsize() >= MAX_QUEUE_SIZE:  # 检查当前队列大小，如果队列已满，移除最旧的帧
-            frames_queue[index].get()
-        frames_queue[index].put(frames)  # 将新帧添加到队列中
+    frames_rings[index].push(frames)  # 写入本设备的环形缓冲区，满时覆盖最旧的帧，不加锁
+
+
+def collect_bundles():
+    #在处理线程中调用：取出每个设备环形缓冲区中的全部FrameSet，交给帧匹配器，凑齐的帧组放入pending_bundles
+    global frames_rings, pending_bundles, dropped_bundles
+    for device_index in range(curr_device_cnt):
+        frames = frames_rings[device_index].pop()
+        while frames is not None:
+            frame = frames.get_depth_frame() or frames.get_color_frame()  # 用深度帧（没有时用彩色帧）的硬件时间戳匹配
+            if frame is not None:
+                for bundle in frame_matcher.push(device_index, frame.get_timestamp_us(), frames):
+                    if len(pending_bundles) == pending_bundles.maxlen:
+                        dropped_bundles += 1  # 队列已满，append会挤掉最旧的帧组
+                    pending_bundles.append(bundle)
+            frames = frames_rings[device_index].pop()
 
 
 def start_streams(pipelines: List[Pipeline], configs: List[Config]):
@@ -212,6 +229,7 @@ def stop_streams(pipelines: List[Pipeline]):
 # Main function for setup and teardown  设置和拆卸
 def main():
     global curr_device_cnt  # 声明全局变量curr_device_cnt
+    global frame_matcher
     read_config(config_file_path)  # 调用read_config函数读取配置文件
     ctx = Context()  # 创建一个Context类的实例
     #"Context" 类通常是在编程中根据具体需求自定义的一个类，用于封装和管理与上下文（context）相关的数据和行为。
@@ -228,6 +246,7 @@ def main():
         return
     pipelines = []  # 初始化一个空列表，用于存储Pipeline实例  
     configs = []
+    serial_numbers = []  # 按设备顺序记录序列号，用于读取每个设备的触发延时
     #curr_device_cnt = device_list.get_count()  # 将设备数量赋值给全局变量curr_device_cnt
     #for i in range(min(device_list.get_count(), MAX_DEVICES)):# 循环遍历设备列表，但不超过MAX_DEVICES个设备
     #for i in device_list:
@@ -237,6 +256,7 @@ def main():
         pipeline = Pipeline(device)    # 为每个设备创建一个Pipeline对象
         config = Config()   # 创建一个Config对象来配置Pipeline
         serial_number = device.get_device_info().get_serial_number()  # 获取设备的序列号
+        serial_numbers.append(serial_number)
         sync_config_json = multi_device_sync_config[serial_number]  # 从某个配置字典中根据序列号获取该设备的同步配置
         sync_config = device.get_multi_device_sync_config()  # 获取设备的当前同步配置
         sync_config.mode = sync_mode_from_str(sync_config_json["config"]["mode"])   # 根据JSON配置更新同步配置的各个字段
@@ -261,16 +281,25 @@ def main():
             # 将配置好的Pipeline和Config对象添加到列表中，以便后续处理 
         pipelines.append(pipeline)
         configs.append(config)
+    writer = FrameWriter(WRITER_WORKERS, MAX_PENDING_WRITES, WRITE_POLICIES)  # 创建异步写盘器
+    color_saver = ColorSaver(writer, save_color_image_dir, COLOR_IMAGE_FORMAT, COLOR_PNG_COMPRESSION,
+                             COLOR_JPEG_QUALITY, KEEP_MJPG)  # 彩色帧的编码和保存在writer的工作线程中完成
+    frame_matcher = FrameMatcher(len(device_list), SYNC_TOLERANCE_US,
+                                 trigger_delays_from_config(multi_device_sync_config, serial_numbers))  # 扣除每个设备的触发延时后按时间戳匹配
     start_streams(pipelines, configs)   #启动所有Pipeline的流
     global stop_processing# 定义一个全局变量来控制是否停止处理 
     try:
-        process_frames(pipelines)  #处理从Pipeline中获取的帧
+        process_frames(pipelines, writer, color_saver, serial_numbers)  #处理从Pipeline中获取的帧
     except KeyboardInterrupt:
         print("Interrupted by user")
         stop_processing = True
     finally:# 无论是否发生异常，都停止所有Pipeline的流  
         print("===============Stopping pipelines====")
         stop_streams(pipelines)
+        writer.close()  # 等待排队中的写任务全部完成
+        print(writer.format_stats())
+        print(color_saver.format_stats())
+        print(f"{dropped_bundles} matched triggers dropped before saving")
 
 # 如果此脚本作为主程序运行，则调用main()函数  
 if __name__ == "__main__":
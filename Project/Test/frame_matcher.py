@@ -0,0 +1,132 @@
+# ******************************************************************************
+#  Timestamp based frame matching across hardware synchronized devices.
+#
+#  Each device pushes its frames with the hardware timestamp in microseconds.
+#  The per-device trigger_to_image_delay_us from multi_device_sync_config.json
+#  is subtracted first, so frames of one trigger line up on the trigger time.
+#  Frames are grouped when they fall within tolerance_us of the oldest
+#  buffered frame. A bundle is emitted once every device either has a frame
+#  in the group or has already delivered a later frame (it missed the
+#  trigger), or when the group is older than max_wait_us (the device went
+#  silent). Each emitted bundle costs O(devices) and every device buffers at
+#  most max_buffered frames.
+# ******************************************************************************
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class FrameBundle:
+    timestamp_us: int  # trigger time of the bundle, delay corrected
+    frames: List[Optional[Any]]  # indexed by device, None for missing devices
+    missing: List[int] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+@dataclass
+class MatchStats:
+    complete: int = 0
+    incomplete: int = 0
+    missed: List[int] = field(default_factory=list)  # triggers missed per device
+    overflow: List[int] = field(default_factory=list)  # frames dropped from full buffers per device
+
+
+def trigger_delays_from_config(sync_configs: Dict[str, dict], serial_numbers: Iterable[str]) -> List[int]:
+    """Per-device trigger_to_image_delay_us, in the order of serial_numbers."""
+    return [sync_configs[serial_number]["config"].get("trigger_to_image_delay_us", 0)
+            for serial_number in serial_numbers]
+
+
+class FrameMatcher:
+    def __init__(self, device_count: int, tolerance_us: int = 2000,
+                 delays_us: Optional[List[int]] = None, max_buffered: int = 8,
+                 max_wait_us: int = 100000):
+        if device_count < 1 or max_buffered < 1:
+            raise ValueError("device_count and max_buffered must be positive")
+        if delays_us is not None and len(delays_us) != device_count:
+            raise ValueError(f"Expected {device_count} delays, got {len(delays_us)}")
+        self.device_count = device_count
+        self.tolerance_us = tolerance_us
+        self.delays_us = list(delays_us) if delays_us is not None else [0] * device_count
+        self.max_buffered = max_buffered
+        self.max_wait_us = max_wait_us
+        self._buffers: List[Deque[Tuple[int, Any]]] = [deque() for _ in range(device_count)]
+        self._last_timestamps: List[Optional[int]] = [None] * device_count
+        self._newest_timestamp: Optional[int] = None
+        self._stats = MatchStats(missed=[0] * device_count, overflow=[0] * device_count)
+        self._lock = threading.Lock()
+
+    def push(self, device_index: int, timestamp_us: int, item: Any) -> List[FrameBundle]:
+        """Buffer a frame of a device, returns the bundles completed by it, oldest first."""
+        timestamp_us -= self.delays_us[device_index]
+        with self._lock:
+            buffer = self._buffers[device_index]
+            if len(buffer) >= self.max_buffered:
+                buffer.popleft()
+                self._stats.overflow[device_index] += 1
+            buffer.append((timestamp_us, item))
+            self._last_timestamps[device_index] = timestamp_us
+            if self._newest_timestamp is None or timestamp_us > self._newest_timestamp:
+                self._newest_timestamp = timestamp_us
+            return self._match()
+
+    def _match(self) -> List[FrameBundle]:
+        bundles = []
+        while True:
+            heads = [buffer[0][0] for buffer in self._buffers if buffer]
+            if not heads:
+                return bundles
+            reference = min(heads)
+            limit = reference + self.tolerance_us
+            expired = self._newest_timestamp - reference > self.max_wait_us
+            matched = []
+            missing = []
+            for i, buffer in enumerate(self._buffers):
+                if buffer and buffer[0][0] <= limit:
+                    matched.append(i)
+                elif buffer or expired or (self._last_timestamps[i] is not None
+                                           and self._last_timestamps[i] > limit):
+                    missing.append(i)
+                else:
+                    # The device may still deliver a frame for this trigger
+                    return bundles
+            frames: List[Optional[Any]] = [None] * self.device_count
+            for i in matched:
+                frames[i] = self._buffers[i].popleft()[1]
+            for i in missing:
+                self._stats.missed[i] += 1
+            if missing:
+                self._stats.incomplete += 1
+            else:
+                self._stats.complete += 1
+            bundles.append(FrameBundle(reference, frames, missing))
+
+    def flush(self) -> List[FrameBundle]:
+        """Emit every buffered frame, devices without a frame are reported missing."""
+        with self._lock:
+            newest = self._newest_timestamp
+            if newest is None:
+                return []
+            self._newest_timestamp = newest + self.max_wait_us + self.tolerance_us + 1
+            try:
+                return self._match()
+            finally:
+                self._newest_timestamp = newest
+
+    def stats(self) -> MatchStats:
+        with self._lock:
+            return MatchStats(self._stats.complete, self._stats.incomplete,
+                              list(self._stats.missed), list(self._stats.overflow))
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        total = stats.complete + stats.incomplete
+        lines = [f"bundles {total}: complete {stats.complete} incomplete {stats.incomplete}"]
+        for i in range(self.device_count):
+            lines.append(f"device {i}: missed {stats.missed[i]} overflow {stats.overflow[i]}")
+        return "\n".join(lines)
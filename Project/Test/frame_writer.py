@@ -0,0 +1,164 @@
+# ******************************************************************************
+#  Asynchronous disk sink for multi-camera capture.
+#
+#  The capture thread only submits write jobs; a pool of worker threads runs
+#  the encoders and writers (cv2.imwrite, ndarray.tofile and write_ply all
+#  release the GIL while they work). Every (device, stream) pair has a bounded
+#  number of pending jobs and a back-pressure policy deciding what happens when
+#  the disk falls behind:
+#
+#    DROP_OLDEST  the oldest pending job of the stream is discarded
+#    BLOCK        submit() waits until the stream has room again
+#    RAW_ONLY     new jobs run their cheap raw fallback instead of encoding,
+#                 the oldest job is dropped once twice the limit is pending
+# ******************************************************************************
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from enum import Enum
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+StreamKey = Tuple[int, str]
+
+
+class BackPressurePolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    BLOCK = "block"
+    RAW_ONLY = "raw_only"
+
+
+@dataclass
+class StreamStats:
+    queued: int = 0
+    written: int = 0
+    dropped: int = 0
+    degraded: int = 0
+    failed: int = 0
+    pending: int = 0
+
+
+class WriteJob:
+    __slots__ = ("key", "func", "args")
+
+    def __init__(self, key: StreamKey, func: Callable, args: tuple):
+        self.key = key
+        self.func = func
+        self.args = args
+
+
+class FrameWriter:
+    def __init__(self, num_workers: int = 4, max_pending: int = 8,
+                 policies: Optional[Dict[str, BackPressurePolicy]] = None,
+                 default_policy: BackPressurePolicy = BackPressurePolicy.DROP_OLDEST):
+        if num_workers < 1 or max_pending < 1:
+            raise ValueError("num_workers and max_pending must be positive")
+        self.max_pending = max_pending
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy
+        self._jobs: Deque[WriteJob] = deque()
+        self._stats: Dict[StreamKey, StreamStats] = {}
+        # workers wait for jobs and BLOCK submitters wait for room on separate conditions of one lock, so
+        # a notify for one never wakes the other
+        self._condition = threading.Condition()
+        self._not_full = threading.Condition(self._condition)
+        self._closed = False
+        self._start_time = time.time()
+        self._workers: List[threading.Thread] = []
+        for i in range(num_workers):
+            worker = threading.Thread(target=self._run, name=f"FrameWriter-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, device_index: int, stream: str, func: Callable, *args,
+               raw_func: Optional[Callable] = None, raw_args: tuple = ()) -> bool:
+        """Queue func(*args) for a stream, returns False if the job was not queued."""
+        key = (device_index, stream)
+        policy = self.policies.get(stream, self.default_policy)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("FrameWriter is closed")
+            stats = self._stats.setdefault(key, StreamStats())
+            if stats.pending >= self.max_pending:
+                if policy == BackPressurePolicy.BLOCK:
+                    while stats.pending >= self.max_pending and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        stats.dropped += 1
+                        return False
+                elif policy == BackPressurePolicy.RAW_ONLY and raw_func is not None:
+                    func, args = raw_func, raw_args
+                    stats.degraded += 1
+                    if stats.pending >= 2 * self.max_pending:
+                        self._drop_oldest(key, stats)
+                else:
+                    self._drop_oldest(key, stats)
+            self._jobs.append(WriteJob(key, func, args))
+            stats.queued += 1
+            stats.pending += 1
+            self._condition.notify()  # wake one idle worker
+        return True
+
+    def _drop_oldest(self, key: StreamKey, stats: StreamStats):
+        for job in self._jobs:
+            if job.key == key:
+                self._jobs.remove(job)
+                stats.pending -= 1
+                stats.dropped += 1
+                return
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._closed:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                job = self._jobs.popleft()
+                stats = self._stats[job.key]
+                stats.pending -= 1
+                self._not_full.notify_all()
+            try:
+                job.func(*job.args)
+                succeeded = True
+            except Exception as e:
+                print(f"Device {job.key[0]} {job.key[1]} write failed: {e}")
+                succeeded = False
+            with self._condition:
+                if succeeded:
+                    stats.written += 1
+                else:
+                    stats.failed += 1
+
+    def stats(self) -> Dict[StreamKey, StreamStats]:
+        with self._condition:
+            return {key: replace(stats) for key, stats in self._stats.items()}
+
+    def format_stats(self) -> str:
+        elapsed = max(time.time() - self._start_time, 1e-6)
+        lines = []
+        for (device_index, stream), stats in sorted(self.stats().items()):
+            lines.append(f"device {device_index} {stream:>6}: queued {stats.queued} written {stats.written} "
+                         f"({stats.written / elapsed:.1f} fps) dropped {stats.dropped} "
+                         f"degraded {stats.degraded} failed {stats.failed} pending {stats.pending}")
+        return "\n".join(lines)
+
+    def close(self, wait: bool = True):
+        """Stop accepting jobs, with wait the pending jobs are written before returning."""
+        with self._condition:
+            self._closed = True
+            if not wait:
+                for job in self._jobs:
+                    self._stats[job.key].pending -= 1
+                    self._stats[job.key].dropped += 1
+                self._jobs.clear()
+            self._condition.notify_all()
+            self._not_full.notify_all()
+        for worker in self._workers:
+            worker.join()
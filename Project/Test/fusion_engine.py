@@ -0,0 +1,88 @@
+# ******************************************************************************
+#  Multi-camera point cloud fusion into one preallocated buffer.
+#
+#  Per-camera clouds are (N, 3) x/y/z or (N, 6) x/y/z/r/g/b arrays, as
+#  returned by FrameSet.get_point_cloud / get_color_point_cloud or read_ply,
+#  extrinsics are 4x4 camera-to-world matrices. Every cloud is transformed
+#  straight into its slice of the output buffer, clouds stacked into one
+#  (cameras, N, 3) array go through a single batched matmul, so fusing is
+#  linear in the total number of points. The buffer is reused between calls
+#  and only grows.
+# ******************************************************************************
+from typing import Optional
+
+import numpy as np
+
+
+def as_extrinsics(extrinsics, count: int) -> np.ndarray:
+    """Validate a sequence of 4x4 matrices, or an (N, 4, 4) array, returns (count, 4, 4) float32."""
+    extrinsics = np.asarray(extrinsics, dtype=np.float32)
+    if extrinsics.shape != (count, 4, 4):
+        raise ValueError(f"Expected {count} 4x4 extrinsics, got shape {extrinsics.shape}")
+    return extrinsics
+
+
+class FusionEngine:
+    def __init__(self, extrinsics=None, initial_capacity: int = 0):
+        self.extrinsics = None if extrinsics is None else as_extrinsics(extrinsics, len(extrinsics))
+        self._buffer = np.empty((initial_capacity, 6), dtype=np.float32)
+
+    def _output(self, total: int, channels: int, out: Optional[np.ndarray]) -> np.ndarray:
+        if out is not None:
+            if out.dtype != np.float32 or out.ndim != 2 or out.shape[1] != channels or out.shape[0] < total:
+                raise ValueError(f"out must be a float32 array of at least ({total}, {channels}), "
+                                 f"got {out.dtype} {out.shape}")
+            return out[:total]
+        if self._buffer.shape[0] < total:
+            # grow geometrically so a slowly growing point count does not reallocate every call
+            self._buffer = np.empty((max(total, self._buffer.shape[0] * 3 // 2), 6), dtype=np.float32)
+        return self._buffer.reshape(-1)[:total * channels].reshape(total, channels)
+
+    def fuse(self, clouds, extrinsics=None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Transform every cloud by its extrinsic and concatenate them.
+
+        clouds is a sequence of (N_i, 3) or (N_i, 6) arrays, or one (cameras, N, 3|6) array which is transformed
+        with a single batched matmul. Returns a (total, 3) or (total, 6) float32 array, without out it is a view
+        of the engine buffer that the next call overwrites, copy it to keep it.
+        """
+        if len(clouds) == 0:
+            raise ValueError("No point clouds to fuse")
+        extrinsics = self.extrinsics if extrinsics is None else as_extrinsics(extrinsics, len(extrinsics))
+        if extrinsics is None:
+            raise ValueError("No extrinsics given")
+        if len(extrinsics) != len(clouds):
+            raise ValueError(f"Got {len(clouds)} point clouds but {len(extrinsics)} extrinsics")
+        channels = np.shape(clouds[0])[-1]
+        if channels not in (3, 6) or any(np.ndim(cloud) != 2 or np.shape(cloud)[1] != channels for cloud in clouds):
+            raise ValueError("Point clouds must all be (N, 3) or all be (N, 6)")
+        counts = [len(cloud) for cloud in clouds]
+        fused = self._output(sum(counts), channels, out)
+        rotations = extrinsics[:, :3, :3].transpose(0, 2, 1)  # row vectors: p @ R^T
+        translations = extrinsics[:, :3, 3]
+        if isinstance(clouds, np.ndarray) and clouds.ndim == 3:
+            batched = fused.reshape(clouds.shape)
+            np.matmul(clouds[:, :, :3], rotations, out=batched[:, :, :3])
+            batched[:, :, :3] += translations[:, None, :]
+            if channels == 6:
+                batched[:, :, 3:] = clouds[:, :, 3:]
+            return fused
+        offset = 0
+        for cloud, rotation, translation, count in zip(clouds, rotations, translations, counts):
+            target = fused[offset:offset + count]
+            np.matmul(cloud[:, :3], rotation, out=target[:, :3])
+            target[:, :3] += translation
+            if channels == 6:
+                target[:, 3:] = cloud[:, 3:]
+            offset += count
+        return fused
+
+
+def to_open3d(points: np.ndarray):
+    """Build an open3d PointCloud from an (N, 3) or (N, 6) array, colors are expected in [0, 255]."""
+    import open3d as o3d
+
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(points[:, :3].astype(np.float64))
+    if points.shape[1] == 6:
+        pcd.colors = o3d.utility.Vector3dVector(points[:, 3:6].astype(np.float64) / 255.0)
+    return pcd
@@ -0,0 +1,240 @@
+# ******************************************************************************
+#  Extrinsic refinement with point-to-plane ICP and a pose graph.
+#
+#  Every camera keeps a voxel-downsampled reference cloud in its own frame,
+#  with a cKDTree and normals built once and reused across frames. Because
+#  the reference lives in camera coordinates, refining the extrinsics never
+#  invalidates it. update() first measures the point-to-plane residual of
+#  every neighbouring pair on a small sample of the new clouds, which is a
+#  few thousand tree queries. Pairs that barely overlap in this frame are
+#  left out of the check. Only when a measured pair is above
+#  residual_threshold does it run ICP on all pairs and solve a pose graph
+#  with camera 0 fixed, so the corrections stay consistent around the ring
+#  instead of drifting. A full refine takes seconds, LiveFusionStage runs it
+#  on its own thread.
+#
+#  Clouds are (N, 3) or (N, 6) arrays in camera coordinates (mm), the same
+#  arrays FusionEngine.fuse takes, extrinsics are camera-to-world.
+# ******************************************************************************
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.transform import Rotation as R
+
+from fusion_engine import as_extrinsics
+from voxel_grid import voxel_down_sample
+
+NORMAL_NEIGHBOURS = 16
+MIN_CORRESPONDENCES = 64
+
+
+@dataclass
+class IcpResult:
+    transform: np.ndarray  # 4x4, applied to the source points
+    rmse: float  # point-to-plane, inliers only
+    fitness: float  # fraction of source points with a correspondence
+    iterations: int
+
+
+@dataclass
+class RefineStats:
+    checks: int = 0
+    refinements: int = 0
+    last_residual: float = 0.0
+    max_residual: float = 0.0
+
+
+@dataclass
+class _Reference:
+    points: np.ndarray  # (N, 3) float64, camera frame
+    normals: np.ndarray
+    tree: cKDTree
+    age: int = 0
+
+
+def ring_edges(count: int) -> List[Tuple[int, int]]:
+    """Neighbouring camera pairs of a ring rig, (0, 1), (1, 2), ... and (count - 1, 0) to close the loop."""
+    edges = [(i, i + 1) for i in range(count - 1)]
+    if count > 2:
+        edges.append((count - 1, 0))
+    return edges
+
+
+def estimate_normals(points: np.ndarray, tree: cKDTree, neighbours: int = NORMAL_NEIGHBOURS) -> np.ndarray:
+    """Unit normals from the smallest eigenvector of each point's neighbourhood covariance."""
+    _, index = tree.query(points, min(neighbours, len(points)))
+    neighbourhood = points[index]
+    neighbourhood -= neighbourhood.mean(axis=1, keepdims=True)
+    covariance = np.einsum("nki,nkj->nij", neighbourhood, neighbourhood)
+    return np.linalg.eigh(covariance)[1][:, :, 0]
+
+
+def transform_points(points: np.ndarray, transform: np.ndarray) -> np.ndarray:
+    return points @ transform[:3, :3].T + transform[:3, 3]
+
+
+def twist_to_matrix(twist: np.ndarray) -> np.ndarray:
+    """4x4 from (rotation vector, translation)."""
+    transform = np.eye(4)
+    transform[:3, :3] = R.from_rotvec(twist[:3]).as_matrix()
+    transform[:3, 3] = twist[3:]
+    return transform
+
+
+def matrix_to_twist(transform: np.ndarray) -> np.ndarray:
+    return np.concatenate([R.from_matrix(transform[:3, :3]).as_rotvec(), transform[:3, 3]])
+
+
+def _residuals(points: np.ndarray, reference: _Reference, max_distance: float):
+    distances, index = reference.tree.query(points, distance_upper_bound=max_distance)
+    inliers = np.isfinite(distances)
+    matched = index[inliers]
+    normals = reference.normals[matched]
+    residuals = np.einsum("ij,ij->i", reference.points[matched] - points[inliers], normals)
+    return inliers, normals, residuals
+
+
+def point_to_plane_icp(source: np.ndarray, reference: _Reference, max_distance: float,
+                       init: Optional[np.ndarray] = None, max_iterations: int = 30,
+                       tolerance: float = 1e-6) -> IcpResult:
+    """Align source (N, 3) to a reference cloud, returns the transform that maps source onto it."""
+    transform = np.eye(4) if init is None else np.array(init, dtype=np.float64)
+    rmse, fitness, iteration = float("inf"), 0.0, 0
+    for iteration in range(1, max_iterations + 1):
+        moved = transform_points(source, transform)
+        inliers, normals, residuals = _residuals(moved, reference, max_distance)
+        fitness = inliers.mean()
+        if len(residuals) < MIN_CORRESPONDENCES:
+            break
+        rmse = float(np.sqrt(np.mean(residuals ** 2)))
+        # linearized: residual ~ (p x n) . w + n . t
+        jacobian = np.hstack([np.cross(moved[inliers], normals), normals])
+        step = np.linalg.solve(jacobian.T @ jacobian, jacobian.T @ residuals)
+        transform = twist_to_matrix(step) @ transform
+        if np.linalg.norm(step) < tolerance:
+            break
+    return IcpResult(transform, rmse, float(fitness), iteration)
+
+
+def solve_pose_graph(count: int, edges: Sequence[Tuple[int, int]], corrections: Sequence[np.ndarray],
+                     weights: Sequence[float], anchor: int = 0) -> np.ndarray:
+    """Per-camera world corrections C_k, (count, 4, 4), with C_i^-1 C_j as close to each edge's correction as possible.
+
+    corrections are small world-frame transforms that move camera j onto camera i, the problem is solved
+    linearized in (rotation vector, translation), which holds for calibration sized errors.
+    """
+    rows = []
+    targets = []
+    for (i, j), correction, weight in zip(edges, corrections, weights):
+        row = np.zeros((6, 6 * count))
+        row[:, 6 * j:6 * j + 6] = np.eye(6)
+        row[:, 6 * i:6 * i + 6] -= np.eye(6)
+        rows.append(row * weight)
+        targets.append(matrix_to_twist(correction) * weight)
+    # keep the anchor camera where it is
+    row = np.zeros((6, 6 * count))
+    row[:, 6 * anchor:6 * anchor + 6] = np.eye(6)
+    rows.append(row * 1e3)
+    targets.append(np.zeros(6))
+    twists = np.linalg.lstsq(np.vstack(rows), np.concatenate(targets), rcond=None)[0].reshape(count, 6)
+    return np.stack([twist_to_matrix(twist) for twist in twists])
+
+
+class ExtrinsicRefiner:
+    def __init__(self, extrinsics, edges: Optional[Sequence[Tuple[int, int]]] = None, voxel_size: float = 20.0,
+                 max_distance: float = 50.0, residual_threshold: float = 5.0, min_fitness: float = 0.3,
+                 check_points: int = 2000, reference_max_age: int = 300, max_iterations: int = 30):
+        self.extrinsics = as_extrinsics(extrinsics, len(extrinsics)).astype(np.float64)
+        self.device_count = len(self.extrinsics)
+        self.edges = list(edges) if edges is not None else ring_edges(self.device_count)
+        self.voxel_size = voxel_size
+        self.max_distance = max_distance
+        self.residual_threshold = residual_threshold
+        self.min_fitness = min_fitness
+        self.check_points = check_points
+        self.reference_max_age = reference_max_age
+        self.max_iterations = max_iterations
+        self._references: List[Optional[_Reference]] = [None] * self.device_count
+        self._stats = RefineStats()
+
+    def set_reference(self, device_index: int, points: np.ndarray):
+        """Downsample a camera cloud and build its KD-tree and normals."""
+        reduced = voxel_down_sample(points[:, :3], self.voxel_size).astype(np.float64)
+        tree = cKDTree(reduced)
+        self._references[device_index] = _Reference(reduced, estimate_normals(reduced, tree), tree)
+
+    def _relative(self, i: int, j: int) -> np.ndarray:
+        """Camera j to camera i under the current extrinsics."""
+        return np.linalg.inv(self.extrinsics[i]) @ self.extrinsics[j]
+
+    def _edge_residual(self, i: int, j: int, points: np.ndarray) -> float:
+        step = max(1, len(points) // self.check_points)
+        sample = transform_points(points[::step, :3].astype(np.float64), self._relative(i, j))
+        inliers, _, residuals = _residuals(sample, self._references[i], self.max_distance)
+        if len(residuals) < MIN_CORRESPONDENCES or inliers.mean() < self.min_fitness:
+            return float("inf")
+        return float(np.sqrt(np.mean(residuals ** 2)))
+
+    def residuals(self, clouds: Sequence[np.ndarray]) -> List[float]:
+        """Point-to-plane RMSE of every edge, inf where the pair barely overlaps."""
+        self._update_references(clouds)
+        return [self._edge_residual(i, j, clouds[j]) for i, j in self.edges]
+
+    def _update_references(self, clouds: Sequence[np.ndarray]):
+        for device_index, cloud in enumerate(clouds):
+            reference = self._references[device_index]
+            if reference is None or reference.age >= self.reference_max_age:
+                self.set_reference(device_index, cloud)
+            else:
+                reference.age += 1
+
+    def update(self, clouds: Sequence[np.ndarray], force: bool = False) -> bool:
+        """Check the alignment of one set of camera clouds, refine the extrinsics when needed.
+
+        Returns True when the extrinsics changed.
+        """
+        if len(clouds) != self.device_count:
+            raise ValueError(f"Expected {self.device_count} clouds, got {len(clouds)}")
+        # edges without enough overlap in this frame say nothing about the calibration
+        measured = [residual for residual in self.residuals(clouds) if np.isfinite(residual)]
+        worst = max(measured, default=0.0)
+        stats = self._stats
+        stats.checks += 1
+        stats.last_residual = worst
+        stats.max_residual = max(stats.max_residual, worst)
+        if not force and worst <= self.residual_threshold:
+            return False
+        self.refine()
+        stats.refinements += 1
+        return True
+
+    def refine(self):
+        """ICP on every edge between the cached references, then a pose graph over all cameras."""
+        corrections = []
+        weights = []
+        for i, j in self.edges:
+            relative = self._relative(i, j)
+            result = point_to_plane_icp(self._references[j].points, self._references[i], self.max_distance,
+                                        init=relative, max_iterations=self.max_iterations)
+            if result.fitness < self.min_fitness:
+                # no usable overlap, keep the edge at its current pose with little weight
+                corrections.append(np.eye(4))
+                weights.append(1e-3)
+                continue
+            # result.transform = relative refined, expressed as a world frame correction
+            local = result.transform @ np.linalg.inv(relative)
+            corrections.append(self.extrinsics[i] @ local @ np.linalg.inv(self.extrinsics[i]))
+            weights.append(result.fitness)
+        world = solve_pose_graph(self.device_count, self.edges, corrections, weights)
+        self.extrinsics = world @ self.extrinsics
+
+    def stats(self) -> RefineStats:
+        stats = self._stats
+        return RefineStats(stats.checks, stats.refinements, stats.last_residual, stats.max_residual)
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"refine: {stats.refinements} refinements in {stats.checks} checks, "
+                f"residual {stats.last_residual:.2f} mm (max {stats.max_residual:.2f} mm)")
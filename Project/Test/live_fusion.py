@@ -0,0 +1,267 @@
+# ******************************************************************************
+#  Live point cloud fusion stage fed by the capture loop.
+#
+#  Synchronized bundles (one item per device, e.g. a FrameBundle from
+#  FrameMatcher) are pushed into a small overwrite-oldest ring, a worker
+#  thread converts every device to points in parallel, reduces each camera
+#  to its point budget on a voxel grid (the voxel size found for a camera
+#  is where its next frame starts, so this is usually one pass), transforms
+#  everything into the world frame with FusionEngine, optionally reduces the
+#  result on a voxel grid (voxel_size and / or a max_points budget for the
+#  fused frame, see voxel_grid) and emits one fused cloud per trigger. With
+#  an ExtrinsicRefiner a complete trigger is handed to a refine thread at
+#  most every refine_interval_s, which checks the extrinsics and refines them
+#  with ICP when the cameras drift apart. The refined extrinsics replace the
+#  array the worker reads in one reference store, fusion never waits for
+#  ICP and never sees a half updated set. Bundles older than
+#  max_latency_s when the worker gets to them are dropped, so a slow consumer
+#  costs frames instead of growing latency.
+#
+#  The stage does not care where points come from: to_points(device_index,
+#  item) turns one bundle entry into an (N, 3) or (N, 6) array, see
+#  frame_set_points for live FrameSets (eight_net_devices_sync.py feeds the
+#  stage that way with LIVE_FUSION). Recorded or synthetic depth can be fed
+#  the same way. With world_points=True to_points already returns world
+#  coordinates (frame_set_world_points projects depth straight into the
+#  world frame with DepthProjector) and the clouds are only concatenated.
+# ******************************************************************************
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, List, Optional, Sequence
+
+import numpy as np
+
+from depth_projection import DepthProjector
+from fusion_engine import FusionEngine, as_extrinsics
+from ring_buffer import RingBuffer
+from voxel_grid import voxel_down_sample, voxel_down_sample_to_budget
+
+FPS_WINDOW = 30  # fused frames used for the frame rate
+VOXEL_REFIT = 0.8  # a camera that kept fewer points than this share of its budget starts its next frame finer
+
+
+@dataclass
+class FusedCloud:
+    timestamp_us: int
+    points: np.ndarray  # (N, 3) or (N, 6) float32 in the world frame
+    cameras: List[int]  # devices that contributed points
+    latency_s: float  # push() to fused
+
+
+@dataclass
+class FusionStats:
+    fused: int = 0
+    dropped_stale: int = 0
+    dropped_overflow: int = 0
+    failed: int = 0
+    fps: float = 0.0
+    latency_avg_s: float = 0.0
+    latency_max_s: float = 0.0
+
+
+def frame_set_points(camera_params: Sequence, with_color: bool = False) -> Callable[[int, Any], np.ndarray]:
+    """to_points for live FrameSets, one camera param per device."""
+    def to_points(device_index: int, frames) -> np.ndarray:
+        if with_color:
+            return frames.get_color_point_cloud(camera_params[device_index], remove_zero_depth=True)
+        return frames.get_point_cloud(camera_params[device_index], remove_zero_depth=True)
+    return to_points
+
+
+def frame_set_world_points(projectors: Sequence[DepthProjector]) -> Callable[[int, Any], np.ndarray]:
+    """to_points for live FrameSets that skips PointCloudFilter, use with world_points=True."""
+    def to_points(device_index: int, frames) -> Optional[np.ndarray]:
+        depth_frame = frames.get_depth_frame()
+        if depth_frame is None:
+            return None
+        return projectors[device_index].project_frame(depth_frame)
+    return to_points
+
+
+class LiveFusionStage:
+    def __init__(self, extrinsics, to_points: Callable[[int, Any], np.ndarray],
+                 points_budget: Optional[Sequence[int]] = None, max_latency_s: float = 0.1,
+                 queue_size: int = 2, num_workers: int = 4, voxel_size: float = 0.0, max_points: int = 0,
+                 refiner=None, refine_interval_s: float = 1.0, world_points: bool = False,
+                 on_fused: Optional[Callable[[FusedCloud], None]] = None):
+        self.extrinsics = as_extrinsics(extrinsics, len(extrinsics))
+        self.device_count = len(self.extrinsics)
+        self.to_points = to_points
+        self.points_budget = list(points_budget) if points_budget is not None else [0] * self.device_count
+        if len(self.points_budget) != self.device_count:
+            raise ValueError(f"Expected {self.device_count} point budgets, got {len(self.points_budget)}")
+        self._camera_voxel_sizes = [0.0] * self.device_count
+        self._camera_counts = [0] * self.device_count
+        self.max_latency_s = max_latency_s
+        self.voxel_size = voxel_size
+        self.max_points = max_points
+        if refiner is not None and world_points:
+            raise ValueError("refiner needs camera space points, it cannot be used with world_points")
+        self.refiner = refiner
+        self.refine_interval_s = refine_interval_s
+        self.world_points = world_points
+        self.on_fused = on_fused
+        self._engine = FusionEngine()
+        self._input = RingBuffer(queue_size)
+        self._output = RingBuffer(queue_size)
+        self._executor = ThreadPoolExecutor(num_workers, thread_name_prefix="LiveFusion")
+        self._stats = FusionStats()
+        self._fused_times: Deque[float] = deque(maxlen=FPS_WINDOW)
+        self._latency_total_s = 0.0
+        self._wakeup = threading.Event()
+        self._stop = False
+        # camera clouds of the newest complete trigger for the refine thread, older ones are overwritten
+        self._refine_input = RingBuffer(1)
+        self._refine_wakeup = threading.Event()
+        self._last_refine_time = 0.0
+        self._refine_worker = None
+        if refiner is not None:
+            self._refine_worker = threading.Thread(target=self._run_refiner, name="LiveFusionRefiner", daemon=True)
+            self._refine_worker.start()
+        self._worker = threading.Thread(target=self._run, name="LiveFusionStage", daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def push(self, timestamp_us: int, items: Sequence[Any]):
+        """Queue one trigger, items holds one entry per device, None for devices that missed it."""
+        if len(items) != self.device_count:
+            raise ValueError(f"Expected {self.device_count} items, got {len(items)}")
+        self._input.push((timestamp_us, items, time.perf_counter()))
+        self._wakeup.set()
+
+    def push_bundle(self, bundle):
+        """Queue a FrameBundle from FrameMatcher."""
+        self.push(bundle.timestamp_us, bundle.frames)
+
+    def latest(self) -> Optional[FusedCloud]:
+        """Newest fused cloud not taken yet, older ones are skipped."""
+        return self._output.pop_latest()
+
+    def get(self, timeout: float = 0.0) -> Optional[FusedCloud]:
+        """Oldest fused cloud not taken yet."""
+        return self._output.pop(timeout)
+
+    def _convert(self, device_index: int, item: Any) -> Optional[np.ndarray]:
+        if item is None:
+            return None
+        points = self.to_points(device_index, item)
+        if points is None or len(points) == 0:
+            return None
+        budget = self.points_budget[device_index]
+        if budget <= 0 or len(points) <= budget:
+            return points
+        voxel_size = self._camera_voxel_sizes[device_index]
+        count = self._camera_counts[device_index]
+        if 0 < count < budget * VOXEL_REFIT:
+            # the voxel size only grows inside voxel_down_sample_to_budget, shrink it for a sparser scene
+            voxel_size *= math.sqrt(count / budget)
+        points, voxel_size = voxel_down_sample_to_budget(points, budget, voxel_size)
+        self._camera_voxel_sizes[device_index] = voxel_size
+        self._camera_counts[device_index] = len(points)
+        return points
+
+    def _reduce(self, points: np.ndarray) -> np.ndarray:
+        if self.max_points > 0:
+            return voxel_down_sample_to_budget(points, self.max_points, self.voxel_size)[0]
+        if self.voxel_size > 0:
+            return voxel_down_sample(points, self.voxel_size)
+        return points
+
+    def _run(self):
+        while not self._stop:
+            self._wakeup.clear()
+            entry = self._input.pop()
+            if entry is None:
+                self._wakeup.wait(0.01)
+                continue
+            timestamp_us, items, push_time = entry
+            if time.perf_counter() - push_time > self.max_latency_s:
+                self._stats.dropped_stale += 1
+                continue
+            try:
+                clouds = list(self._executor.map(self._convert, range(self.device_count), items))
+                cameras = [i for i, cloud in enumerate(clouds) if cloud is not None]
+                if not cameras:
+                    continue
+                if self.refiner is not None and len(cameras) == self.device_count:
+                    self._submit_refine(clouds)
+                extrinsics = self.extrinsics  # one snapshot per trigger, the refine thread may replace it
+                clouds = [clouds[i] for i in cameras]
+                channels = clouds[0].shape[1]
+                points = np.empty((sum(len(cloud) for cloud in clouds), channels), dtype=np.float32)
+                if self.world_points:
+                    np.concatenate(clouds, out=points)
+                else:
+                    self._engine.fuse(clouds, extrinsics[cameras], out=points)
+                points = self._reduce(points)
+            except Exception as e:
+                print(f"Fusion of trigger {timestamp_us} failed: {e}")
+                self._stats.failed += 1
+                continue
+            now = time.perf_counter()
+            fused = FusedCloud(timestamp_us, points, cameras, now - push_time)
+            self._record(fused, now)
+            self._output.push(fused)
+            if self.on_fused is not None:
+                self.on_fused(fused)
+
+    def _submit_refine(self, clouds: List[np.ndarray]):
+        now = time.perf_counter()
+        if now - self._last_refine_time < self.refine_interval_s:
+            return
+        self._last_refine_time = now
+        self._refine_input.push(clouds)
+        self._refine_wakeup.set()
+
+    def _run_refiner(self):
+        while not self._stop:
+            self._refine_wakeup.clear()
+            clouds = self._refine_input.pop()
+            if clouds is None:
+                self._refine_wakeup.wait(0.1)
+                continue
+            try:
+                if self.refiner.update(clouds):
+                    # a new array, the worker keeps fusing with the one it already read
+                    self.extrinsics = self.refiner.extrinsics.astype(np.float32)
+            except Exception as e:
+                print(f"Extrinsic refinement failed: {e}")
+
+    def _record(self, fused: FusedCloud, now: float):
+        stats = self._stats
+        stats.fused += 1
+        self._latency_total_s += fused.latency_s
+        stats.latency_avg_s = self._latency_total_s / stats.fused
+        stats.latency_max_s = max(stats.latency_max_s, fused.latency_s)
+        self._fused_times.append(now)
+        if len(self._fused_times) > 1:
+            stats.fps = (len(self._fused_times) - 1) / (self._fused_times[-1] - self._fused_times[0])
+
+    def stats(self) -> FusionStats:
+        stats = self._stats
+        return FusionStats(stats.fused, stats.dropped_stale, self._input.dropped, stats.failed,
+                           stats.fps, stats.latency_avg_s, stats.latency_max_s)
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (f"fusion: {stats.fused} fused ({stats.fps:.1f} fps), latency {stats.latency_avg_s * 1000:.1f} ms "
+                f"(max {stats.latency_max_s * 1000:.1f} ms), dropped {stats.dropped_stale} stale "
+                f"{stats.dropped_overflow} overflow, failed {stats.failed}")
+
+    def close(self):
+        self._stop = True
+        self._wakeup.set()
+        self._refine_wakeup.set()
+        self._worker.join()
+        if self._refine_worker is not None:
+            self._refine_worker.join()
+        self._executor.shutdown(wait=True)
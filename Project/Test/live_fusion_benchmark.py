@@ -0,0 +1,67 @@
+# ******************************************************************************
+#  Feed LiveFusionStage with synthetic depth frames from 8 cameras at the
+#  camera frame rate and report the fused frame rate and latency, once with
+#  camera space points transformed by FusionEngine and once with
+#  DepthProjector projecting every STRIDE-th pixel straight into the world
+#  frame.
+#
+#  usage: python live_fusion_benchmark.py
+# ******************************************************************************
+import time
+
+import numpy as np
+from scipy.spatial.transform import Rotation as R
+
+from depth_projection import DepthProjector
+from depth_projection import depth_to_points as project_depth
+from live_fusion import LiveFusionStage
+
+DEVICES = 8
+DEPTH_WIDTH = 640
+DEPTH_HEIGHT = 576
+INTRINSICS = (504.0, 504.0, 320.0, 288.0, DEPTH_WIDTH, DEPTH_HEIGHT)  # fx, fy, cx, cy, width, height
+FPS = 30
+SECONDS = 5
+POINTS_BUDGET = 100000
+STRIDE = 2  # DepthProjector pixel stride, about 74k points per camera
+
+
+def depth_to_points(depth: np.ndarray) -> np.ndarray:
+    return project_depth(depth, INTRINSICS)
+
+
+def make_extrinsics() -> np.ndarray:
+    extrinsics = np.tile(np.eye(4, dtype=np.float32), (DEVICES, 1, 1))
+    for i in range(DEVICES):
+        extrinsics[i, :3, :3] = R.from_euler('y', 360.0 / DEVICES * i, degrees=True).as_matrix()
+        extrinsics[i, :3, 3] = extrinsics[i, :3, :3] @ np.array([0, 0, -1500.0])
+    return extrinsics
+
+
+def run(stage: LiveFusionStage, depth_frames, label: str):
+    with stage:
+        start = time.perf_counter()
+        for k in range(FPS * SECONDS):
+            stage.push(k * 1000000 // FPS, depth_frames)
+            stage.latest()
+            time.sleep(max(0.0, start + (k + 1) / FPS - time.perf_counter()))
+        time.sleep(0.2)
+        print(f"{label}: {stage.format_stats()}")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    depth_frames = [rng.integers(500, 3000, size=(DEPTH_HEIGHT, DEPTH_WIDTH), dtype=np.uint16)
+                    for _ in range(DEVICES)]
+    for depth in depth_frames:
+        depth[rng.random(depth.shape) < 0.2] = 0
+    extrinsics = make_extrinsics()
+    print(f"{DEVICES} cameras {DEPTH_WIDTH}x{DEPTH_HEIGHT} at {FPS} fps, budget {POINTS_BUDGET} points per camera")
+    run(LiveFusionStage(extrinsics, lambda i, depth: depth_to_points(depth),
+                        points_budget=[POINTS_BUDGET] * DEVICES), depth_frames, "camera points + FusionEngine")
+    projectors = [DepthProjector(INTRINSICS, extrinsic, stride=STRIDE) for extrinsic in extrinsics]
+    run(LiveFusionStage(extrinsics, lambda i, depth: projectors[i].project(depth), world_points=True),
+        depth_frames, f"DepthProjector world points, stride {STRIDE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# ******************************************************************************
+#  MJPG decode pool for multi-camera color streams.
+#
+#  Color frames are fanned out to worker threads (cv2.imdecode releases the
+#  GIL while it decodes), results come back per device in submission order.
+#  Preview paths can decode at 1/2, 1/4 or 1/8 scale, which libjpeg does much
+#  faster than a full decode followed by a resize. Frames in other formats
+#  are converted with frame_to_bgr_image in the workers as well.
+#
+#  submit(), poll() and get() are meant to be called from one consumer thread.
+# ******************************************************************************
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Deque, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from pyorbbecsdk import OBFormat, VideoFrame
+from utils import frame_to_bgr_image
+
+IMREAD_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+@dataclass
+class DecodedFrame:
+    device_index: int
+    tag: Any
+    image: Optional[np.ndarray]  # BGR, None when decoding failed
+    decode_s: float  # time spent decoding in the worker
+    latency_s: float  # submit() to decoded, includes waiting for a worker
+
+
+@dataclass
+class DecodeStats:
+    decoded: int = 0
+    dropped: int = 0
+    failed: int = 0
+    decode_total_s: float = 0.0
+    latency_total_s: float = 0.0
+    latency_max_s: float = 0.0
+
+
+class MjpgDecodePool:
+    def __init__(self, device_count: int, num_workers: int = 4, reduce: int = 1, max_pending: int = 4):
+        if reduce not in IMREAD_FLAGS:
+            raise ValueError(f"reduce must be one of {sorted(IMREAD_FLAGS)}, got {reduce}")
+        if max_pending < 1:
+            raise ValueError("max_pending must be positive")
+        self.reduce = reduce
+        self.max_pending = max_pending
+        self._imread_flag = IMREAD_FLAGS[reduce]
+        self._executor = ThreadPoolExecutor(num_workers, thread_name_prefix="MjpgDecode")
+        self._pending: List[Deque[Tuple[Any, Future, float]]] = [deque() for _ in range(device_count)]
+        self._stats = [DecodeStats() for _ in range(device_count)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, device_index: int, frame: VideoFrame, tag: Any = None):
+        """Queue a color frame, the oldest pending frame of the device is dropped when max_pending is reached."""
+        pending = self._pending[device_index]
+        if len(pending) >= self.max_pending:
+            _, future, _ = pending.popleft()
+            future.cancel()
+            self._stats[device_index].dropped += 1
+        pending.append((tag, self._executor.submit(self._decode, frame), time.perf_counter()))
+
+    def _decode(self, frame: VideoFrame) -> Tuple[Optional[np.ndarray], float, float]:
+        start = time.perf_counter()
+        if frame.get_format() == OBFormat.MJPG:
+            image = cv2.imdecode(frame.get_data_view().reshape(-1), self._imread_flag)
+        else:
+            image = frame_to_bgr_image(frame)
+            if image is not None and self.reduce > 1:
+                size = (image.shape[1] // self.reduce, image.shape[0] // self.reduce)
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        end = time.perf_counter()
+        return image, end - start, end
+
+    def _collect(self, device_index: int, timeout: Optional[float]) -> Optional[DecodedFrame]:
+        pending = self._pending[device_index]
+        tag, future, submit_time = pending[0]
+        try:
+            image, decode_s, end = future.result(timeout)
+        except FutureTimeoutError:
+            return None
+        except CancelledError:
+            pending.popleft()
+            return None
+        except Exception as e:
+            print(f"Device {device_index} decode failed: {e}")
+            image, decode_s, end = None, 0.0, time.perf_counter()
+        pending.popleft()
+        stats = self._stats[device_index]
+        latency_s = end - submit_time
+        if image is None:
+            stats.failed += 1
+        else:
+            stats.decoded += 1
+            stats.decode_total_s += decode_s
+            stats.latency_total_s += latency_s
+            stats.latency_max_s = max(stats.latency_max_s, latency_s)
+        return DecodedFrame(device_index, tag, image, decode_s, latency_s)
+
+    def poll(self, device_index: int) -> List[DecodedFrame]:
+        """Return the decoded frames of a device that are ready, in submission order, without waiting."""
+        results = []
+        pending = self._pending[device_index]
+        while pending and pending[0][1].done():
+            decoded = self._collect(device_index, 0)
+            if decoded is not None:
+                results.append(decoded)
+        return results
+
+    def get(self, device_index: int, timeout: Optional[float] = None) -> Optional[DecodedFrame]:
+        """Wait for the oldest pending frame of a device, None if nothing is pending or on timeout."""
+        while self._pending[device_index]:
+            if not self._pending[device_index][0][1].cancelled():
+                return self._collect(device_index, timeout)
+            self._pending[device_index].popleft()
+        return None
+
+    def pending(self, device_index: int) -> int:
+        return len(self._pending[device_index])
+
+    def stats(self, device_index: int) -> DecodeStats:
+        stats = self._stats[device_index]
+        return DecodeStats(stats.decoded, stats.dropped, stats.failed, stats.decode_total_s,
+                           stats.latency_total_s, stats.latency_max_s)
+
+    def format_stats(self) -> str:
+        lines = []
+        for device_index, stats in enumerate(self._stats):
+            decoded = max(stats.decoded, 1)
+            lines.append(f"device {device_index} decode: {stats.decoded} frames, "
+                         f"decode {stats.decode_total_s / decoded * 1000:.1f} ms, "
+                         f"latency {stats.latency_total_s / decoded * 1000:.1f} ms "
+                         f"(max {stats.latency_max_s * 1000:.1f} ms), "
+                         f"dropped {stats.dropped} failed {stats.failed}")
+        return "\n".join(lines)
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
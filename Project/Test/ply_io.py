@@ -0,0 +1,128 @@
+# ******************************************************************************
+#  Binary PLY reading and writing for point cloud arrays.
+#
+#  Arrays follow the layout returned by FrameSet.get_point_cloud, (N, 3)
+#  x/y/z, and FrameSet.get_color_point_cloud, (N, 6) x/y/z/r/g/b with colors
+#  in [0, 255]. Files are written as binary little endian PLY with a single
+#  buffer write, colors are stored as uchar red/green/blue like the plyfile
+#  based scripts did.
+# ******************************************************************************
+import os
+from typing import List, Tuple, Union
+
+import numpy as np
+
+POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4')])
+COLOR_POINT_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                              ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+
+# PLY property type -> numpy type
+PLY_TO_NUMPY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+NUMPY_TO_PLY_TYPES = {'i1': 'char', 'u1': 'uchar', 'i2': 'short', 'u2': 'ushort',
+                      'i4': 'int', 'u4': 'uint', 'f4': 'float', 'f8': 'double'}
+
+
+def to_vertex_array(points: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) or (N, 6) point array to the on-disk vertex layout."""
+    points = np.asarray(points)
+    if points.ndim != 2 or points.shape[1] not in (3, 6):
+        raise ValueError(f"Expected an (N, 3) or (N, 6) point array, got shape {points.shape}")
+    if points.shape[1] == 3:
+        # x/y/z float32 rows already match the PLY vertex layout
+        return np.ascontiguousarray(points, dtype='<f4').view(POINT_DTYPE).reshape(-1)
+    vertex = np.empty(points.shape[0], dtype=COLOR_POINT_DTYPE)
+    vertex['x'] = points[:, 0]
+    vertex['y'] = points[:, 1]
+    vertex['z'] = points[:, 2]
+    colors = np.clip(points[:, 3:6], 0, 255)
+    vertex['red'] = colors[:, 0]
+    vertex['green'] = colors[:, 1]
+    vertex['blue'] = colors[:, 2]
+    return vertex
+
+
+def make_ply_header(vertex_count: int, dtype: np.dtype) -> bytes:
+    lines = ["ply", "format binary_little_endian 1.0", f"element vertex {vertex_count}"]
+    for name in dtype.names:
+        field_type = dtype.fields[name][0]
+        lines.append(f"property {NUMPY_TO_PLY_TYPES[field_type.str[1:]]} {name}")
+    lines.append("end_header")
+    return ("\n".join(lines) + "\n").encode("ascii")
+
+
+def write_ply(file_path: Union[str, os.PathLike], points: np.ndarray) -> int:
+    """Write an (N, 3) or (N, 6) point array as binary PLY, returns the point count."""
+    vertex = to_vertex_array(points)
+    with open(file_path, "wb") as f:
+        f.write(make_ply_header(len(vertex), vertex.dtype))
+        f.write(vertex.data)
+    return len(vertex)
+
+
+def parse_ply_header(f) -> Tuple[str, List[Tuple[str, int, List[Tuple[str, str]]]]]:
+    """Read the header from a binary file object, leaves it at the first data byte."""
+    if f.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file")
+    file_format = None
+    elements = []
+    while True:
+        line = f.readline()
+        if not line:
+            raise ValueError("Unexpected end of file in PLY header")
+        words = line.decode("ascii").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            break
+        if words[0] == "format":
+            file_format = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            if not elements:
+                raise ValueError("PLY property declared before any element")
+            if words[1] == "list":
+                raise ValueError("PLY list properties are not supported")
+            elements[-1][2].append((words[2], words[1]))
+    if file_format is None:
+        raise ValueError("PLY header has no format line")
+    return file_format, elements
+
+
+def read_ply(file_path: Union[str, os.PathLike]) -> np.ndarray:
+    """Read the vertices of a PLY file as (N, 3), or (N, 6) when it has colors, float32."""
+    with open(file_path, "rb") as f:
+        file_format, elements = parse_ply_header(f)
+        if not elements or elements[0][0] != "vertex":
+            raise ValueError("PLY file must start with a vertex element")
+        _, count, properties = elements[0]
+        if file_format == "ascii":
+            columns = np.loadtxt(f, dtype=np.float64, max_rows=count, ndmin=2)
+            data = {name: columns[:, i] for i, (name, _) in enumerate(properties)}
+        elif file_format in ("binary_little_endian", "binary_big_endian"):
+            byte_order = "<" if file_format == "binary_little_endian" else ">"
+            dtype = np.dtype([(name, byte_order + PLY_TO_NUMPY_TYPES[ply_type])
+                              for name, ply_type in properties])
+            data = np.fromfile(f, dtype=dtype, count=count)
+            if len(data) != count:
+                raise ValueError(f"PLY file has {len(data)} of {count} vertices")
+        else:
+            raise ValueError(f"Unsupported PLY format: {file_format}")
+    names = [name for name, _ in properties]
+    if not all(axis in names for axis in ("x", "y", "z")):
+        raise ValueError("PLY vertex element has no x/y/z properties")
+    has_color = all(channel in names for channel in ("red", "green", "blue"))
+    fields = ("x", "y", "z", "red", "green", "blue") if has_color else ("x", "y", "z")
+    points = np.empty((count, len(fields)), dtype=np.float32)
+    for i, name in enumerate(fields):
+        points[:, i] = data[name]
+    return points
@@ -0,0 +1,76 @@
+# ******************************************************************************
+#  Compare the plyfile based save path used by the capture scripts with the
+#  binary writer in ply_io on a synthetic Femto Mega sized depth point cloud.
+#
+#  usage: python ply_io_benchmark.py
+# ******************************************************************************
+import os
+import tempfile
+import time
+
+import numpy as np
+from plyfile import PlyData, PlyElement
+
+from ply_io import read_ply, write_ply
+
+DEPTH_WIDTH = 640
+DEPTH_HEIGHT = 576
+REPEAT = 3
+
+
+def make_points(with_color: bool) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    count = DEPTH_WIDTH * DEPTH_HEIGHT
+    points = rng.uniform(-2000, 2000, size=(count, 6 if with_color else 3)).astype(np.float32)
+    if with_color:
+        points[:, 3:] = rng.integers(0, 256, size=(count, 3))
+    return points
+
+
+def plyfile_write(file_path: str, points: np.ndarray):
+    # Same code the capture scripts used before ply_io
+    if points.shape[1] == 3:
+        dtype = [('x', 'f4'), ('y', 'f4'), ('z', 'f4')]
+    else:
+        dtype = [('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')]
+    points_array = np.array([tuple(point) for point in points], dtype=dtype)
+    el = PlyElement.describe(points_array, 'vertex')
+    PlyData([el], text=True).write(file_path)
+
+
+def plyfile_read(file_path: str) -> np.ndarray:
+    vertex = PlyData.read(file_path)['vertex']
+    return np.stack([vertex['x'], vertex['y'], vertex['z']], axis=-1)
+
+
+def best_time(func, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for with_color in (False, True):
+            points = make_points(with_color)
+            name = "color points" if with_color else "points"
+            old_path = os.path.join(tmp_dir, "plyfile.ply")
+            new_path = os.path.join(tmp_dir, "ply_io.ply")
+            old_write = best_time(plyfile_write, old_path, points)
+            new_write = best_time(write_ply, new_path, points)
+            old_read = best_time(plyfile_read, old_path)
+            new_read = best_time(read_ply, new_path)
+            assert np.array_equal(read_ply(new_path)[:, :3], points[:, :3])
+            print(f"{name} x {len(points)}:")
+            print(f"  write  plyfile(text) {old_write * 1000:8.1f} ms  {os.path.getsize(old_path) / 1e6:6.1f} MB"
+                  f" | ply_io(binary) {new_write * 1000:8.1f} ms  {os.path.getsize(new_path) / 1e6:6.1f} MB"
+                  f" | {old_write / new_write:6.1f}x")
+            print(f"  read   plyfile(text) {old_read * 1000:8.1f} ms"
+                  f" | ply_io(binary) {new_read * 1000:8.1f} ms | {old_read / new_read:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,75 @@
 import open3d as o3d  
-import numpy as np  
-from scipy.spatial.transform import Rotation as R  
-import copy  # 导入copy模块
 import os
 import os.path
-from plyfile import PlyData, PlyElement
+from ply_io import read_ply, write_ply
+from fusion_engine import FusionEngine, to_open3d
+from voxel_grid import voxel_down_sample
+from icp_refine import ExtrinsicRefiner
+from extrinsics_store import ExtrinsicsStore, read_sync_serials
 # 点云存放路径文件夹
 point_cloud_save_dir = "E:\\Project\\SZUer-explode-XiAn\\aobi-multicam\\Project\\Test\\pointclouds"
 merged_point_clouds_save_dir = "E:\\Project\\SZUer-explode-XiAn\\aobi-multicam\\Project\\Test\\merged_point_clouds"
+# 多设备同步配置和按序列号保存的外参标定文件
+config_dir = os.path.join(os.path.abspath(os.path.dirname(__file__)), "../config")
+sync_config_path = os.path.join(config_dir, "multi_device_sync_config.json")
+extrinsics_path = os.path.join(config_dir, "multi_device_extrinsics.json")
+# 体素下采样边长(mm)，相机重叠区域的重复点合并为体素质心，0表示不下采样
+VOXEL_SIZE = 5.0
 
 
-def load_ply(file_path):  
-    pcd = o3d.io.read_point_cloud(file_path)  
-    return pcd  
-  
-def load_point_clouds_from_folder(folder_path):
+def load_point_clouds_by_serial(folder_path, serial_numbers):
+    # 按序列号取每台相机最新的点云文件(points_<序列号>_<时间戳>.ply)，顺序与serial_numbers一致
+    # 没有点云文件的设备跳过(例如只保存了其中4台)，返回实际加载到的序列号和点云
+    found_serial_numbers = []
     point_clouds = []
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith('.ply'):  # 根据需要调整文件扩展名
-            file_path = os.path.join(folder_path, file_name)
-            pcd = o3d.io.read_point_cloud(file_path)
-            point_clouds.append(pcd)
-            print('加载点云文件：' + file_path)
-    return point_clouds
+    file_names = os.listdir(folder_path)
+    for serial_number in serial_numbers:
+        prefix = 'points_' + serial_number + '_'
+        candidates = [name for name in file_names if name.startswith(prefix) and name.endswith('.ply')]
+        if not candidates:
+            print('设备' + serial_number + '没有点云文件，跳过')
+            continue
+        file_name = max(candidates, key=lambda name: int(name[len(prefix):-len('.ply')]))
+        file_path = os.path.join(folder_path, file_name)
+        point_clouds.append(read_ply(file_path))  # 直接读成(N,3)/(N,6)数组，不经过Open3D
+        found_serial_numbers.append(serial_number)
+        print('加载点云文件：' + file_path)
+    if not point_clouds:
+        raise FileNotFoundError('没有找到任何设备的点云文件：' + folder_path)
+    return found_serial_numbers, point_clouds
 
 
-def create_transform_matrix(euler_angles, translation_vector):  
-    # 将欧拉角从度转换为弧度  
-    euler_radians = np.radians(euler_angles)  
-    # 使用scipy的Rotation类从欧拉角创建旋转矩阵  
-    rot_matrix = R.from_euler('zyx', euler_radians, degrees=False).as_matrix()  # 注意这里的'zyx'顺序可能需要根据实际情况调整  
-    # 创建齐次变换矩阵  
-    transform_matrix = np.eye(4)  
-    transform_matrix[:3, :3] = rot_matrix  
-    transform_matrix[:3, 3] = translation_vector  
-    return transform_matrix  
-  
-def transform_pcd(pcd, transform):  
-    pcd.transform(transform)  
-  
-def concatenate_point_clouds(pcds):  
-    merged_pcd = pcds[0]  
-    for i in range(1, len(pcds)):  
-        merged_pcd += pcds[i]  
-    return merged_pcd  
-  
-
-def save_point_cloud(pcd, file_path):
-    o3d.io.write_point_cloud(file_path, pcd)
+# 加载点云 
 
+# 同步配置里有点云文件的设备参与拼接，点云列表与序列号一一对应
+serial_numbers, point_cloads_list = load_point_clouds_by_serial(point_cloud_save_dir,
+                                                                read_sync_serials(sync_config_path))
+# 外参文件只加载一次，参与拼接的每台设备都必须有外参
+extrinsics_store = ExtrinsicsStore.load(extrinsics_path)
+extrinsics_store.validate(serial_numbers)
+# (N,4,4) float32外参，所有相机在一次批量运算中变换
+extrinsics = extrinsics_store.stack(serial_numbers)
 
-# 加载点云 
+# 标定文件中的外参作为初值，相邻相机之间做点到面ICP，再用位姿图统一修正，减小标定误差
+refiner = ExtrinsicRefiner(extrinsics)
+if refiner.update(point_cloads_list):
+    extrinsics = refiner.extrinsics
+print(refiner.format_stats())
 
-# 加载点云列表
-point_cloads_list = load_point_clouds_from_folder(point_cloud_save_dir)
-translation_vector_list = [np.array([-1060,0,440]),np.array([-1500,0,1500]),np.array([-1060,0,440+1060*2]),
-                           np.array([0,0,3100]),np.array([1060,0,440+1060*2]),np.array([1500,0,1500]),
-                           np.array([1060,0,440])]
-i = 0
-for pcd in point_cloads_list:
-    if i == 0:
-        merged_pcd = pcd
-        i = i + 1
-        continue
-    # 假设的旋转角度（以度为单位）和平移向量（以米为单位）  
-    #euler_angles = np.array([-0.0077, -0.1641, -0.0065])  # 注意这里的顺序可能需要根据你的实际情况调整 
-    #euler_angles = np.array([-0.4414, -9.4, -0.37]) 
-    euler_angles = np.array([0, 45*i, 0]) 
-    #translation_vector = np.array([508.7920, 1.2722, 531.4581]) / 1000.0  # 修正了第三个值  
-    translation_vector = translation_vector_list[i-1]
-    # 创建变换矩阵  
-    transform_matrix = create_transform_matrix(euler_angles, translation_vector)  
-    
-    # 对第二个点云进行变换  
-    pcd2_transformed = copy.deepcopy(pcd)  # 使用deepcopy来复制pcd2  
-    transform_pcd(pcd2_transformed, transform_matrix) 
-    
-    # 拼接点云  
-    merged_pcd = concatenate_point_clouds([merged_pcd, pcd2_transformed]) 
-    print('第' + str(i) + '个点云拼接完成')
-    i = i + 1
+# 一次性把所有点云变换并写入同一个预分配的缓冲区，总耗时与点数成线性关系
+fusion_engine = FusionEngine(extrinsics)
+merged_points = fusion_engine.fuse(point_cloads_list)
+print('共' + str(len(point_cloads_list)) + '个点云拼接完成')
+if VOXEL_SIZE > 0:
+    merged_points = voxel_down_sample(merged_points, VOXEL_SIZE)
+    print('体素下采样后剩余' + str(len(merged_points)) + '个点')
     # 可视化结果  
-o3d.visualization.draw_geometries([merged_pcd])  
+o3d.visualization.draw_geometries([to_open3d(merged_points)])  
 
 # 保存变换后的点云
 
 points_filename = os.path.join(merged_point_clouds_save_dir, f"merged_pcd.ply")
-# 将 merged_pcd 转换为 numpy 数组
-points = np.asarray(merged_pcd.points)
-
-# 创建适合 PlyElement.describe 的结构化数组
-vertex = np.array([(point[0], point[1], point[2]) for point in points],
-                  dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4')])
-
-# 创建 PlyElement
-el = PlyElement.describe(vertex, 'vertex')
-
-# 保存 PlyData
-PlyData([el], text=True).write(points_filename)
+# 以二进制PLY一次性写入
+write_ply(points_filename, merged_points)
 print('点云保存完成')
 
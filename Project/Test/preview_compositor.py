@@ -0,0 +1,83 @@
+# ******************************************************************************
+#  Tiled preview of many cameras in a single window.
+#
+#  Every device gets a cell in a grid, a cell holds one tile per row (color on
+#  top of depth by default). Tiles are views into one preallocated BGR mosaic,
+#  images are resized straight into them, so drawing allocates nothing. The
+#  window is refreshed at most max_fps times per second and the GUI event
+#  loop runs once per refresh, callers check due() to skip converting frames
+#  that would never be shown.
+# ******************************************************************************
+import math
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+class PreviewCompositor:
+    def __init__(self, window_name: str, device_count: int, tile_width: int = 480, tile_height: int = 270,
+                 rows_per_device: int = 2, columns: Optional[int] = None, max_fps: float = 15.0):
+        if device_count < 1 or rows_per_device < 1:
+            raise ValueError("device_count and rows_per_device must be positive")
+        self.window_name = window_name
+        self.device_count = device_count
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.rows_per_device = rows_per_device
+        self.columns = columns or math.ceil(math.sqrt(device_count))
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        grid_rows = math.ceil(device_count / self.columns)
+        self.mosaic = np.zeros((grid_rows * rows_per_device * tile_height, self.columns * tile_width, 3),
+                               dtype=np.uint8)
+        self._tiles: List[List[np.ndarray]] = []
+        for device_index in range(device_count):
+            x = (device_index % self.columns) * tile_width
+            y = (device_index // self.columns) * rows_per_device * tile_height
+            self._tiles.append([self.mosaic[y + row * tile_height:y + (row + 1) * tile_height, x:x + tile_width]
+                                for row in range(rows_per_device)])
+        self._last_show = 0.0
+
+    @property
+    def tile_size(self):
+        """(width, height) of a tile, the dsize argument for cv2.resize."""
+        return self.tile_width, self.tile_height
+
+    def tile(self, device_index: int, row: int = 0) -> np.ndarray:
+        """Writable (tile_height, tile_width, 3) BGR view into the mosaic."""
+        return self._tiles[device_index][row]
+
+    def draw(self, device_index: int, row: int, image: np.ndarray):
+        """Resize a BGR or single channel image into a tile."""
+        tile = self._tiles[device_index][row]
+        if image.ndim == 2:
+            if image.shape[:2] != (self.tile_height, self.tile_width):
+                image = cv2.resize(image, self.tile_size, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(image, cv2.COLOR_GRAY2BGR, dst=tile)
+        elif image.shape[:2] == (self.tile_height, self.tile_width):
+            np.copyto(tile, image)
+        else:
+            cv2.resize(image, self.tile_size, dst=tile, interpolation=cv2.INTER_AREA)
+
+    def clear(self, device_index: int, row: Optional[int] = None):
+        rows = range(self.rows_per_device) if row is None else (row,)
+        for r in rows:
+            self._tiles[device_index][r].fill(0)
+
+    def label(self, device_index: int, text: str):
+        cv2.putText(self._tiles[device_index][0], text, (8, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (255, 255, 255), 2, cv2.LINE_AA)
+
+    def due(self) -> bool:
+        """True when the next show() would be at or after the display rate cap."""
+        return time.monotonic() - self._last_show >= self.min_interval
+
+    def show(self) -> int:
+        """Show the mosaic and run the GUI event loop once, returns the key code or -1."""
+        self._last_show = time.monotonic()
+        cv2.imshow(self.window_name, self.mosaic)
+        return cv2.waitKey(1)
+
+    def close(self):
+        cv2.destroyWindow(self.window_name)
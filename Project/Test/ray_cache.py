@@ -0,0 +1,130 @@
+# ******************************************************************************
+#  Per-pixel unit ray tables keyed by camera intrinsics and resolution.
+#
+#  Undistorting and unprojecting every pixel only depends on the intrinsics,
+#  the distortion coefficients and the resolution, none of which change
+#  during a session. RayTableCache computes the (x/z, y/z) ray of every pixel
+#  once per (serial, intrinsics, distortion, width, height) with
+#  cv2.undistortPoints and hands out the same read-only (H, W, 2) float32
+#  array afterwards. With a cache_dir the tables are also written as .npy
+#  files and memory-mapped on the next start, so opening eight cameras does
+#  not pay for eight undistortions.
+#
+#  Distortion is the Brown-Conrady model with the rational k4..k6 terms,
+#  the OpenCV coefficient order (k1, k2, p1, p2, k3, k4, k5, k6).
+# ******************************************************************************
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Intrinsics = Tuple[float, float, float, float, int, int]  # fx, fy, cx, cy, width, height
+Distortion = Tuple[float, float, float, float, float, float, float, float]  # k1, k2, p1, p2, k3, k4, k5, k6
+NO_DISTORTION: Distortion = (0.0,) * 8
+
+
+def intrinsics_tuple(intrinsic, width: Optional[int] = None, height: Optional[int] = None) -> Intrinsics:
+    """(fx, fy, cx, cy, width, height) from an OBCameraIntrinsic or a tuple, rescaled to width x height.
+
+    Intrinsics are often reported for a different resolution than the one streamed, the focal lengths and
+    principal point scale with the image.
+    """
+    if isinstance(intrinsic, tuple):
+        fx, fy, cx, cy, base_width, base_height = intrinsic
+    else:
+        fx, fy, cx, cy = intrinsic.fx, intrinsic.fy, intrinsic.cx, intrinsic.cy
+        base_width, base_height = intrinsic.width, intrinsic.height
+    width = base_width if width is None else width
+    height = base_height if height is None else height
+    if (width, height) != (base_width, base_height):
+        sx, sy = width / base_width, height / base_height
+        fx, cx, fy, cy = fx * sx, cx * sx, fy * sy, cy * sy
+    return float(fx), float(fy), float(cx), float(cy), int(width), int(height)
+
+
+def distortion_tuple(distortion) -> Distortion:
+    """OpenCV ordered coefficients from an OBCameraDistortion, a tuple in that order or None."""
+    if distortion is None:
+        return NO_DISTORTION
+    if isinstance(distortion, tuple):
+        if len(distortion) != 8:
+            raise ValueError(f"Expected 8 distortion coefficients, got {len(distortion)}")
+        return tuple(float(k) for k in distortion)
+    return tuple(float(k) for k in (distortion.k1, distortion.k2, distortion.p1, distortion.p2,
+                                    distortion.k3, distortion.k4, distortion.k5, distortion.k6))
+
+
+def compute_unit_rays(intrinsics: Intrinsics, distortion: Distortion = NO_DISTORTION) -> np.ndarray:
+    """(H, W, 2) float32 undistorted (x/z, y/z) of every pixel center."""
+    fx, fy, cx, cy, width, height = intrinsics
+    if not any(distortion):
+        rays = np.empty((height, width, 2), dtype=np.float32)
+        rays[:, :, 0] = ((np.arange(width, dtype=np.float32) - cx) / fx)[None, :]
+        rays[:, :, 1] = ((np.arange(height, dtype=np.float32) - cy) / fy)[:, None]
+        return rays
+    camera_matrix = np.array([[fx, 0, cx], [0, fy, cy], [0, 0, 1]], dtype=np.float64)
+    u, v = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    pixels = np.stack([u, v], axis=-1).reshape(-1, 1, 2)
+    rays = cv2.undistortPoints(pixels, camera_matrix, np.array(distortion, dtype=np.float64))
+    return rays.reshape(height, width, 2).astype(np.float32, copy=False)
+
+
+class RayTableCache:
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self._tables: Dict[tuple, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _file_path(self, key: tuple) -> str:
+        serial_number, intrinsics, distortion = key
+        digest = hashlib.sha1(repr((intrinsics, distortion)).encode()).hexdigest()[:16]
+        name = f"rays_{serial_number or 'camera'}_{intrinsics[4]}x{intrinsics[5]}_{digest}.npy"
+        return os.path.join(self.cache_dir, name)
+
+    def _load_or_compute(self, key: tuple) -> np.ndarray:
+        _, intrinsics, distortion = key
+        if self.cache_dir is None:
+            return compute_unit_rays(intrinsics, distortion)
+        file_path = self._file_path(key)
+        if os.path.exists(file_path):
+            rays = np.load(file_path, mmap_mode="r")
+            if rays.shape == (intrinsics[5], intrinsics[4], 2) and rays.dtype == np.float32:
+                return rays
+        rays = compute_unit_rays(intrinsics, distortion)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.save(f, rays)
+        os.replace(temp_path, file_path)  # readers never see a partly written table
+        return rays
+
+    def get(self, intrinsic, distortion=None, width: Optional[int] = None, height: Optional[int] = None,
+            serial_number: str = "") -> np.ndarray:
+        """Read-only (H, W, 2) float32 unit rays, intrinsic is rescaled to width x height when given."""
+        key = (serial_number, intrinsics_tuple(intrinsic, width, height), distortion_tuple(distortion))
+        rays = self._tables.get(key)
+        if rays is None:
+            with self._lock:
+                rays = self._tables.get(key)
+                if rays is None:
+                    rays = self._load_or_compute(key)
+                    if rays.flags.writeable:
+                        rays.setflags(write=False)
+                    self._tables[key] = rays
+        return rays
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+default_ray_cache = RayTableCache()
+
+
+def set_ray_cache_dir(cache_dir: Optional[str]):
+    """Memory-map ray tables from cache_dir (None to keep them in memory only) for every projection helper."""
+    default_ray_cache.cache_dir = cache_dir
+    default_ray_cache.clear()
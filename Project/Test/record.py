@@ -14,9 +14,9 @@
 #  limitations under the License.
 # ******************************************************************************
 import cv2
-import numpy as np
 
 from pyorbbecsdk import *
+from utils import colorize_depth_frame
 
 ESC_KEY = 27
 
@@ -56,15 +56,8 @@ def main():
             depth_frame = frames.get_depth_frame()
             if depth_frame is None:
                 continue
-            width = depth_frame.get_width()#获取深度帧宽度
-            height = depth_frame.get_height()#获取深度帧高度
-            scale = depth_frame.get_depth_scale()#获取深度帧深度比例
             #深度数据处理
-            depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)#从深度帧数据中获取深度数据
-            depth_data = depth_data.reshape((height, width))#将深度数据整形为二维数组
-            depth_data = depth_data.astype(np.float32) * scale#深度数据*深度比例_rescale
-            depth_image = cv2.normalize(depth_data, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)#将深度数据标准化
-            depth_image = cv2.applyColorMap(depth_image, cv2.COLORMAP_JET)#颜色映射生成深度图像
+            depth_image = colorize_depth_frame(depth_frame)#原始深度经查找表直接映射为伪彩色深度图像
             cv2.imshow("Depth Viewer", depth_image)#opencv2显示深度图像
             key = cv2.waitKey(1)#等待键盘输入，1ms超时
             if key == ord('q') or key == ESC_KEY:
@@ -0,0 +1,96 @@
+# ******************************************************************************
+#  Single producer / single consumer ring buffer with overwrite-oldest
+#  semantics for handing frames from an SDK callback thread to a consumer.
+#
+#  The producer stores (sequence, item) into a preallocated slot and then
+#  publishes the new write sequence. Both are single reference stores, so
+#  neither side takes a lock. The consumer owns the read sequence. When the
+#  producer has lapped it, the consumer skips to the oldest slot that is still
+#  valid and counts the skipped items as dropped. A slot whose sequence
+#  changed while it was being read is simply retried.
+# ******************************************************************************
+import time
+from typing import Any, List, Optional, Tuple
+
+POLL_INTERVAL_S = 0.0005
+
+
+class RingBuffer:
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._slots: List[Optional[Tuple[int, Any]]] = [None] * capacity
+        self._write_seq = 0  # written by the producer only
+        self._read_seq = 0  # written by the consumer only
+        self._dropped = 0
+
+    def __len__(self) -> int:
+        return min(self._write_seq - self._read_seq, self.capacity)
+
+    @property
+    def pushed(self) -> int:
+        return self._write_seq
+
+    @property
+    def dropped(self) -> int:
+        """Items overwritten before the consumer read them, counted when the consumer catches up."""
+        return self._dropped
+
+    def push(self, item: Any):
+        """Producer side, never blocks, overwrites the oldest item when full."""
+        seq = self._write_seq
+        self._slots[seq % self.capacity] = (seq, item)
+        self._write_seq = seq + 1
+
+    def pop(self, timeout: float = 0.0) -> Optional[Any]:
+        """Consumer side, returns the oldest unread item or None after timeout seconds."""
+        deadline = None
+        while True:
+            item = self._try_pop()
+            if item is not None or timeout <= 0:
+                return item
+            if deadline is None:
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL_S)
+
+    def _try_pop(self) -> Optional[Any]:
+        while True:
+            write_seq = self._write_seq
+            read_seq = self._read_seq
+            if read_seq >= write_seq:
+                return None
+            if write_seq - read_seq > self.capacity:
+                self._dropped += write_seq - self.capacity - read_seq
+                read_seq = self._read_seq = write_seq - self.capacity
+            seq, item = self._slots[read_seq % self.capacity]
+            if seq != read_seq:
+                continue  # overwritten while reading, skip ahead
+            self._read_seq = read_seq + 1
+            return item
+
+    def pop_latest(self) -> Optional[Any]:
+        """Consumer side, returns the newest item and discards older unread ones as dropped."""
+        while True:
+            write_seq = self._write_seq
+            read_seq = self._read_seq
+            if read_seq >= write_seq:
+                return None
+            seq, item = self._slots[(write_seq - 1) % self.capacity]
+            if seq != write_seq - 1:
+                continue
+            self._dropped += write_seq - 1 - read_seq
+            self._read_seq = write_seq
+            return item
+
+    def peek_latest(self) -> Optional[Any]:
+        """Return the newest item without consuming anything, None if nothing was pushed yet."""
+        while True:
+            write_seq = self._write_seq
+            if write_seq == 0:
+                return None
+            seq, item = self._slots[(write_seq - 1) % self.capacity]
+            if seq == write_seq - 1:
+                return item
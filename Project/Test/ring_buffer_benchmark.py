@@ -0,0 +1,104 @@
+# ******************************************************************************
+#  Compare the Queue + qsize/get drop-oldest pattern of the capture callbacks
+#  with RingBuffer at 8 devices x 2 streams. Every stream has its own producer
+#  thread standing in for an SDK callback thread, one consumer drains all
+#  streams like the rendering/saving loops do.
+#
+#  usage: python ring_buffer_benchmark.py
+# ******************************************************************************
+import threading
+import time
+from queue import Queue
+
+from ring_buffer import RingBuffer
+
+DEVICES = 8
+STREAMS = 2
+MAX_QUEUE_SIZE = 5
+PUSHES_PER_STREAM = 50000
+
+
+class QueuePattern:
+    """The pattern used by the scripts before RingBuffer."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues = [Queue() for _ in range(DEVICES * STREAMS)]
+
+    def push(self, index: int, item):
+        with self.lock:
+            if self.queues[index].qsize() >= MAX_QUEUE_SIZE:
+                self.queues[index].get()
+            self.queues[index].put(item)
+
+    def pop(self, index: int):
+        with self.lock:
+            return self.queues[index].get() if not self.queues[index].empty() else None
+
+
+class RingPattern:
+    def __init__(self):
+        self.rings = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(DEVICES * STREAMS)]
+
+    def push(self, index: int, item):
+        self.rings[index].push(item)
+
+    def pop(self, index: int):
+        return self.rings[index].pop()
+
+
+def run(pattern) -> dict:
+    done = threading.Event()
+    consumed = [0]
+    push_times = [0.0] * (DEVICES * STREAMS)
+
+    def producer(index: int):
+        start = time.perf_counter()
+        for i in range(PUSHES_PER_STREAM):
+            pattern.push(index, i)
+        push_times[index] = time.perf_counter() - start
+
+    def consumer():
+        while not done.is_set():
+            for index in range(DEVICES * STREAMS):
+                if pattern.pop(index) is not None:
+                    consumed[0] += 1
+
+    consumer_thread = threading.Thread(target=consumer)
+    producers = [threading.Thread(target=producer, args=(i,)) for i in range(DEVICES * STREAMS)]
+    start = time.perf_counter()
+    consumer_thread.start()
+    for thread in producers:
+        thread.start()
+    for thread in producers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    consumer_thread.join()
+    total = DEVICES * STREAMS * PUSHES_PER_STREAM
+    return {
+        "elapsed": elapsed,
+        "push_us": sum(push_times) / total * 1e6,
+        "throughput": total / elapsed,
+        "consumed": consumed[0],
+    }
+
+
+def single_thread_push_ns(pattern, count: int = 200000) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        pattern.push(0, i)
+    return (time.perf_counter() - start) / count * 1e9
+
+
+def main():
+    print(f"{DEVICES} devices x {STREAMS} streams, {PUSHES_PER_STREAM} pushes per stream, capacity {MAX_QUEUE_SIZE}")
+    for name, factory in (("Queue + lock", QueuePattern), ("RingBuffer", RingPattern)):
+        push_ns = single_thread_push_ns(factory())
+        result = run(factory())
+        print(f"{name:>12}: uncontended push {push_ns:7.0f} ns | contended push {result['push_us']:7.2f} us"
+              f" | {result['throughput'] / 1e6:5.2f} M pushes/s | consumed {result['consumed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+# ******************************************************************************
+#  Multi-device recording into one indexed container file (.obmc).
+#
+#  Depth and color of all devices go into a single file, grouped by trigger
+#  (one FrameBundle of FrameMatcher). Frames are copied straight from the SDK
+#  frame views into a preallocated chunk on a writer thread and the chunk is
+#  written with one sequential write once full, so the disk sees large writes
+#  however many cameras there are. Layout:
+#
+#    header   b"OBMC", version, JSON (serial numbers, streams, metadata)
+#    records  48 byte record header + payload padded to 8 bytes, per frame,
+#             every trigger closed by an end record with the bundle timestamp
+#    index    (T,) trigger timestamps, (T, devices, streams) INDEX_DTYPE
+#    trailer  b"OBIX", version, index offset, trigger count
+#
+#  Trigger ids are dense, the index row of a trigger is its id, so reading
+#  any synchronized frame is one lookup plus a slice of the memory-mapped
+#  file. A recording cut short (no trailer) is re-indexed from the record
+#  headers, at most the last unwritten chunk is lost. Only triggers whose end
+#  record made it to disk are recovered, so a trigger cut in half is dropped
+#  instead of showing up with devices missing. Every write attempt carries its
+#  own sequence number, the records of an attempt that failed halfway are
+#  ignored even though the next trigger reuses its trigger id.
+# ******************************************************************************
+import json
+import mmap
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from frame_writer import BackPressurePolicy
+
+RECORDING_MAGIC = b"OBMC"
+RECORD_MAGIC = b"OBFR"
+TRIGGER_END_MAGIC = b"OBTE"
+INDEX_MAGIC = b"OBIX"
+RECORDING_VERSION = 2
+DEFAULT_STREAMS = ("depth", "color")
+DEFAULT_CHUNK_SIZE = 16 << 20
+FILE_HEADER = struct.Struct("<4sII")  # magic, version, JSON length
+# magic, trigger, device, stream, write sequence, then the INDEX_DTYPE fields of the frame
+RECORD_HEADER = struct.Struct("<4sIHHIqqIfHHHBB")
+TRAILER = struct.Struct("<4sIqq")  # magic, version, index offset, trigger count
+INDEX_DTYPE = np.dtype([
+    ("offset", "<i8"),  # payload offset in the file, -1 when the device missed the trigger
+    ("timestamp_us", "<i8"),
+    ("size", "<u4"),
+    ("depth_scale", "<f4"),
+    ("format", "<u2"),  # OBFormat value
+    ("width", "<u2"),
+    ("height", "<u2"),
+    ("itemsize", "u1"),
+    ("channels", "u1"),  # 0 for compressed formats, which are stored flat
+])
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _missing_entries(devices: int, streams: int) -> np.ndarray:
+    """Index entries of one trigger with every frame marked missing."""
+    entries = np.zeros((devices, streams), dtype=INDEX_DTYPE)
+    entries["offset"] = -1
+    return entries
+
+
+@dataclass
+class RecordedFrame:
+    data: np.ndarray  # (H, W) uint16, (H, W, C) uint8 or flat uint8 for compressed formats
+    format: int  # OBFormat value
+    width: int
+    height: int
+    timestamp_us: int
+    depth_scale: float
+
+
+@dataclass
+class RecordingStats:
+    triggers: int = 0
+    frames: int = 0
+    dropped: int = 0
+    pending: int = 0
+    bytes_written: int = 0
+    chunks_written: int = 0
+    write_total_s: float = 0.0
+
+
+class TakeRecorder:
+    """Writes synchronized frames of several devices into one .obmc file on a writer thread."""
+
+    def __init__(self, file_path: str, serial_numbers: Sequence[str], streams: Sequence[str] = DEFAULT_STREAMS,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_pending: int = 8,
+                 policy: BackPressurePolicy = BackPressurePolicy.BLOCK, metadata: Optional[dict] = None):
+        if max_pending < 1 or chunk_size < RECORD_HEADER.size:
+            raise ValueError("max_pending must be positive and chunk_size hold at least one record header")
+        if policy == BackPressurePolicy.RAW_ONLY:
+            raise ValueError("TakeRecorder stores frames as they are, use BLOCK or DROP_OLDEST")
+        self.file_path = file_path
+        self.serial_numbers = list(serial_numbers)
+        self.streams = list(streams)
+        self.max_pending = max_pending
+        self.policy = policy
+        self._file = open(file_path, "wb", buffering=0)
+        header = json.dumps({"serial_numbers": self.serial_numbers, "streams": self.streams,
+                             "metadata": metadata or {}}).encode()
+        header += b" " * (_padded(FILE_HEADER.size + len(header)) - FILE_HEADER.size - len(header))
+        self._file.write(FILE_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, len(header)) + header)
+        self._position = FILE_HEADER.size + len(header)  # file offset of the start of the chunk
+        self._chunk = np.empty(chunk_size, dtype=np.uint8)
+        self._chunk_used = 0
+        self._timestamps: List[int] = []
+        self._entries: List[np.ndarray] = []
+        self._sequence = 0  # one per _write_trigger call, failed ones included
+        self._jobs: Deque[Tuple[int, List[Optional[Dict[str, Any]]]]] = deque()
+        self._stats = RecordingStats()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._start_time = time.time()
+        self._worker = threading.Thread(target=self._run, name="TakeRecorder", daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, timestamp_us: int, frames: Sequence[Optional[Dict[str, Any]]]) -> bool:
+        """Queue one trigger, frames holds a {stream: VideoFrame} dict per device, None for missing devices.
+
+        The frames are kept until written, returns False if the trigger was not queued.
+        """
+        if len(frames) != len(self.serial_numbers):
+            raise ValueError(f"Expected frames of {len(self.serial_numbers)} devices, got {len(frames)}")
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("TakeRecorder is closed")
+            if len(self._jobs) >= self.max_pending:
+                if self.policy == BackPressurePolicy.BLOCK:
+                    while len(self._jobs) >= self.max_pending and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        self._stats.dropped += 1
+                        return False
+                else:
+                    self._jobs.popleft()
+                    self._stats.dropped += 1
+            self._jobs.append((timestamp_us, list(frames)))
+            self._condition.notify_all()
+        return True
+
+    def write_bundle(self, bundle) -> bool:
+        """Queue the depth and color frames of a FrameBundle of FrameSets."""
+        frames = []
+        for frame_set in bundle.frames:
+            if frame_set is None:
+                frames.append(None)
+                continue
+            frames.append({"depth": frame_set.get_depth_frame(), "color": frame_set.get_color_frame()})
+        return self.write(bundle.timestamp_us, frames)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs and not self._closed:
+                    self._condition.wait()
+                if not self._jobs:
+                    return
+                timestamp_us, frames = self._jobs.popleft()
+                self._condition.notify_all()
+            try:
+                self._write_trigger(timestamp_us, frames)
+            except Exception as e:
+                print(f"Recording {self.file_path} trigger {timestamp_us} failed: {e}")
+                with self._condition:
+                    self._stats.dropped += 1
+
+    def _write_trigger(self, timestamp_us: int, frames: List[Optional[Dict[str, Any]]]):
+        start = time.perf_counter()
+        trigger = len(self._timestamps)
+        sequence = self._sequence
+        self._sequence += 1
+        entries = _missing_entries(len(self.serial_numbers), len(self.streams))
+        written = 0
+        for device_index, device_frames in enumerate(frames):
+            for stream_index, stream in enumerate(self.streams):
+                frame = device_frames.get(stream) if device_frames else None
+                if frame is None:
+                    continue
+                entries[device_index, stream_index] = self._write_frame(trigger, sequence, device_index,
+                                                                        stream_index, frame)
+                written += 1
+        self._write_trigger_end(trigger, sequence, timestamp_us)
+        self._timestamps.append(timestamp_us)
+        self._entries.append(entries)
+        elapsed = time.perf_counter() - start
+        with self._condition:
+            self._stats.triggers += 1
+            self._stats.frames += written
+            self._stats.write_total_s += elapsed
+
+    def _write_frame(self, trigger: int, sequence: int, device_index: int, stream_index: int, frame) -> tuple:
+        """Append one frame to the chunk, returns its INDEX_DTYPE fields."""
+        data = frame.get_data_view()
+        payload = data.reshape(-1).view(np.uint8)
+        depth_scale = frame.get_depth_scale() if hasattr(frame, "get_depth_scale") else 1.0
+        channels = 0 if data.ndim == 1 else (1 if data.ndim == 2 else data.shape[2])
+        record_size = RECORD_HEADER.size + _padded(len(payload))
+        if self._chunk_used + record_size > len(self._chunk):
+            self._flush_chunk()
+        offset = self._position + self._chunk_used + RECORD_HEADER.size
+        fields = (offset, frame.get_timestamp_us(), len(payload), depth_scale, int(frame.get_format()),
+                  frame.get_width(), frame.get_height(), data.itemsize, channels)
+        header = RECORD_HEADER.pack(RECORD_MAGIC, trigger, device_index, stream_index, sequence, *fields)
+        if record_size > len(self._chunk):
+            # larger than a whole chunk, the chunk is empty here and the frame goes out on its own
+            self._file.write(header)
+            self._file.write(payload.data)
+            self._file.write(b"\0" * (record_size - RECORD_HEADER.size - len(payload)))
+            self._count_written(record_size)
+            return fields
+        used = self._chunk_used
+        self._chunk[used:used + RECORD_HEADER.size] = np.frombuffer(header, dtype=np.uint8)
+        used += RECORD_HEADER.size
+        self._chunk[used:used + len(payload)] = payload
+        self._chunk[used + len(payload):self._chunk_used + record_size] = 0
+        self._chunk_used += record_size
+        return fields
+
+    def _write_trigger_end(self, trigger: int, sequence: int, timestamp_us: int):
+        """Close a trigger with an empty record carrying the bundle timestamp."""
+        if self._chunk_used + RECORD_HEADER.size > len(self._chunk):
+            self._flush_chunk()
+        offset = self._position + self._chunk_used + RECORD_HEADER.size
+        header = RECORD_HEADER.pack(TRIGGER_END_MAGIC, trigger, 0, 0, sequence, offset, timestamp_us, 0, 0.0,
+                                    0, 0, 0, 0, 0)
+        self._chunk[self._chunk_used:self._chunk_used + RECORD_HEADER.size] = np.frombuffer(header, dtype=np.uint8)
+        self._chunk_used += RECORD_HEADER.size
+
+    def _flush_chunk(self):
+        if self._chunk_used:
+            self._file.write(self._chunk[:self._chunk_used].data)
+            self._count_written(self._chunk_used)
+            self._chunk_used = 0
+
+    def _count_written(self, size: int):
+        self._position += size
+        with self._condition:
+            self._stats.bytes_written += size
+            self._stats.chunks_written += 1
+
+    def stats(self) -> RecordingStats:
+        with self._condition:
+            return replace(self._stats, pending=len(self._jobs))
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        elapsed = max(time.time() - self._start_time, 1e-6)
+        return (f"recording: {stats.triggers} triggers ({stats.triggers / elapsed:.1f} fps) {stats.frames} frames "
+                f"dropped {stats.dropped} pending {stats.pending}, {stats.bytes_written / elapsed / 1e6:.1f} MB/s in "
+                f"{stats.chunks_written} chunks, {stats.write_total_s / max(stats.triggers, 1) * 1000:.1f} ms "
+                f"per trigger")
+
+    def close(self, wait: bool = True):
+        """Stop accepting triggers and write the index, with wait the pending triggers are recorded first."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            if not wait:
+                self._stats.dropped += len(self._jobs)
+                self._jobs.clear()
+            self._condition.notify_all()
+        self._worker.join()
+        try:
+            self._flush_chunk()
+            index_offset = self._position
+            count = len(self._timestamps)
+            entries = np.zeros((count, len(self.serial_numbers), len(self.streams)), dtype=INDEX_DTYPE)
+            if count:
+                np.stack(self._entries, out=entries)
+            self._file.write(np.asarray(self._timestamps, dtype="<i8").data)
+            self._file.write(entries.data)
+            self._file.write(TRAILER.pack(INDEX_MAGIC, RECORDING_VERSION, index_offset, count))
+        finally:
+            self._file.close()
+
+
+class TakeReader:
+    """Random access to a .obmc recording, reader[trigger] returns the frames of one synchronized trigger."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, header_size = FILE_HEADER.unpack_from(self._mmap, 0)
+            if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+                raise ValueError(f"{file_path} is not a version {RECORDING_VERSION} recording")
+            header = json.loads(bytes(self._mmap[FILE_HEADER.size:FILE_HEADER.size + header_size]))
+            self.serial_numbers: List[str] = header["serial_numbers"]
+            self.streams: List[str] = header["streams"]
+            self.metadata: dict = header["metadata"]
+            self.recovered = not self._load_index()
+            if self.recovered:
+                self._scan_records(FILE_HEADER.size + header_size)
+        except Exception:
+            self._mmap.close()
+            raise
+
+    def _load_index(self) -> bool:
+        if len(self._mmap) < TRAILER.size:
+            return False
+        magic, version, index_offset, count = TRAILER.unpack_from(self._mmap, len(self._mmap) - TRAILER.size)
+        if magic != INDEX_MAGIC or version != RECORDING_VERSION:
+            return False
+        self.timestamps = np.frombuffer(self._mmap, dtype="<i8", count=count, offset=index_offset)
+        shape = (count, len(self.serial_numbers), len(self.streams))
+        self.index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=int(np.prod(shape)),
+                                   offset=index_offset + count * 8).reshape(shape)
+        return True
+
+    def _scan_records(self, position: int):
+        """Rebuild the index from the record headers of a recording that was not closed."""
+        timestamps: Dict[int, int] = {}
+        entries: Dict[int, np.ndarray] = {}
+        # frames of the write attempts not closed by an end record yet, by sequence
+        open_entries: Dict[int, np.ndarray] = {}
+        end = len(self._mmap)
+        while position + RECORD_HEADER.size <= end:
+            magic, trigger, device_index, stream_index, sequence, *fields = RECORD_HEADER.unpack_from(self._mmap,
+                                                                                                      position)
+            offset, size = fields[0], fields[2]
+            if magic not in (RECORD_MAGIC, TRIGGER_END_MAGIC) or offset + size > end:
+                break
+            position = offset + _padded(size)
+            trigger_entries = open_entries.get(sequence)
+            if magic == TRIGGER_END_MAGIC:
+                if trigger_entries is None:  # a trigger all devices missed
+                    trigger_entries = _missing_entries(len(self.serial_numbers), len(self.streams))
+                entries[trigger] = trigger_entries
+                timestamps[trigger] = fields[1]
+                # attempts that failed halfway never get an end record, their frames are dropped here
+                open_entries.clear()
+                continue
+            if trigger_entries is None:
+                trigger_entries = _missing_entries(len(self.serial_numbers), len(self.streams))
+                open_entries[sequence] = trigger_entries
+            trigger_entries[device_index, stream_index] = tuple(fields)
+        # a trigger cut off by the crash has no end record and is not in entries, keep the ids before the first gap
+        count = 0
+        while count in entries:
+            count += 1
+        self.timestamps = np.array([timestamps[i] for i in range(count)], dtype=np.int64)
+        self.index = np.zeros((count, len(self.serial_numbers), len(self.streams)), dtype=INDEX_DTYPE)
+        for i in range(count):
+            self.index[i] = entries[i]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, trigger: int) -> List[Optional[Dict[str, RecordedFrame]]]:
+        return self.read_trigger(trigger)
+
+    def __iter__(self) -> Iterator[List[Optional[Dict[str, RecordedFrame]]]]:
+        for trigger in range(len(self)):
+            yield self.read_trigger(trigger)
+
+    def find(self, timestamp_us: int) -> int:
+        """Trigger closest to timestamp_us."""
+        if not len(self):
+            raise IndexError("Recording has no triggers")
+        trigger = int(np.searchsorted(self.timestamps, timestamp_us))
+        if trigger == len(self) or (trigger > 0 and timestamp_us - self.timestamps[trigger - 1]
+                                    <= self.timestamps[trigger] - timestamp_us):
+            trigger -= 1
+        return trigger
+
+    def read(self, trigger: int, device_index: int, stream: str) -> Optional[RecordedFrame]:
+        """One frame of a trigger, None when the device missed it. data is a read-only view of the file."""
+        entry = self.index[trigger, device_index, self.streams.index(stream)]
+        offset = int(entry["offset"])
+        if offset < 0:
+            return None
+        width, height, itemsize, channels = (int(entry["width"]), int(entry["height"]), int(entry["itemsize"]),
+                                             int(entry["channels"]))
+        data = np.frombuffer(self._mmap, dtype=np.uint16 if itemsize == 2 else np.uint8,
+                             count=int(entry["size"]) // itemsize, offset=offset)
+        if channels == 1:
+            data = data.reshape(height, width)
+        elif channels > 1:
+            data = data.reshape(height, width, channels)
+        return RecordedFrame(data, int(entry["format"]), width, height, int(entry["timestamp_us"]),
+                             float(entry["depth_scale"]))
+
+    def read_trigger(self, trigger: int) -> List[Optional[Dict[str, RecordedFrame]]]:
+        """{stream: RecordedFrame} per device, None for devices that missed the trigger."""
+        if not -len(self) <= trigger < len(self):
+            raise IndexError(f"Trigger {trigger} out of range, recording has {len(self)}")
+        frames = []
+        for device_index in range(len(self.serial_numbers)):
+            device_frames = {}
+            for stream in self.streams:
+                frame = self.read(trigger, device_index, stream)
+                if frame is not None:
+                    device_frames[stream] = frame
+            frames.append(device_frames or None)
+        return frames
+
+    def close(self):
+        # views handed out keep the mapping alive, it is unmapped once they are gone
+        self.timestamps = self.timestamps[:0].copy()
+        self.index = self.index[:0].copy()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
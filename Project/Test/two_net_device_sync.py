@@ -15,24 +15,34 @@
 # ******************************************************************************
 import json
 import os
-from queue import Queue
-from typing import List
+import time
+from collections import deque
+from typing import Deque, List, Optional
 
 import cv2
 import numpy as np
 
 from pyorbbecsdk import *
-from utils import frame_to_bgr_image
+from utils import ColorConverter, colorize_depth_frame
+from frame_matcher import FrameBundle, FrameMatcher, trigger_delays_from_config
+from ring_buffer import RingBuffer
 
 MAX_DEVICES = 2
 curr_device_cnt = 2
 
 MAX_QUEUE_SIZE = 5
+# max hardware timestamp difference within one trigger, after trigger_to_image_delay_us
+SYNC_TOLERANCE_US = 2000
 ESC_KEY = 27
 
-color_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
-depth_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
+# FrameSets handed over from the SDK callback thread of each device
+frames_rings: List[RingBuffer] = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(MAX_DEVICES)]
+# FrameBundles holding one FrameSet per device for the same trigger
+pending_bundles: Deque[FrameBundle] = deque(maxlen=MAX_QUEUE_SIZE)
+frame_matcher: Optional[FrameMatcher] = None
 has_color_sensor: List[bool] = [False for _ in range(MAX_DEVICES)]
+# one converter per color stream, reusing its output buffer
+color_converters: List[Optional[ColorConverter]] = [None for _ in range(MAX_DEVICES)]
 stop_rendering = False
 multi_device_sync_config = {}
 # config_file_path current file path
@@ -64,33 +74,40 @@ def sync_mode_from_str(sync_mode_str: str) -> OBMultiDeviceSyncMode:
 
 
 def on_new_frame_callback(frames: FrameSet, index: int):
-    global color_frames_queue, depth_frames_queue
-    global MAX_QUEUE_SIZE
+    global frames_rings
     assert index < MAX_DEVICES
-    color_frame = frames.get_color_frame()
-    depth_frame = frames.get_depth_frame()
-    if color_frame is not None:
-        if color_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            color_frames_queue[index].get()
-        color_frames_queue[index].put(color_frame)
-    if depth_frame is not None:
-        if depth_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            depth_frames_queue[index].get()
-        depth_frames_queue[index].put(depth_frame)
+    frames_rings[index].push(frames)
+
+
+def collect_bundles():
+    global frames_rings, pending_bundles
+    for i in range(curr_device_cnt):
+        frames = frames_rings[i].pop()
+        while frames is not None:
+            frame = frames.get_depth_frame() or frames.get_color_frame()
+            if frame is not None:
+                pending_bundles.extend(frame_matcher.push(i, frame.get_timestamp_us(), frames))
+            frames = frames_rings[i].pop()
 
 
 def rendering_frames():
-    global color_frames_queue, depth_frames_queue
+    global pending_bundles
     global curr_device_cnt
     global stop_rendering
     while not stop_rendering:
+        collect_bundles()
+        if not pending_bundles:
+            time.sleep(0.001)
+            continue
+        bundle = pending_bundles.popleft()
+        if bundle.missing:
+            print(f"Trigger {bundle.timestamp_us} us missed by devices {bundle.missing}")
         for i in range(curr_device_cnt):
-            color_frame = None
-            depth_frame = None
-            if not color_frames_queue[i].empty():
-                color_frame = color_frames_queue[i].get()
-            if not depth_frames_queue[i].empty():
-                depth_frame = depth_frames_queue[i].get()
+            frames = bundle.frames[i]
+            if frames is None:
+                continue
+            color_frame = frames.get_color_frame()
+            depth_frame = frames.get_depth_frame()
             if color_frame is None and depth_frame is None:
                 continue
             color_image = None
@@ -101,21 +118,9 @@ def rendering_frames():
                     color_frame.get_width(),
                     color_frame.get_height(),
                 )
-                color_image = frame_to_bgr_image(color_frame)
+                color_image = color_converters[i].convert(color_frame)
             if depth_frame is not None:
-                width = depth_frame.get_width()
-                height = depth_frame.get_height()
-                scale = depth_frame.get_depth_scale()
-
-                depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
-                depth_data = depth_data.reshape((height, width))
-
-                depth_data = depth_data.astype(np.float32) * scale
-
-                depth_image = cv2.normalize(
-                    depth_data, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U
-                )
-                depth_image = cv2.applyColorMap(depth_image, cv2.COLORMAP_JET)
+                depth_image = colorize_depth_frame(depth_frame)
 
             if color_image is not None and depth_image is not None:
                 window_size = (color_width // 2, color_height // 2)
@@ -162,6 +167,8 @@ def main():
     global config_file_path
     global curr_device_cnt
     global has_color_sensor
+    global color_converters
+    global frame_matcher
 
     read_config(config_file_path)
     ctx = Context()
@@ -178,6 +185,7 @@ def main():
         return
     pipelines: List[Pipeline] = []
     configs: List[Config] = []
+    serial_numbers: List[str] = []
     i = 0
     # 读json的配置
     for device in device_list:
@@ -185,6 +193,7 @@ def main():
         pipeline = Pipeline(device)
         config = Config()
         serial_number = device.get_device_info().get_serial_number()
+        serial_numbers.append(serial_number)
         sync_config_json = multi_device_sync_config[serial_number]
         sync_config = device.get_multi_device_sync_config()
         sync_config.mode = sync_mode_from_str(sync_config_json["config"]["mode"])
@@ -203,6 +212,7 @@ def main():
             )
             config.enable_stream(color_profile)
             has_color_sensor[i] = True
+            color_converters[i] = ColorConverter.from_profile(color_profile)
         except OBError as e:
             print(e)
             has_color_sensor[i] = False
@@ -214,6 +224,11 @@ def main():
         configs.append(config)
         i += 1
     global stop_rendering
+    frame_matcher = FrameMatcher(
+        len(pipelines),
+        SYNC_TOLERANCE_US,
+        trigger_delays_from_config(multi_device_sync_config, serial_numbers),
+    )
     start_streams(pipelines, configs)
     try:
         rendering_frames()
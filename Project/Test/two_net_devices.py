@@ -13,14 +13,14 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
-from queue import Queue
-from typing import List
+from typing import List, Optional
 
 import cv2
 import numpy as np
 
 from pyorbbecsdk import *
-from utils import frame_to_bgr_image
+from utils import ColorConverter, colorize_depth_frame
+from ring_buffer import RingBuffer
 
 MAX_DEVICES = 2 # 最大设备数
 curr_device_cnt = 2  # 目前设备数
@@ -28,10 +28,12 @@ curr_device_cnt = 2  # 目前设备数
 MAX_QUEUE_SIZE = 5 # 最大帧队列数
 ESC_KEY = 27 # 退出按键ascii码
  
-# 为每个设备创建一个队列对象
-color_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
-depth_frames_queue: List[Queue] = [Queue() for _ in range(MAX_DEVICES)]
+# 为每个设备的每路流创建一个环形缓冲区，满时覆盖最旧的帧
+color_frames_queue: List[RingBuffer] = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(MAX_DEVICES)]
+depth_frames_queue: List[RingBuffer] = [RingBuffer(MAX_QUEUE_SIZE) for _ in range(MAX_DEVICES)]
 has_color_sensor: List[bool] = [False for _ in range(MAX_DEVICES)]
+# 每个设备一个彩色格式转换器，复用输出缓冲区
+color_converters: List[Optional[ColorConverter]] = [None for _ in range(MAX_DEVICES)]
 stop_rendering = False
 
 # 获取新帧的回调函数
@@ -42,14 +44,9 @@ def on_new_frame_callback(frames: FrameSet, index: int):
     color_frame = frames.get_color_frame() # 获取RGB帧
     depth_frame = frames.get_depth_frame() # 获取深度帧
     if color_frame is not None:
-        # 如果队列中的帧数大于最大队列大小，则从队列中删除帧
-        if color_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            color_frames_queue[index].get() 
-        color_frames_queue[index].put(color_frame) # 将RGB帧放入队列
+        color_frames_queue[index].push(color_frame) # 将RGB帧放入环形缓冲区，满时覆盖最旧的帧
     if depth_frame is not None:
-        if depth_frames_queue[index].qsize() >= MAX_QUEUE_SIZE:
-            depth_frames_queue[index].get()
-        depth_frames_queue[index].put(depth_frame)
+        depth_frames_queue[index].push(depth_frame)
 
 
 # 渲染帧
@@ -65,10 +62,8 @@ def rendering_frames():
         for i in range(curr_device_cnt):
             color_frame = None # RGB帧初始化
             depth_frame = None # 深度帧初始化
-            if not color_frames_queue[i].empty(): # 如果RGB队列不为空 获取RGB帧
-                color_frame = color_frames_queue[i].get() # 
-            if not depth_frames_queue[i].empty(): # 如果深度队列不为空 获取深度帧
-                depth_frame = depth_frames_queue[i].get() # 
+            color_frame = color_frames_queue[i].pop() # 获取RGB帧，缓冲区为空时返回None
+            depth_frame = depth_frames_queue[i].pop() # 获取深度帧，缓冲区为空时返回None
             if color_frame is None and depth_frame is None: # 如果RGB和深度帧都为空 跳过本次循环
                 continue # 
             color_image = None # RGB图像初始化
@@ -78,24 +73,11 @@ def rendering_frames():
 
                 # RGB数据处理
                 color_width, color_height = color_frame.get_width(), color_frame.get_height() # 获取RGB帧的宽高
-                color_image = frame_to_bgr_image(color_frame) # 将RGB帧转换为BGR图像
+                color_image = color_converters[i].convert(color_frame) # 将RGB帧转换为BGR图像
             if depth_frame is not None: # 如果深度帧不为空
-                width = depth_frame.get_width() # 获取深度帧的宽
-                height = depth_frame.get_height() # 获取深度帧的高
-                scale = depth_frame.get_depth_scale() # 获取深度帧的深度比例
-
                 # 深度数据处理
-                # 从深度帧中获取深度数据    
-                depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
-                # 将深度数据转换成长宽为 height 和 width 的数组
-                depth_data = depth_data.reshape((height, width))
-                # 将深度数据转换成浮点数并乘以深度比例
-                depth_data = depth_data.astype(np.float32) * scale
-                # 将深度数据转换成 8 位无符号整数 归一化到0-255
-                depth_image = cv2.normalize(depth_data, None, 0, 255, cv2.NORM_MINMAX,
-                                            dtype=cv2.CV_8U)
-                # 将深度图像转换成伪彩色图像
-                depth_image = cv2.applyColorMap(depth_image, cv2.COLORMAP_JET)
+                # 原始uint16深度直接查表生成伪彩色图像，无需转浮点和归一化
+                depth_image = colorize_depth_frame(depth_frame)
 
             if color_image is not None and depth_image is not None: 
                 # 图像最终处理
@@ -148,6 +130,7 @@ def main():
     pipelines: List[Pipeline] = []
     configs: List[Config] = []
     global has_color_sensor
+    global color_converters
     i = 0
     for device in device_list:
         # 创建一个pipeline对象,用于管理与给定设备 device 相关的数据流
@@ -162,6 +145,7 @@ def main():
             # 使能RGB流
             config.enable_stream(color_profile)
             has_color_sensor[i] = True
+            color_converters[i] = ColorConverter.from_profile(color_profile)
 
         except OBError as e: # 报错认为没有RGB
             print(e)
@@ -0,0 +1,83 @@
+# ******************************************************************************
+#  Vectorized voxel-grid downsampling for (N, 3) / (N, 6) point arrays.
+#
+#  Points are quantized to voxel_size cells, the cell indices are packed into
+#  one int64 key per point and grouped with np.unique. "centroid" returns the
+#  mean of every occupied cell, colors included, like open3d's
+#  voxel_down_sample. "first" keeps the first point that fell into a cell,
+#  which also drops exact duplicates from overlapping cameras cheaply.
+# ******************************************************************************
+import math
+from typing import Tuple
+
+import numpy as np
+
+MAX_BUDGET_ITERATIONS = 8
+
+
+def voxel_keys(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """One int64 key per point, equal keys share a voxel."""
+    if voxel_size <= 0:
+        raise ValueError("voxel_size must be positive")
+    cells = np.floor(points[:, :3] / voxel_size).astype(np.int64)
+    # column by column, min/max along axis 0 of an (N, 3) array is several times slower
+    for column in range(3):
+        cells[:, column] -= cells[:, column].min()
+    dims = np.array([cells[:, column].max() + 1 for column in range(3)])
+    if float(dims[0]) * float(dims[1]) * float(dims[2]) >= 2 ** 63:
+        raise ValueError(f"voxel_size {voxel_size} is too small for the extent of the cloud")
+    return (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+
+def _check_points(points: np.ndarray):
+    if points.ndim != 2 or points.shape[1] not in (3, 6):
+        raise ValueError(f"Expected an (N, 3) or (N, 6) point array, got shape {points.shape}")
+
+
+def _reduce(points: np.ndarray, keys: np.ndarray, mode: str) -> np.ndarray:
+    if mode == "first":
+        _, first = np.unique(keys, return_index=True)
+        first.sort()
+        return points[first].astype(np.float32, copy=False)
+    if mode != "centroid":
+        raise ValueError(f"Unknown mode: {mode}")
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    reduced = np.empty((len(counts), points.shape[1]), dtype=np.float32)
+    for column in range(points.shape[1]):
+        reduced[:, column] = np.bincount(inverse, weights=points[:, column], minlength=len(counts)) / counts
+    return reduced
+
+
+def voxel_down_sample(points: np.ndarray, voxel_size: float, mode: str = "centroid") -> np.ndarray:
+    """Reduce an (N, 3) or (N, 6) float array to one point per occupied voxel."""
+    _check_points(points)
+    if len(points) == 0:
+        return points.astype(np.float32)
+    return _reduce(points, voxel_keys(points, voxel_size), mode)
+
+
+def voxel_down_sample_to_budget(points: np.ndarray, max_points: int, voxel_size: float = 0.0,
+                                mode: str = "centroid") -> Tuple[np.ndarray, float]:
+    """Downsample to at most max_points, growing voxel_size as needed. Returns the points and the voxel size used.
+
+    Without a starting voxel_size one is estimated from the bounding box, the size is then scaled by the square
+    root of the overshoot (sensor clouds are surfaces) until the budget is met.
+    """
+    _check_points(points)
+    if max_points <= 0:
+        raise ValueError("max_points must be positive")
+    if len(points) <= max_points and voxel_size <= 0:
+        return points, 0.0
+    if voxel_size <= 0:
+        extent = np.ptp(points[:, :3], axis=0)
+        area = max(extent[0] * extent[1], extent[0] * extent[2], extent[1] * extent[2], 1e-12)
+        voxel_size = math.sqrt(area / max_points)
+    for _ in range(MAX_BUDGET_ITERATIONS):
+        keys = voxel_keys(points, voxel_size)
+        count = len(np.unique(keys))
+        if count <= max_points:
+            return _reduce(points, keys, mode), voxel_size
+        voxel_size *= math.sqrt(count / max_points) * 1.05
+    # still over budget, thin out what the coarsest grid left
+    reduced = voxel_down_sample(points, voxel_size, mode)
+    return reduced[::-(-len(reduced) // max_points)], voxel_size
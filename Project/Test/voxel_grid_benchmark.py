@@ -0,0 +1,71 @@
+# ******************************************************************************
+#  Time voxel_grid on a fused cloud of 8 synthetic 640x576 depth cameras
+#  around the origin, with and without color, and the fixed point budget
+#  path. With open3d installed its voxel_down_sample runs on the same cloud
+#  and its voxel count and time are printed next to voxel_grid's.
+#
+#  usage: python voxel_grid_benchmark.py
+# ******************************************************************************
+import time
+
+import numpy as np
+
+from fusion_engine import FusionEngine, to_open3d
+from live_fusion_benchmark import DEPTH_HEIGHT, DEPTH_WIDTH, DEVICES, depth_to_points, make_extrinsics
+from voxel_grid import voxel_down_sample, voxel_down_sample_to_budget
+
+VOXEL_SIZES = [5.0, 20.0, 50.0]
+POINTS_BUDGET = 200000
+REPEAT = 3
+
+
+def make_cloud(with_color: bool) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    clouds = []
+    for _ in range(DEVICES):
+        depth = rng.integers(500, 3000, size=(DEPTH_HEIGHT, DEPTH_WIDTH), dtype=np.uint16)
+        depth[rng.random(depth.shape) < 0.2] = 0
+        points = depth_to_points(depth)
+        if with_color:
+            colors = rng.integers(0, 256, size=(len(points), 3)).astype(np.float32)
+            points = np.hstack([points, colors])
+        clouds.append(points)
+    return FusionEngine(make_extrinsics()).fuse(clouds).copy()
+
+
+def best_of(func, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    for with_color in (False, True):
+        points = make_cloud(with_color)
+        try:
+            pcd = to_open3d(points)
+        except ImportError:
+            pcd = None
+        print(f"{len(points)} points, {'x/y/z/r/g/b' if with_color else 'x/y/z'}")
+        for voxel_size in VOXEL_SIZES:
+            centroid = voxel_down_sample(points, voxel_size)
+            centroid_s = best_of(voxel_down_sample, points, voxel_size)
+            first_s = best_of(voxel_down_sample, points, voxel_size, "first")
+            line = (f"  voxel {voxel_size:5.1f}: {len(centroid)} points, "
+                    f"centroid {centroid_s * 1000:.1f} ms, first {first_s * 1000:.1f} ms")
+            if pcd is not None:
+                reference = pcd.voxel_down_sample(voxel_size)
+                open3d_s = best_of(pcd.voxel_down_sample, voxel_size)
+                line += f", open3d {len(reference.points)} points in {open3d_s * 1000:.1f} ms"
+            print(line)
+        start = time.perf_counter()
+        reduced, voxel_size = voxel_down_sample_to_budget(points, POINTS_BUDGET)
+        print(f"  budget {POINTS_BUDGET}: {len(reduced)} points at voxel {voxel_size:.1f} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,11 +16,11 @@
 import time
 
 import cv2
-import numpy as np
 
 from pyorbbecsdk import Config
 from pyorbbecsdk import OBSensorType
 from pyorbbecsdk import Pipeline
+from utils import colorize_depth_frame
 
 ESC_KEY = 27
 PRINT_INTERVAL = 1  # seconds
@@ -70,26 +70,21 @@ def main():
             height = depth_frame.get_height()
             scale = depth_frame.get_depth_scale()
 
-            depth_data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
-            depth_data = depth_data.reshape((height, width))
-
-            depth_data = depth_data.astype(np.float32) * scale
-            depth_data = np.where((depth_data > MIN_DEPTH) & (depth_data < MAX_DEPTH), depth_data, 0)
-            depth_data = depth_data.astype(np.uint16)
-            # Apply temporal filtering
-            depth_data = temporal_filter.process(depth_data)
+            # Apply temporal filtering to the raw depth, the view keeps the frame alive while it is needed
+            depth_data = temporal_filter.process(depth_frame.get_data_view())
 
             center_y = int(height / 2)
             center_x = int(width / 2)
-            center_distance = depth_data[center_y, center_x]
+            center_distance = depth_data[center_y, center_x] * scale
+            if not MIN_DEPTH < center_distance < MAX_DEPTH:
+                center_distance = 0
 
             current_time = time.time()
             if current_time - last_print_time >= PRINT_INTERVAL:
                 print("center distance: ", center_distance)
                 last_print_time = current_time
 
-            depth_image = cv2.normalize(depth_data, None, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
-            depth_image = cv2.applyColorMap(depth_image, cv2.COLORMAP_JET)
+            depth_image = colorize_depth_frame(depth_frame, MIN_DEPTH, MAX_DEPTH)
 
             cv2.imshow("Depth Viewer", depth_image)
             key = cv2.waitKey(1)
@@ -0,0 +1,61 @@
+# ******************************************************************************
+#  Copyright (c) 2023 Orbbec 3D Technology, Inc
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.  
+#  You may obtain a copy of the License at
+#  
+#      http:# www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+# ******************************************************************************
+import sys
+import time
+
+import numpy as np
+
+from pyorbbecsdk import *
+
+
+def main():
+    bag_path = sys.argv[1] if len(sys.argv) > 1 else "./test.bag"
+    # SDK playback runs at the recorded frame rate: indexing plays the whole bag once, later opens read
+    # <bag>.obindex
+    start = time.time()
+    reader = PlaybackReader(bag_path)
+    if not reader.has_index():
+        print("indexing, this takes as long as the recording")
+        reader.build_index()
+    timestamps = reader.get_timestamps()
+    print(f"{len(reader)} frame sets, indexed in {time.time() - start:.1f} s")
+    if len(reader) == 0:
+        return
+    # jump to the middle of the recording by timestamp, the playback gets there at the recorded frame rate
+    middle_us = int(timestamps[0] + (timestamps[-1] - timestamps[0]) // 2)
+    position = reader.seek_timestamp(middle_us)
+    print(f"frame set {position} is the first at or after {middle_us} us")
+    # frame sets come straight from the reader, no Python callback
+    start = time.time()
+    count = 0
+    for frames in reader:
+        depth_frame = frames.get_depth_frame()
+        if depth_frame is not None:
+            depth = depth_frame.get_data_view()
+            valid = depth[depth > 0]
+            if count % 30 == 0 and valid.size:
+                median_mm = np.median(valid) * depth_frame.get_depth_scale()
+                print(f"frame set {reader.tell() - 1}: median depth {median_mm:.0f} mm")
+        count += 1
+    print(f"read {count} frame sets in {time.time() - start:.1f} s")
+    # a single frame set, going back restarts the playback from the first set
+    frames = reader.read_frame(0)
+    print("first frame set:", frames)
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -36,12 +36,13 @@ def save_points_to_ply(frames: FrameSet, camera_param: OBCameraParam) -> int:
         print("no depth points")
         return 0
 
-    # Create a structured numpy array directly from points assuming it's a list of lists
-    points_array = np.array([tuple(point) for point in points], dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4')])
+    # (N, 3) float32 rows already have the vertex layout, view them as a structured array without copying
+    points_array = np.ascontiguousarray(points, dtype=np.float32).view(
+        [('x', 'f4'), ('y', 'f4'), ('z', 'f4')]).reshape(-1)
     points_filename = os.path.join(save_points_dir, "points_{}.ply".format(depth_frame.get_timestamp()))
 
     el = PlyElement.describe(points_array, 'vertex')
-    PlyData([el], text=True).write(points_filename)
+    PlyData([el], byte_order='<').write(points_filename)
 
     return 1
 
@@ -57,14 +58,15 @@ def save_color_points_to_ply(frames: FrameSet, camera_param: OBCameraParam) -> i
         print("no color points")
         return 0
 
-    # Create a structured numpy array directly from color_points assuming it's a list of lists
-    points_array = np.array([tuple(point) for point in points],
-                            dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('red', 'u1'), ('green', 'u1'),
-                                   ('blue', 'u1')])
+    # Fill the structured array column by column instead of building one tuple per point
+    points_array = np.empty(len(points), dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4'), ('red', 'u1'),
+                                                ('green', 'u1'), ('blue', 'u1')])
+    for i, name in enumerate(points_array.dtype.names):
+        points_array[name] = points[:, i]
     points_filename = os.path.join(save_points_dir, "color_points_{}.ply".format(depth_frame.get_timestamp()))
 
     el = PlyElement.describe(points_array, 'vertex')
-    PlyData([el], text=True).write(points_filename)
+    PlyData([el], byte_order='<').write(points_filename)
 
     return 1
 
@@ -13,14 +13,22 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 # ******************************************************************************
-from typing import Union, Any, Optional
+import threading
+from functools import lru_cache
+from typing import Union, Any, Optional, Tuple
 
 import cv2
 import numpy as np
 
-from pyorbbecsdk import FormatConvertFilter, VideoFrame
+from pyorbbecsdk import FormatConvertFilter, VideoFrame, VideoStreamProfile
 from pyorbbecsdk import OBFormat, OBConvertFormat
 
+DEPTH_LUT_SIZE = 65536
+DEFAULT_MIN_DEPTH = 20  # 20mm
+DEFAULT_MAX_DEPTH = 10000  # 10000mm
+
+_convert_filters = threading.local()
+
 
 def yuyv_to_bgr(frame: np.ndarray, width: int, height: int) -> np.ndarray:
     yuyv = frame.reshape((height, width, 2))
@@ -76,6 +84,18 @@ def determine_convert_format(frame: VideoFrame):
         return None
 
 
+def get_convert_filter(convert_format: OBConvertFormat) -> FormatConvertFilter:
+    # FormatConvertFilter is not shared between threads, each capture thread gets its own filters
+    filters = _convert_filters.__dict__.setdefault("filters", {})
+    convert_filter = filters.get(convert_format)
+    if convert_filter is None:
+        print("covert format: {}".format(convert_format))
+        convert_filter = FormatConvertFilter()
+        convert_filter.set_format_convert_format(convert_format)
+        filters[convert_format] = convert_filter
+    return convert_filter
+
+
 def frame_to_rgb_frame(frame: VideoFrame) -> Union[Optional[VideoFrame], Any]:
     if frame.get_format() == OBFormat.RGB:
         return frame
@@ -83,45 +103,129 @@ def frame_to_rgb_frame(frame: VideoFrame) -> Union[Optional[VideoFrame], Any]:
     if convert_format is None:
         print("Unsupported format")
         return None
-    print("covert format: {}".format(convert_format))
-    convert_filter = FormatConvertFilter()
-    convert_filter.set_format_convert_format(convert_format)
-    rgb_frame = convert_filter.process(frame)
+    rgb_frame = get_convert_filter(convert_format).process(frame)
     if rgb_frame is None:
         print("Convert {} to RGB failed".format(frame.get_format()))
     return rgb_frame
 
 
-def frame_to_bgr_image(frame: VideoFrame) -> Union[Optional[np.array], Any]:
+# cv2 conversion code and the (height, width) -> data shape of the uncompressed color formats
+_BGR_CONVERSIONS = {
+    OBFormat.RGB: (cv2.COLOR_RGB2BGR, lambda height, width: (height, width, 3)),
+    OBFormat.BGR: (None, lambda height, width: (height, width, 3)),
+    OBFormat.YUYV: (cv2.COLOR_YUV2BGR_YUYV, lambda height, width: (height, width, 2)),
+    OBFormat.UYVY: (cv2.COLOR_YUV2BGR_UYVY, lambda height, width: (height, width, 2)),
+    OBFormat.I420: (cv2.COLOR_YUV2BGR_I420, lambda height, width: (height * 3 // 2, width)),
+    OBFormat.NV12: (cv2.COLOR_YUV2BGR_NV12, lambda height, width: (height * 3 // 2, width)),
+    OBFormat.NV21: (cv2.COLOR_YUV2BGR_NV21, lambda height, width: (height * 3 // 2, width)),
+}
+
+
+def _data_as(data: np.ndarray, shape: Tuple[int, ...]) -> Optional[np.ndarray]:
+    # frame data may carry padding after the image, only the leading bytes are used, None if the frame is short
+    size = int(np.prod(shape))
+    data = data.reshape(-1)
+    if data.size < size:
+        return None
+    return data[:size].reshape(shape)
+
+
+def convert_to_bgr(frame: VideoFrame, out: np.ndarray) -> Optional[np.ndarray]:
+    """Convert a color frame into a preallocated (height, width, 3) uint8 BGR image, returns out or None."""
     width = frame.get_width()
     height = frame.get_height()
     color_format = frame.get_format()
-    data = np.asanyarray(frame.get_data())
-    image = np.zeros((height, width, 3), dtype=np.uint8)
-    if color_format == OBFormat.RGB:
-        image = np.resize(data, (height, width, 3))
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    elif color_format == OBFormat.BGR:
-        image = np.resize(data, (height, width, 3))
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    elif color_format == OBFormat.YUYV:
-        image = np.resize(data, (height, width, 2))
-        image = cv2.cvtColor(image, cv2.COLOR_YUV2BGR_YUYV)
-    elif color_format == OBFormat.MJPG:
-        image = cv2.imdecode(data, cv2.IMREAD_COLOR)
-    elif color_format == OBFormat.I420:
-        image = i420_to_bgr(data, width, height)
-        return image
-    elif color_format == OBFormat.NV12:
-        image = nv12_to_bgr(data, width, height)
-        return image
-    elif color_format == OBFormat.NV21:
-        image = nv21_to_bgr(data, width, height)
-        return image
-    elif color_format == OBFormat.UYVY:
-        image = np.resize(data, (height, width, 2))
-        image = cv2.cvtColor(image, cv2.COLOR_YUV2BGR_UYVY)
-    else:
+    if out.shape != (height, width, 3) or out.dtype != np.uint8:
+        raise ValueError("out must be a ({}, {}, 3) uint8 array, got {} {}".format(height, width, out.dtype, out.shape))
+    data = frame.get_data_view()
+    if color_format == OBFormat.MJPG:
+        # cv2.imdecode cannot decode into an existing buffer, the decoded image is copied
+        image = cv2.imdecode(data.reshape(-1), cv2.IMREAD_COLOR)
+        if image is None or image.shape != out.shape:
+            print("Decode MJPG frame failed")
+            return None
+        np.copyto(out, image)
+        return out
+    if color_format not in _BGR_CONVERSIONS:
         print("Unsupported color format: {}".format(color_format))
         return None
-    return image
+    code, layout = _BGR_CONVERSIONS[color_format]
+    shape = layout(height, width)
+    image = _data_as(data, shape)
+    if image is None:
+        print("Truncated {} frame: {} bytes, expected {}".format(color_format, data.nbytes, int(np.prod(shape))))
+        return None
+    if code is None:
+        np.copyto(out, image)
+        return out
+    return cv2.cvtColor(image, code, dst=out)
+
+
+class ColorConverter:
+    """Converts the color frames of one stream to BGR, built once per stream.
+
+    convert() returns a preallocated buffer that the next call overwrites, pass out to keep the image.
+    """
+
+    def __init__(self, width: int, height: int):
+        self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    @classmethod
+    def from_profile(cls, profile: VideoStreamProfile) -> "ColorConverter":
+        return cls(profile.get_width(), profile.get_height())
+
+    def convert(self, frame: VideoFrame, out: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        if out is None:
+            if self._buffer.shape[:2] != (frame.get_height(), frame.get_width()):
+                self._buffer = np.empty((frame.get_height(), frame.get_width(), 3), dtype=np.uint8)
+            out = self._buffer
+        return convert_to_bgr(frame, out)
+
+
+def frame_to_bgr_image(frame: VideoFrame) -> Union[Optional[np.array], Any]:
+    """Convert a color frame to a newly allocated BGR image, see ColorConverter to reuse buffers."""
+    if frame.get_format() == OBFormat.MJPG:
+        return cv2.imdecode(frame.get_data_view().reshape(-1), cv2.IMREAD_COLOR)
+    return convert_to_bgr(frame, np.empty((frame.get_height(), frame.get_width(), 3), dtype=np.uint8))
+
+
+@lru_cache(maxsize=16)
+def depth_color_lut(scale: float = 1.0, min_depth: float = DEFAULT_MIN_DEPTH, max_depth: float = DEFAULT_MAX_DEPTH,
+                    colormap: int = cv2.COLORMAP_JET) -> np.ndarray:
+    """Map every raw uint16 depth value to a BGRX color packed in a uint32, cached per scale/range/colormap.
+
+    Depth in millimeters is raw * scale. Values outside [min_depth, max_depth], including the invalid 0, are black.
+    """
+    if max_depth <= min_depth:
+        raise ValueError("max_depth must be greater than min_depth")
+    depth = np.arange(DEPTH_LUT_SIZE, dtype=np.float32) * scale
+    gray = np.clip((depth - min_depth) * (255.0 / (max_depth - min_depth)), 0, 255).astype(np.uint8)
+    lut = np.zeros((DEPTH_LUT_SIZE, 4), dtype=np.uint8)
+    lut[:, :3] = cv2.applyColorMap(gray.reshape(-1, 1), colormap).reshape(-1, 3)
+    lut[(depth < min_depth) | (depth > max_depth) | (depth == 0)] = 0
+    lut = lut.view(np.uint32).reshape(-1)
+    lut.flags.writeable = False
+    return lut
+
+
+def colorize_depth(depth_data: np.ndarray, scale: float = 1.0, min_depth: float = DEFAULT_MIN_DEPTH,
+                   max_depth: float = DEFAULT_MAX_DEPTH, colormap: int = cv2.COLORMAP_JET,
+                   size: Optional[Tuple[int, int]] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Colorize a (H, W) uint16 depth image through depth_color_lut, no float conversion or min/max pass.
+
+    size is an optional (width, height) to downsample to before colorizing, out an optional BGR destination.
+    """
+    if depth_data.dtype != np.uint16 or depth_data.ndim != 2:
+        raise ValueError("Expected a (H, W) uint16 depth image, got {} {}".format(depth_data.dtype, depth_data.shape))
+    if size is not None and (depth_data.shape[1], depth_data.shape[0]) != tuple(size):
+        depth_data = cv2.resize(depth_data, tuple(size), interpolation=cv2.INTER_NEAREST)
+    lut = depth_color_lut(float(scale), float(min_depth), float(max_depth), colormap)
+    packed = np.take(lut, depth_data, mode='clip')
+    bgrx = packed.view(np.uint8).reshape(packed.shape + (4,))
+    return cv2.cvtColor(bgrx, cv2.COLOR_BGRA2BGR, dst=out)
+
+
+def colorize_depth_frame(frame: VideoFrame, min_depth: float = DEFAULT_MIN_DEPTH, max_depth: float = DEFAULT_MAX_DEPTH,
+                         colormap: int = cv2.COLORMAP_JET, size: Optional[Tuple[int, int]] = None,
+                         out: Optional[np.ndarray] = None) -> np.ndarray:
+    return colorize_depth(frame.get_data_view(), frame.get_depth_scale(), min_depth, max_depth, colormap, size, out)
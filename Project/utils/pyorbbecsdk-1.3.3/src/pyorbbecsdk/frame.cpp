@@ -17,9 +17,328 @@
 
 #include <pybind11/numpy.h>
 
+#include <initializer_list>
+#include <map>
+#include <mutex>
+#include <string>
+
 #include "error.hpp"
 
 namespace pyorbbecsdk {
+namespace {
+// Wrap the SDK frame buffer in a read-only ndarray without copying. The
+// capsule holds its own reference to the frame, so the buffer stays valid for
+// as long as the array (or any view of it) is alive.
+py::array make_frame_view(const std::shared_ptr<ob::Frame>& frame,
+                          const py::dtype& dtype,
+                          const std::vector<py::ssize_t>& shape) {
+  auto holder = new std::shared_ptr<ob::Frame>(frame);
+  py::capsule base(holder, [](void* ptr) {
+    delete static_cast<std::shared_ptr<ob::Frame>*>(ptr);
+  });
+  py::array result(dtype, shape, frame->data(), base);
+  result.attr("flags").attr("writeable") = false;
+  return result;
+}
+
+py::array make_flat_frame_view(const std::shared_ptr<ob::Frame>& frame) {
+  return make_frame_view(frame, py::dtype::of<uint8_t>(),
+                         {static_cast<py::ssize_t>(frame->dataSize())});
+}
+
+py::array make_video_frame_view(const std::shared_ptr<ob::VideoFrame>& frame) {
+  auto width = static_cast<py::ssize_t>(frame->width());
+  auto height = static_cast<py::ssize_t>(frame->height());
+  auto data_size = static_cast<py::ssize_t>(frame->dataSize());
+  switch (frame->format()) {
+    case OB_FORMAT_Y16:
+    case OB_FORMAT_Y10:
+    case OB_FORMAT_Y11:
+    case OB_FORMAT_Y12:
+    case OB_FORMAT_Y14:
+    case OB_FORMAT_Z16:
+    case OB_FORMAT_RW16:
+    case OB_FORMAT_DISP16:
+      if (data_size >= width * height * 2) {
+        return make_frame_view(frame, py::dtype::of<uint16_t>(),
+                               {height, width});
+      }
+      break;
+    case OB_FORMAT_Y8:
+    case OB_FORMAT_BA81:
+      if (data_size >= width * height) {
+        return make_frame_view(frame, py::dtype::of<uint8_t>(),
+                               {height, width});
+      }
+      break;
+    case OB_FORMAT_YUYV:
+    case OB_FORMAT_YUY2:
+    case OB_FORMAT_UYVY:
+      if (data_size >= width * height * 2) {
+        return make_frame_view(frame, py::dtype::of<uint8_t>(),
+                               {height, width, 2});
+      }
+      break;
+    case OB_FORMAT_RGB:
+    case OB_FORMAT_BGR:
+      if (data_size >= width * height * 3) {
+        return make_frame_view(frame, py::dtype::of<uint8_t>(),
+                               {height, width, 3});
+      }
+      break;
+    case OB_FORMAT_RGBA:
+    case OB_FORMAT_BGRA:
+      if (data_size >= width * height * 4) {
+        return make_frame_view(frame, py::dtype::of<uint8_t>(),
+                               {height, width, 4});
+      }
+      break;
+    default:
+      break;
+  }
+  // Compressed (MJPG, H264, RLE, RVL, ...) and planar YUV (YV12, I420, ...)
+  // payloads stay flat.
+  return make_flat_frame_view(frame);
+}
+
+constexpr size_t kMaxCachedPointCloudFilters = 32;
+
+struct PointCloudFilterEntry {
+  std::mutex mutex;
+  ob::PointCloudFilter filter;
+};
+
+template <typename T>
+void append_key(std::string& key, const T& value) {
+  key.append(reinterpret_cast<const char*>(&value), sizeof(value));
+}
+
+// Cache key from the field values. OBCameraParam ends in a bool, so hashing
+// the whole struct would include its uninitialised padding bytes.
+std::string point_cloud_filter_key(const OBCameraParam& param,
+                                   OBFormat format) {
+  std::string key;
+  for (const auto* intrinsic : {&param.depthIntrinsic, &param.rgbIntrinsic}) {
+    append_key(key, intrinsic->fx);
+    append_key(key, intrinsic->fy);
+    append_key(key, intrinsic->cx);
+    append_key(key, intrinsic->cy);
+    append_key(key, intrinsic->width);
+    append_key(key, intrinsic->height);
+  }
+  for (const auto* distortion :
+       {&param.depthDistortion, &param.rgbDistortion}) {
+    append_key(key, distortion->k1);
+    append_key(key, distortion->k2);
+    append_key(key, distortion->k3);
+    append_key(key, distortion->k4);
+    append_key(key, distortion->k5);
+    append_key(key, distortion->k6);
+    append_key(key, distortion->p1);
+    append_key(key, distortion->p2);
+  }
+  append_key(key, param.transform.rot);
+  append_key(key, param.transform.trans);
+  key.push_back(param.isMirrored ? 1 : 0);
+  append_key(key, format);
+  return key;
+}
+
+// Building a PointCloudFilter for every frame set is expensive, so keep one
+// filter per camera param and point format. The cache is intentionally leaked
+// to avoid destroying SDK objects after the SDK has shut down at exit.
+std::shared_ptr<PointCloudFilterEntry> get_point_cloud_filter(
+    const OBCameraParam& param, OBFormat format) {
+  static auto* cache_mutex = new std::mutex();
+  static auto* cache =
+      new std::map<std::string, std::shared_ptr<PointCloudFilterEntry>>();
+  auto key = point_cloud_filter_key(param, format);
+  std::lock_guard<std::mutex> lock(*cache_mutex);
+  auto it = cache->find(key);
+  if (it != cache->end()) {
+    return it->second;
+  }
+  if (cache->size() >= kMaxCachedPointCloudFilters) {
+    cache->clear();
+  }
+  auto entry = std::make_shared<PointCloudFilterEntry>();
+  entry->filter.setCameraParam(param);
+  entry->filter.setCreatePointFormat(format);
+  cache->emplace(std::move(key), entry);
+  return entry;
+}
+
+std::shared_ptr<ob::Frame> process_point_cloud(
+    const std::shared_ptr<ob::FrameSet>& frame_set, const OBCameraParam& param,
+    OBFormat format) {
+  auto entry = get_point_cloud_filter(param, format);
+  std::lock_guard<std::mutex> lock(entry->mutex);
+  return entry->filter.process(frame_set);
+}
+
+size_t count_valid_points(const float* points, size_t points_size,
+                          size_t channels) {
+  size_t count = 0;
+  for (size_t i = 0; i < points_size; ++i) {
+    count += points[i * channels + 2] != 0.0f;
+  }
+  return count;
+}
+
+// Scale the xyz part of every point into `dst`, copying color channels as is.
+// Points with zero depth are skipped when `remove_zero_depth` is set.
+void copy_scaled_points(const float* points, size_t points_size,
+                        size_t channels, float scale, bool remove_zero_depth,
+                        float* dst) {
+  if (!remove_zero_depth && channels == 3) {
+    const size_t size = points_size * channels;
+    for (size_t i = 0; i < size; ++i) {
+      dst[i] = points[i] * scale;
+    }
+    return;
+  }
+  for (size_t i = 0; i < points_size; ++i) {
+    const float* src = points + i * channels;
+    if (remove_zero_depth && src[2] == 0.0f) {
+      continue;
+    }
+    dst[0] = src[0] * scale;
+    dst[1] = src[1] * scale;
+    dst[2] = src[2] * scale;
+    for (size_t c = 3; c < channels; ++c) {
+      dst[c] = src[c];
+    }
+    dst += channels;
+  }
+}
+
+// Allocate a (points_size, channels) float32 array, or return a view of the
+// first `points_size` rows of the caller supplied `out` buffer.
+py::array_t<float> prepare_point_cloud_output(const py::object& out,
+                                              size_t points_size,
+                                              size_t channels) {
+  if (out.is_none()) {
+    return py::array_t<float>({points_size, channels});
+  }
+  if (!py::isinstance<py::array>(out)) {
+    throw std::invalid_argument("out must be a numpy array");
+  }
+  auto array = py::reinterpret_borrow<py::array>(out);
+  if (!array.dtype().is(py::dtype::of<float>()) || array.ndim() != 2 ||
+      static_cast<size_t>(array.shape(1)) != channels ||
+      !(array.flags() & py::array::c_style) || !array.writeable()) {
+    throw std::invalid_argument(
+        "out must be a writeable C-contiguous float32 array of shape (N, " +
+        std::to_string(channels) + ")");
+  }
+  if (static_cast<size_t>(array.shape(0)) < points_size) {
+    throw std::invalid_argument("out has " + std::to_string(array.shape(0)) +
+                                " rows but " + std::to_string(points_size) +
+                                " points are required");
+  }
+  return py::array_t<float>({points_size, channels},
+                            static_cast<float*>(array.mutable_data()), array);
+}
+
+// Filter output of a frame set, `frame` owns the memory `points` refers to.
+struct PointCloudResult {
+  std::shared_ptr<ob::Frame> frame;
+  const float* points = nullptr;
+  size_t points_size = 0;
+  float scale = 1.0f;
+};
+
+bool compute_point_cloud(const std::shared_ptr<ob::FrameSet>& frame_set,
+                         const OBCameraParam& param, OBFormat format,
+                         PointCloudResult* result) {
+  const bool with_color = format == OB_FORMAT_RGB_POINT;
+  const size_t channels = with_color ? 6 : 3;
+  try {
+    auto depth_frame = frame_set->depthFrame();
+    if (!depth_frame || (with_color && !frame_set->colorFrame())) {
+      std::cerr << (with_color ? "depth or color frame not exists"
+                               : "depth frame not exists")
+                << std::endl;
+      return false;
+    }
+    {
+      py::gil_scoped_release release;
+      result->frame = process_point_cloud(frame_set, param, format);
+    }
+    if (!result->frame) {
+      std::cerr << "point cloud filter process failed" << std::endl;
+      return false;
+    }
+    result->points = static_cast<const float*>(result->frame->data());
+    if (!result->points) {
+      std::cerr << "cast points failed" << std::endl;
+      return false;
+    }
+    result->points_size =
+        result->frame->dataSize() / (channels * sizeof(float));
+    result->scale = depth_frame->getValueScale();
+    return true;
+  } catch (const ob::Error& e) {
+    throw OBError(e);
+  }
+}
+
+py::array_t<float> frame_set_to_point_cloud(
+    const std::shared_ptr<ob::FrameSet>& frame_set, const OBCameraParam& param,
+    OBFormat format, const py::object& out, bool remove_zero_depth) {
+  const size_t channels = format == OB_FORMAT_RGB_POINT ? 6 : 3;
+  PointCloudResult point_cloud;
+  if (!compute_point_cloud(frame_set, param, format, &point_cloud)) {
+    return {};
+  }
+  size_t result_size = point_cloud.points_size;
+  if (remove_zero_depth) {
+    py::gil_scoped_release release;
+    result_size = count_valid_points(point_cloud.points,
+                                     point_cloud.points_size, channels);
+  }
+  auto result = prepare_point_cloud_output(out, result_size, channels);
+  auto* dst = result.mutable_data();
+  {
+    py::gil_scoped_release release;
+    copy_scaled_points(point_cloud.points, point_cloud.points_size, channels,
+                       point_cloud.scale, remove_zero_depth, dst);
+  }
+  return result;
+}
+
+// Structured dtype matching the memory layout of OBPoint / OBColorPoint.
+py::dtype make_point_dtype(bool with_color) {
+  static const char* names[] = {"x", "y", "z", "r", "g", "b"};
+  py::list fields;
+  for (size_t i = 0; i < (with_color ? 6u : 3u); ++i) {
+    fields.append(py::make_tuple(names[i], "<f4"));
+  }
+  return py::dtype::from_args(fields);
+}
+
+py::array frame_set_to_structured_points(
+    const std::shared_ptr<ob::FrameSet>& frame_set, const OBCameraParam& param,
+    OBFormat format) {
+  const bool with_color = format == OB_FORMAT_RGB_POINT;
+  const size_t channels = with_color ? 6 : 3;
+  auto dtype = make_point_dtype(with_color);
+  PointCloudResult point_cloud;
+  if (!compute_point_cloud(frame_set, param, format, &point_cloud)) {
+    return py::array(dtype, py::array::ShapeContainer({0}));
+  }
+  py::array result(dtype,
+                   py::array::ShapeContainer({point_cloud.points_size}));
+  auto* dst = static_cast<float*>(result.mutable_data());
+  {
+    py::gil_scoped_release release;
+    copy_scaled_points(point_cloud.points, point_cloud.points_size, channels,
+                       point_cloud.scale, false, dst);
+  }
+  return result;
+}
+}  // namespace
+
 void define_frame(const py::object& m) {
   py::class_<ob::Frame, std::shared_ptr<ob::Frame>>(m, "Frame")
       .def("get_type",
@@ -37,6 +356,13 @@ void define_frame(const py::object& m) {
              std::memcpy(result.mutable_data(), data, data_size);
              return result;
            })
+      .def(
+          "get_data_view",
+          [](const std::shared_ptr<ob::Frame>& self) {
+            return make_flat_frame_view(self);
+          },
+          "Get a read-only uint8 view of the frame data without copying, the "
+          "view keeps the frame alive")
       .def(
           "get_data_pointer",
           [](const std::shared_ptr<ob::Frame>& self) {
@@ -165,6 +491,14 @@ void define_video_frame(const py::object& m) {
              std::memcpy(result.mutable_data(), meta_data, meta_data_size);
              return result;
            })
+      .def(
+          "get_data_view",
+          [](const std::shared_ptr<ob::VideoFrame>& self) {
+            return make_video_frame_view(self);
+          },
+          "Get a read-only view of the frame data without copying, shaped "
+          "(height, width) uint16 for depth/IR and (height, width, channels) "
+          "uint8 for packed color formats, compressed formats stay flat")
       .def("get_metadata_size",
            [](const std::shared_ptr<ob::VideoFrame>& self) {
              return self->metadataSize();
@@ -268,187 +602,85 @@ void define_frame_set(const py::object& m) {
            [](const std::shared_ptr<ob::FrameSet>& self, int index) {
              return self->getFrame(index);
            })
-      .def("convert_to_points",
-           [](const std::shared_ptr<ob::FrameSet>& self,
-              const OBCameraParam& param) -> py::list {
-             try {
-               ob::PointCloudFilter filter;
-               filter.setCameraParam(param);
-               filter.setCreatePointFormat(OB_FORMAT_POINT);
-
-               auto depth_frame = self->depthFrame();
-               if (!depth_frame) {
-                 std::cerr << "depth frame not exists" << std::endl;
-                 return py::list();
-               }
-               auto frame = filter.process(self);
-               if (!frame) {
-                 std::cerr << "point cloud filter process failed" << std::endl;
-                 return py::list();
-               }
-               auto points_size =
-                   static_cast<size_t>(frame->dataSize() / sizeof(OBPoint));
-               auto scale = depth_frame->getValueScale();
-               auto points = reinterpret_cast<OBPoint*>(frame->data());
-               if (!points) {
-                 std::cerr << "cast points failed" << std::endl;
-                 return py::list();
-               }
-               py::list result;
-               for (size_t i = 0; i < points_size; ++i) {
-                 auto point = points[i];
-                 point.x *= scale;
-                 point.y *= scale;
-                 point.z *= scale;
-                 result.append(py::cast(point));
-               }
-               return result;
-             } catch (const ob::Error& e) {
-               throw OBError(e);
-             }
-           })
-      .def("convert_to_color_points",
-           [](const std::shared_ptr<ob::FrameSet>& self,
-              const OBCameraParam& param) -> py::list {
-             try {
-               ob::PointCloudFilter filter;
-               filter.setCameraParam(param);
-               filter.setCreatePointFormat(OB_FORMAT_RGB_POINT);
-
-               auto depth_frame = self->depthFrame();
-               auto color_frame = self->colorFrame();
-               if (!depth_frame || !color_frame) {
-                 std::cerr << "depth or color frame not exists" << std::endl;
-                 return py::list();
-               }
-               auto frame = filter.process(self);
-               if (!frame) {
-                 return py::list();
-               }
-               auto points_size = static_cast<size_t>(frame->dataSize() /
-                                                      sizeof(OBColorPoint));
-               auto scale = depth_frame->getValueScale();
-               auto points = reinterpret_cast<OBColorPoint*>(frame->data());
-               if (!points) {
-                 std::cerr << "cast points failed" << std::endl;
-                 return py::list();
-               }
-               py::list result;
-               for (size_t i = 0; i < points_size; ++i) {
-                 auto point = points[i];
-                 point.x *= scale;
-                 point.y *= scale;
-                 point.z *= scale;
-                 result.append(py::cast(point));
-               }
-               return result;
-             } catch (const ob::Error& e) {
-               throw OBError(e);
-             }
-           })
-      .def("get_point_cloud",
-           [](const std::shared_ptr<ob::FrameSet>& self,
-              const OBCameraParam& param) -> py::array_t<float> {
-             try {
-               ob::PointCloudFilter filter;
-               filter.setCameraParam(param);
-               filter.setCreatePointFormat(OB_FORMAT_POINT);
-
-               auto depth_frame = self->depthFrame();
-               if (!depth_frame) {
-                 std::cerr << "depth frame not exists" << std::endl;
-                 return {};
-               }
-               auto frame = filter.process(self);
-               if (!frame) {
-                 std::cerr << "point cloud filter process failed" << std::endl;
-                 return {};
-               }
-               long points_size =
-                   static_cast<long>(frame->dataSize() / sizeof(OBPoint));
-               auto scale = depth_frame->getValueScale();
-               auto points = reinterpret_cast<OBPoint*>(frame->data());
-               if (!points) {
-                 std::cerr << "cast points failed" << std::endl;
-                 return {};
-               }
-
-               py::array::ShapeContainer shape({points_size, 3});
-               py::array::StridesContainer strides(
-                   {3 * sizeof(float), sizeof(float)});
-               py::dtype dtype("float");
-
-               py::array array(dtype, shape, strides);
-               py::array_t<float> result = py::cast<py::array_t<float>>(array);
-               py::buffer_info buf_info = result.request();
-               auto* ptr = static_cast<float*>(buf_info.ptr);
-               for (long i = 0; i < points_size; ++i) {
-                 auto point = points[i];
-                 point.x *= scale;
-                 point.y *= scale;
-                 point.z *= scale;
-                 size_t index = i * 3;
-                 ptr[index] = point.x;
-                 ptr[index + 1] = point.y;
-                 ptr[index + 2] = point.z;
-               }
-               return result;
-             } catch (const ob::Error& e) {
-               throw OBError(e);
-             }
-           })
-      .def("get_color_point_cloud",
-           [](const std::shared_ptr<ob::FrameSet>& self,
-              const OBCameraParam& param) -> py::array_t<float> {
-             try {
-               ob::PointCloudFilter filter;
-               filter.setCameraParam(param);
-               filter.setCreatePointFormat(OB_FORMAT_RGB_POINT);
-
-               auto depth_frame = self->depthFrame();
-               auto color_frame = self->colorFrame();
-               if (!depth_frame || !color_frame) {
-                 std::cerr << "depth or color frame not exists" << std::endl;
-                 return {};
-               }
-               auto frame = filter.process(self);
-               if (!frame) {
-                 return {};
-               }
-               long points_size =
-                   static_cast<long>(frame->dataSize() / sizeof(OBColorPoint));
-               auto scale = depth_frame->getValueScale();
-               auto points = reinterpret_cast<OBColorPoint*>(frame->data());
-               if (!points) {
-                 std::cerr << "cast points failed" << std::endl;
-                 return {};
-               }
-               py::array::ShapeContainer shape({points_size, 6});
-               py::array::StridesContainer strides(
-                   {6 * sizeof(float), sizeof(float)});
-               py::dtype dtype("float");
-               py::array array(dtype, shape, strides);
-               py::array_t<float> result = py::cast<py::array_t<float>>(array);
-               py::buffer_info buf_info = result.request();
-               auto* ptr = static_cast<float*>(buf_info.ptr);
-               for (long i = 0; i < points_size; ++i) {
-                 auto point = points[i];
-                 point.x *= scale;
-                 point.y *= scale;
-                 point.z *= scale;
-                 size_t index = i * 6;
-                 ptr[index] = point.x;
-                 ptr[index + 1] = point.y;
-                 ptr[index + 2] = point.z;
-                 ptr[index + 3] = point.r;
-                 ptr[index + 4] = point.g;
-                 ptr[index + 5] = point.b;
-               }
-               return result;
-             } catch (const ob::Error& e) {
-               throw OBError(e);
-             }
-           })
+      .def(
+          "convert_to_points",
+          [](const std::shared_ptr<ob::FrameSet>& self,
+             const OBCameraParam& param, bool as_array) -> py::object {
+            if (as_array) {
+              return frame_set_to_structured_points(self, param,
+                                                    OB_FORMAT_POINT);
+            }
+            PointCloudResult point_cloud;
+            if (!compute_point_cloud(self, param, OB_FORMAT_POINT,
+                                     &point_cloud)) {
+              return py::list();
+            }
+            auto points = reinterpret_cast<const OBPoint*>(point_cloud.points);
+            py::list result;
+            for (size_t i = 0; i < point_cloud.points_size; ++i) {
+              auto point = points[i];
+              point.x *= point_cloud.scale;
+              point.y *= point_cloud.scale;
+              point.z *= point_cloud.scale;
+              result.append(py::cast(point));
+            }
+            return result;
+          },
+          py::arg("param"), py::arg("as_array") = false,
+          "Convert to a list of OBPoint, or to a structured (x, y, z) float32 "
+          "array when as_array is set")
+      .def(
+          "convert_to_color_points",
+          [](const std::shared_ptr<ob::FrameSet>& self,
+             const OBCameraParam& param, bool as_array) -> py::object {
+            if (as_array) {
+              return frame_set_to_structured_points(self, param,
+                                                    OB_FORMAT_RGB_POINT);
+            }
+            PointCloudResult point_cloud;
+            if (!compute_point_cloud(self, param, OB_FORMAT_RGB_POINT,
+                                     &point_cloud)) {
+              return py::list();
+            }
+            auto points =
+                reinterpret_cast<const OBColorPoint*>(point_cloud.points);
+            py::list result;
+            for (size_t i = 0; i < point_cloud.points_size; ++i) {
+              auto point = points[i];
+              point.x *= point_cloud.scale;
+              point.y *= point_cloud.scale;
+              point.z *= point_cloud.scale;
+              result.append(py::cast(point));
+            }
+            return result;
+          },
+          py::arg("param"), py::arg("as_array") = false,
+          "Convert to a list of OBColorPoint, or to a structured (x, y, z, r, "
+          "g, b) float32 array when as_array is set")
+      .def(
+          "get_point_cloud",
+          [](const std::shared_ptr<ob::FrameSet>& self,
+             const OBCameraParam& param, const py::object& out,
+             bool remove_zero_depth) {
+            return frame_set_to_point_cloud(self, param, OB_FORMAT_POINT, out,
+                                            remove_zero_depth);
+          },
+          py::arg("param"), py::arg("out") = py::none(),
+          py::arg("remove_zero_depth") = false,
+          "Get the (N, 3) float32 point cloud, optionally written into a "
+          "preallocated out array and without zero depth points")
+      .def(
+          "get_color_point_cloud",
+          [](const std::shared_ptr<ob::FrameSet>& self,
+             const OBCameraParam& param, const py::object& out,
+             bool remove_zero_depth) {
+            return frame_set_to_point_cloud(self, param, OB_FORMAT_RGB_POINT,
+                                            out, remove_zero_depth);
+          },
+          py::arg("param"), py::arg("out") = py::none(),
+          py::arg("remove_zero_depth") = false,
+          "Get the (N, 6) float32 colored point cloud, optionally written into "
+          "a preallocated out array and without zero depth points")
       .def("__repr__", [](const std::shared_ptr<ob::FrameSet>& self) {
         std::ostringstream oss;
         oss << "<FrameSet type=" << self->type() << " format=" << self->format()
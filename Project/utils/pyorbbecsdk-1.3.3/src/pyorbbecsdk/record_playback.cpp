@@ -15,9 +15,430 @@
 *******************************************************************************/
 #include "record_playback.hpp"
 
+#include <pybind11/numpy.h>
+#include <sys/stat.h>
+
+#include <algorithm>
+#include <chrono>
+#include <condition_variable>
+#include <cstdio>
+#include <cstdint>
+#include <deque>
+#include <fstream>
+#include <limits>
+#include <mutex>
+#include <string>
+#include <utility>
+#include <vector>
+
 #include "error.hpp"
 
 namespace pyorbbecsdk {
+namespace {
+constexpr uint32_t kIndexMagic = 0x5849424f;  // "OBIX"
+constexpr uint32_t kIndexVersion = 1;
+constexpr uint64_t kSkipAll = std::numeric_limits<uint64_t>::max();
+
+struct PlaybackIndexHeader {
+  uint32_t magic;
+  uint32_t version;
+  uint64_t bag_size;
+  int64_t bag_mtime;
+  uint32_t media_type;
+  uint32_t reserved;
+  uint64_t count;
+};
+
+// Iterates the frame sets of a bag without a Python callback. Frames from the
+// SDK playback thread are grouped into frame sets (a new set starts when a
+// frame type repeats) and queued, next() waits for them with the GIL
+// released. The playback thread blocks while max_queued sets are waiting, so
+// reading is paced by the consumer instead of dropping frames.
+//
+// SDK 1.x playback runs at the recorded frame rate and cannot seek. Seeking
+// forward drops the sets in between as the playback thread delivers them,
+// seeking backward restarts the playback, so a seek takes as long as playing
+// the bag up to the target. Building the frame set index plays the whole bag
+// once, it is cached in <bag>.obindex and makes the bag length and
+// seek-by-timestamp available to later opens right away.
+class PlaybackReader {
+ public:
+  PlaybackReader(std::string path, OBMediaType media_type, size_t max_queued,
+                 uint32_t timeout_ms)
+      : path_(std::move(path)),
+        media_type_(media_type),
+        max_queued_(std::max<size_t>(max_queued, 1)),
+        timeout_(timeout_ms) {
+    load_index();
+    restart(0);
+  }
+
+  ~PlaybackReader() { close(); }
+
+  PlaybackReader(const PlaybackReader&) = delete;
+  PlaybackReader& operator=(const PlaybackReader&) = delete;
+
+  bool has_index() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    return index_ready_;
+  }
+
+  // Plays the whole bag once and records the timestamp of every frame set.
+  void build_index() {
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      if (index_ready_) {
+        return;
+      }
+    }
+    restart(kSkipAll, true);
+    {
+      std::unique_lock<std::mutex> lock(mutex_);
+      wait_for_end(lock);
+      index_ready_ = true;
+      indexing_ = false;
+    }
+    save_index();
+    restart(0);
+  }
+
+  std::vector<uint64_t> timestamps() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    require_index();
+    return index_;
+  }
+
+  // A TypeError, so list(reader) falls back to iterating without an index.
+  size_t size() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (!index_ready_) {
+      throw py::type_error(
+          "No frame index for " + path_ +
+          ", open it with build_index=True or call build_index()");
+    }
+    return index_.size();
+  }
+
+  uint64_t tell() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    return position_;
+  }
+
+  // Returns nullptr at the end of the bag or when playback stalled for the
+  // timeout. Sets skipped by a seek count as progress, so a far seek waits as
+  // long as playback keeps moving towards the target.
+  std::shared_ptr<ob::FrameSet> next() {
+    std::unique_lock<std::mutex> lock(mutex_);
+    if (!playback_) {
+      throw std::runtime_error("PlaybackReader is closed");
+    }
+    uint64_t produced = produced_;
+    while (!cv_.wait_for(lock, timeout_,
+                         [this] { return !queue_.empty() || finished_; })) {
+      if (produced_ == produced) {
+        return nullptr;
+      }
+      produced = produced_;
+    }
+    if (queue_.empty()) {
+      return nullptr;
+    }
+    auto item = std::move(queue_.front());
+    queue_.pop_front();
+    position_ = item.first + 1;
+    cv_.notify_all();
+    return item.second;
+  }
+
+  void seek(uint64_t position) {
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      if (index_ready_ && position > index_.size()) {
+        throw py::index_error("frame set " + std::to_string(position) +
+                              " out of range, bag has " +
+                              std::to_string(index_.size()));
+      }
+      if (playback_ && position >= position_) {
+        // forward, drop what is queued before the target and skip the rest
+        while (!queue_.empty() && queue_.front().first < position) {
+          queue_.pop_front();
+        }
+        skip_until_ = std::max(skip_until_, position);
+        position_ = position;
+        cv_.notify_all();
+        return;
+      }
+    }
+    restart(position);
+  }
+
+  // Seeks to the first frame set at or after timestamp_us, returns its number.
+  uint64_t seek_timestamp(uint64_t timestamp_us) {
+    uint64_t position;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      require_index();
+      position = std::lower_bound(index_.begin(), index_.end(), timestamp_us) -
+                 index_.begin();
+    }
+    seek(position);
+    return position;
+  }
+
+  std::shared_ptr<ob::Playback> playback() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    if (!playback_) {
+      throw std::runtime_error("PlaybackReader is closed");
+    }
+    return playback_;
+  }
+
+  void close() {
+    std::shared_ptr<ob::Playback> playback;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      ++generation_;
+      queue_.clear();
+      playback.swap(playback_);
+      cv_.notify_all();
+    }
+    if (playback) {
+      playback->stop();
+    }
+  }
+
+ private:
+  void require_index() const {
+    if (!index_ready_) {
+      throw std::runtime_error(
+          "No frame index for " + path_ +
+          ", open it with build_index=True or call build_index()");
+    }
+  }
+
+  bool stat_bag(uint64_t* size, int64_t* mtime) const {
+    struct stat info;
+    if (stat(path_.c_str(), &info) != 0) {
+      return false;
+    }
+    *size = static_cast<uint64_t>(info.st_size);
+    *mtime = static_cast<int64_t>(info.st_mtime);
+    return true;
+  }
+
+  // A cached index is used only if the bag did not change since.
+  void load_index() {
+    PlaybackIndexHeader header{};
+    uint64_t size;
+    int64_t mtime;
+    std::ifstream file(path_ + ".obindex", std::ios::binary);
+    if (!file || !stat_bag(&size, &mtime) ||
+        !file.read(reinterpret_cast<char*>(&header), sizeof(header)) ||
+        header.magic != kIndexMagic || header.version != kIndexVersion ||
+        header.bag_size != size || header.bag_mtime != mtime ||
+        header.media_type != static_cast<uint32_t>(media_type_)) {
+      return;
+    }
+    std::vector<uint64_t> index(header.count);
+    if (!file.read(reinterpret_cast<char*>(index.data()),
+                   static_cast<std::streamsize>(index.size() *
+                                                sizeof(uint64_t)))) {
+      return;
+    }
+    index_ = std::move(index);
+    index_ready_ = true;
+  }
+
+  // Writing the cache is best effort, the bag may sit on a read-only share.
+  void save_index() {
+    PlaybackIndexHeader header{};
+    if (!stat_bag(&header.bag_size, &header.bag_mtime)) {
+      return;
+    }
+    header.magic = kIndexMagic;
+    header.version = kIndexVersion;
+    header.media_type = static_cast<uint32_t>(media_type_);
+    std::vector<uint64_t> index;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      index = index_;
+    }
+    header.count = index.size();
+    std::string temp_path = path_ + ".obindex.tmp";
+    {
+      std::ofstream file(temp_path, std::ios::binary | std::ios::trunc);
+      if (!file) {
+        return;
+      }
+      file.write(reinterpret_cast<const char*>(&header), sizeof(header));
+      file.write(reinterpret_cast<const char*>(index.data()),
+                 static_cast<std::streamsize>(index.size() *
+                                              sizeof(uint64_t)));
+      if (!file) {
+        std::remove(temp_path.c_str());
+        return;
+      }
+    }
+    std::remove((path_ + ".obindex").c_str());
+    std::rename(temp_path.c_str(), (path_ + ".obindex").c_str());
+  }
+
+  void wait_for_end(std::unique_lock<std::mutex>& lock) {
+    // the end state may never come from a damaged bag, a stall ends it too
+    uint64_t produced = produced_;
+    while (!finished_) {
+      if (!cv_.wait_for(lock, timeout_, [this] { return finished_; }) &&
+          produced_ == produced) {
+        finished_ = true;
+      }
+      produced = produced_;
+    }
+  }
+
+  // Starts a new playback from the beginning that skips the first `skip`
+  // frame sets. Callbacks of the previous playback are ignored from here on.
+  void restart(uint64_t skip, bool indexing = false) {
+    close();
+    uint64_t generation;
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      generation = ++generation_;
+      pending_.reset();
+      pending_types_ = 0;
+      produced_ = 0;
+      skip_until_ = skip;
+      position_ = skip == kSkipAll ? 0 : skip;
+      finished_ = false;
+      indexing_ = indexing;
+      if (indexing) {
+        index_.clear();
+      }
+    }
+    std::shared_ptr<ob::Playback> playback;
+    OB_TRY_CATCH({
+      playback = std::make_shared<ob::Playback>(path_.c_str());
+      playback->setPlaybackStateCallback([this, generation](
+                                             OBMediaState state) {
+        if (state == OBMediaState::OB_MEDIA_END) {
+          on_end(generation);
+        }
+      });
+    });
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      playback_ = playback;
+    }
+    OB_TRY_CATCH({
+      playback->start(
+          [this, generation](std::shared_ptr<ob::Frame> frame) {
+            on_frame(generation, frame);
+          },
+          media_type_);
+    });
+  }
+
+  void on_frame(uint64_t generation, const std::shared_ptr<ob::Frame>& frame) {
+    std::unique_lock<std::mutex> lock(mutex_);
+    if (generation != generation_ || !frame) {
+      return;
+    }
+    try {
+      if (frame->type() == OB_FRAME_SET) {
+        flush(lock, generation);
+        auto frame_set = frame->as<ob::FrameSet>();
+        auto depth_frame = frame_set->depthFrame();
+        emit(lock, generation, frame_set,
+             depth_frame ? depth_frame->timeStampUs() : frame->timeStampUs());
+        return;
+      }
+      uint32_t bit = 1u << static_cast<uint32_t>(frame->type());
+      if (pending_types_ & bit) {
+        flush(lock, generation);
+        if (generation != generation_) {
+          return;
+        }
+      }
+      if (!pending_) {
+        pending_ = ob::FrameHelper::createFrameSet();
+        pending_timestamp_ = frame->timeStampUs();
+      }
+      ob::FrameHelper::pushFrame(pending_, frame->type(), frame);
+      if (frame->type() == OB_FRAME_DEPTH) {
+        // depth stamps the set, like FrameMatcher matching on depth first
+        pending_timestamp_ = frame->timeStampUs();
+      }
+      pending_types_ |= bit;
+    } catch (const ob::Error&) {
+      // a frame that cannot be grouped is dropped, the playback thread goes on
+    } catch (const std::exception&) {
+    }
+  }
+
+  void on_end(uint64_t generation) {
+    std::unique_lock<std::mutex> lock(mutex_);
+    if (generation != generation_) {
+      return;
+    }
+    flush(lock, generation);
+    if (generation == generation_) {
+      finished_ = true;
+      cv_.notify_all();
+    }
+  }
+
+  void flush(std::unique_lock<std::mutex>& lock, uint64_t generation) {
+    if (!pending_) {
+      return;
+    }
+    std::shared_ptr<ob::FrameSet> frame_set;
+    frame_set.swap(pending_);
+    pending_types_ = 0;
+    emit(lock, generation, frame_set, pending_timestamp_);
+  }
+
+  void emit(std::unique_lock<std::mutex>& lock, uint64_t generation,
+            std::shared_ptr<ob::FrameSet> frame_set, uint64_t timestamp_us) {
+    uint64_t ordinal = produced_++;
+    if (indexing_) {
+      index_.push_back(timestamp_us);
+    }
+    cv_.notify_all();
+    if (ordinal < skip_until_) {
+      return;
+    }
+    cv_.wait(lock, [&] {
+      return queue_.size() < max_queued_ || generation != generation_;
+    });
+    if (generation != generation_ || ordinal < skip_until_) {
+      return;
+    }
+    queue_.emplace_back(ordinal, std::move(frame_set));
+    cv_.notify_all();
+  }
+
+  const std::string path_;
+  const OBMediaType media_type_;
+  const size_t max_queued_;
+  const std::chrono::milliseconds timeout_;
+
+  std::mutex mutex_;
+  std::condition_variable cv_;
+  std::shared_ptr<ob::Playback> playback_;
+  uint64_t generation_ = 0;
+  std::deque<std::pair<uint64_t, std::shared_ptr<ob::FrameSet>>> queue_;
+  std::shared_ptr<ob::FrameSet> pending_;
+  uint32_t pending_types_ = 0;
+  uint64_t pending_timestamp_ = 0;
+  uint64_t produced_ = 0;    // frame sets seen by the current playback
+  uint64_t skip_until_ = 0;  // frame sets before this are not queued
+  uint64_t position_ = 0;    // frame set next() returns next
+  bool finished_ = false;
+  bool indexing_ = false;
+  bool index_ready_ = false;
+  std::vector<uint64_t> index_;  // timestamp_us of every frame set
+};
+}  // namespace
+
 void define_recorder(const py::object& m) {
   py::class_<ob::Recorder, std::shared_ptr<ob::Recorder>>(m, "Recorder")
       .def("start",
@@ -81,5 +502,90 @@ void define_playback(const py::object& m) {
             OB_TRY_CATCH({ return self->getCameraParam(); });
           },
           py::call_guard<py::gil_scoped_release>());
+
+  py::class_<PlaybackReader, std::shared_ptr<PlaybackReader>>(m,
+                                                              "PlaybackReader")
+      .def(py::init([](const std::string& path, OBMediaType media_type,
+                       size_t max_queued, bool build_index,
+                       uint32_t timeout_ms) {
+             py::gil_scoped_release release;
+             auto reader = std::make_shared<PlaybackReader>(
+                 path, media_type, max_queued, timeout_ms);
+             if (build_index) {
+               reader->build_index();
+             }
+             return reader;
+           }),
+           py::arg("path"), py::arg("media_type") = OBMediaType::OB_MEDIA_ALL,
+           py::arg("max_queued") = 8, py::arg("build_index") = false,
+           py::arg("timeout_ms") = 5000,
+           "Iterate the frame sets of a bag. Playback runs at the recorded "
+           "frame rate, with build_index a bag without a cached "
+           "<path>.obindex is played once to index it, which takes as long as "
+           "the recording")
+      .def("__iter__",
+           [](const std::shared_ptr<PlaybackReader>& self) { return self; })
+      .def("__next__",
+           [](const std::shared_ptr<PlaybackReader>& self) {
+             std::shared_ptr<ob::FrameSet> frame_set;
+             {
+               py::gil_scoped_release release;
+               frame_set = self->next();
+             }
+             if (!frame_set) {
+               throw py::stop_iteration();
+             }
+             return frame_set;
+           })
+      .def(
+          "__len__",
+          [](const std::shared_ptr<PlaybackReader>& self) {
+            return self->size();
+          },
+          "Number of frame sets, needs the index. Raises TypeError without "
+          "it, list() then reads the bag without a length hint")
+      .def(
+          "read_frame",
+          [](const std::shared_ptr<PlaybackReader>& self, uint64_t position)
+              -> std::shared_ptr<ob::FrameSet> {
+            py::gil_scoped_release release;
+            self->seek(position);
+            return self->next();
+          },
+          py::arg("position"),
+          "Frame set number position, None past the end of the bag. Costs a "
+          "seek to position")
+      .def("seek", &PlaybackReader::seek, py::arg("position"),
+           py::call_guard<py::gil_scoped_release>(),
+           "Seek to frame set number position. Playback cannot jump, a forward "
+           "seek plays through the sets in between and a backward seek "
+           "restarts from the first set, the cost grows with the target "
+           "position")
+      .def("seek_timestamp", &PlaybackReader::seek_timestamp,
+           py::arg("timestamp_us"), py::call_guard<py::gil_scoped_release>(),
+           "Seek to the first frame set at or after timestamp_us, returns its "
+           "number. Needs the index and costs a seek to that number")
+      .def("tell", &PlaybackReader::tell,
+           "Number of the frame set the next read returns")
+      .def("has_index", &PlaybackReader::has_index)
+      .def("build_index", &PlaybackReader::build_index,
+           py::call_guard<py::gil_scoped_release>(),
+           "Play the whole bag once to index its frame sets and cache the "
+           "index in <path>.obindex, takes as long as the recording")
+      .def("get_timestamps",
+           [](const std::shared_ptr<PlaybackReader>& self) {
+             auto timestamps = self->timestamps();
+             py::array_t<uint64_t> result(timestamps.size());
+             std::copy(timestamps.begin(), timestamps.end(),
+                       result.mutable_data());
+             return result;
+           },
+           "timestamp_us of every frame set, the depth frame stamps a set")
+      .def("get_playback",
+           [](const std::shared_ptr<PlaybackReader>& self) {
+             return self->playback();
+           })
+      .def("close", &PlaybackReader::close,
+           py::call_guard<py::gil_scoped_release>());
 }
 }  // namespace pyorbbecsdk
@@ -19,8 +19,10 @@
 #include <pybind11/numpy.h>
 #include <pybind11/pybind11.h>
 
-#include <libobsensor/hpp/Utils.hpp>
+#include <algorithm>
+#include <limits>
 
+#include <libobsensor/hpp/Utils.hpp>
 
 #include "error.hpp"
 namespace py = pybind11;
@@ -43,6 +45,173 @@ std::vector<std::string> split(const std::string& s, const std::string& delim) {
   return elems;
 }
 
+namespace {
+using FloatArray = py::array_t<float, py::array::c_style | py::array::forcecast>;
+
+void check_points(const FloatArray& points, py::ssize_t columns,
+                  const char* name) {
+  if (points.ndim() != 2 || points.shape(1) != columns) {
+    throw std::invalid_argument(std::string(name) + " must be an (N, " +
+                                std::to_string(columns) + ") array");
+  }
+}
+
+void check_depths(const FloatArray& depths, py::ssize_t count) {
+  if (depths.ndim() != 1 || depths.shape(0) != count) {
+    throw std::invalid_argument("depths must be an (N,) array matching points");
+  }
+}
+
+// Calls `transform(i, dst)` for every point with the GIL released and
+// returns the (count, columns) results, points the SDK cannot map are NaN.
+template <typename Transform>
+py::array_t<float> transform_points(py::ssize_t count, py::ssize_t columns,
+                                    Transform transform) {
+  py::array_t<float> result({count, columns});
+  float* dst = result.mutable_data();
+  {
+    py::gil_scoped_release release;
+    OB_TRY_CATCH({
+      for (py::ssize_t i = 0; i < count; ++i) {
+        float* row = dst + i * columns;
+        if (!transform(i, row)) {
+          std::fill_n(row, columns, std::numeric_limits<float>::quiet_NaN());
+        }
+      }
+    });
+  }
+  return result;
+}
+
+void define_coordinate_transform_array_helper(py::module& m) {
+  m.def(
+      "calibration_3d_to_3d_array",
+      [](const OBCalibrationParam& calibrationParam, const FloatArray& points,
+         const OBSensorType sourceSensorType,
+         const OBSensorType targetSensorType) {
+        check_points(points, 3, "points");
+        const float* src = points.data();
+        return transform_points(points.shape(0), 3, [&](py::ssize_t i,
+                                                        float* dst) {
+          OBPoint3f source{src[i * 3], src[i * 3 + 1], src[i * 3 + 2]};
+          OBPoint3f target;
+          if (!ob::CoordinateTransformHelper::calibration3dTo3d(
+                  calibrationParam, source, sourceSensorType,
+                  targetSensorType, &target)) {
+            return false;
+          }
+          dst[0] = target.x;
+          dst[1] = target.y;
+          dst[2] = target.z;
+          return true;
+        });
+      },
+      "Map (N, 3) points between sensor coordinate systems, returns (N, 3) "
+      "float32, NaN where the mapping failed");
+  m.def(
+      "calibration_3d_to_2d_array",
+      [](const OBCalibrationParam& calibrationParam, const FloatArray& points,
+         const OBSensorType sourceSensorType,
+         const OBSensorType targetSensorType) {
+        check_points(points, 3, "points");
+        const float* src = points.data();
+        return transform_points(points.shape(0), 2, [&](py::ssize_t i,
+                                                        float* dst) {
+          OBPoint3f source{src[i * 3], src[i * 3 + 1], src[i * 3 + 2]};
+          OBPoint2f target;
+          if (!ob::CoordinateTransformHelper::calibration3dTo2d(
+                  calibrationParam, source, sourceSensorType,
+                  targetSensorType, &target)) {
+            return false;
+          }
+          dst[0] = target.x;
+          dst[1] = target.y;
+          return true;
+        });
+      },
+      "Project (N, 3) points into the target sensor image, returns (N, 2) "
+      "float32 pixels, NaN where the projection failed");
+  m.def(
+      "calibration_2d_to_3d_array",
+      [](const OBCalibrationParam& calibrationParam, const FloatArray& pixels,
+         const FloatArray& depths, const OBSensorType sourceSensorType,
+         const OBSensorType targetSensorType) {
+        check_points(pixels, 2, "pixels");
+        check_depths(depths, pixels.shape(0));
+        const float* src = pixels.data();
+        const float* depth = depths.data();
+        return transform_points(pixels.shape(0), 3, [&](py::ssize_t i,
+                                                        float* dst) {
+          OBPoint2f source{src[i * 2], src[i * 2 + 1]};
+          OBPoint3f target;
+          if (!ob::CoordinateTransformHelper::calibration2dTo3d(
+                  calibrationParam, source, depth[i], sourceSensorType,
+                  targetSensorType, &target)) {
+            return false;
+          }
+          dst[0] = target.x;
+          dst[1] = target.y;
+          dst[2] = target.z;
+          return true;
+        });
+      },
+      "Unproject (N, 2) pixels with (N,) depth values into the target "
+      "sensor, returns (N, 3) float32, NaN where the mapping failed");
+  m.def(
+      "calibration_2d_to_3d_undistortion_array",
+      [](const OBCalibrationParam& calibrationParam, const FloatArray& pixels,
+         const FloatArray& depths, const OBSensorType sourceSensorType,
+         const OBSensorType targetSensorType) {
+        check_points(pixels, 2, "pixels");
+        check_depths(depths, pixels.shape(0));
+        const float* src = pixels.data();
+        const float* depth = depths.data();
+        return transform_points(pixels.shape(0), 3, [&](py::ssize_t i,
+                                                        float* dst) {
+          OBPoint2f source{src[i * 2], src[i * 2 + 1]};
+          OBPoint3f target;
+          if (!ob::CoordinateTransformHelper::calibration2dTo3dUndistortion(
+                  calibrationParam, source, depth[i], sourceSensorType,
+                  targetSensorType, &target)) {
+            return false;
+          }
+          dst[0] = target.x;
+          dst[1] = target.y;
+          dst[2] = target.z;
+          return true;
+        });
+      },
+      "calibration_2d_to_3d_array with lens undistortion of the source "
+      "pixels");
+  m.def(
+      "calibration_2d_to_2d_array",
+      [](const OBCalibrationParam& calibrationParam, const FloatArray& pixels,
+         const FloatArray& depths, const OBSensorType sourceSensorType,
+         const OBSensorType targetSensorType) {
+        check_points(pixels, 2, "pixels");
+        check_depths(depths, pixels.shape(0));
+        const float* src = pixels.data();
+        const float* depth = depths.data();
+        return transform_points(pixels.shape(0), 2, [&](py::ssize_t i,
+                                                        float* dst) {
+          OBPoint2f source{src[i * 2], src[i * 2 + 1]};
+          OBPoint2f target;
+          if (!ob::CoordinateTransformHelper::calibration2dTo2d(
+                  calibrationParam, source, depth[i], sourceSensorType,
+                  targetSensorType, &target)) {
+            return false;
+          }
+          dst[0] = target.x;
+          dst[1] = target.y;
+          return true;
+        });
+      },
+      "Map (N, 2) pixels with (N,) depth values into the target sensor "
+      "image, e.g. depth to color, returns (N, 2) float32 pixels, NaN where "
+      "the mapping failed");
+}
+}  // namespace
+
 void define_coordinate_transform_helper(py::module& m) {
   m.def("calibration_3d_to_3d",
         [](const OBCalibrationParam calibrationParam,
@@ -106,5 +275,6 @@ void define_coordinate_transform_helper(py::module& m) {
           });
           return result;
         });
+  define_coordinate_transform_array_helper(m);
 }
 }  // namespace pyorbbecsdk
@@ -4,7 +4,7 @@ OrbbecSDK python binding
 from __future__ import annotations
 import numpy
 import typing
-__all__ = ['AccelFrame', 'AccelStreamProfile', 'AlignFilter', 'CameraParamList', 'ColorFrame', 'Config', 'Context', 'DecimationFilter', 'DepthFrame', 'Device', 'DeviceInfo', 'DeviceList', 'DevicePresetList', 'DisparityTransform', 'EdgeNoiseRemovalFilter', 'Filter', 'FormatConvertFilter', 'Frame', 'FrameSet', 'GyroFrame', 'GyroStreamProfile', 'HDRMergeFilter', 'HoleFillingFilter', 'IRFrame', 'NoiseRemovalFilter', 'OBAccelFullScaleRange', 'OBAccelIntrinsic', 'OBAccelValue', 'OBAlignMode', 'OBBaselineCalibrationParam', 'OBCalibrationParam', 'OBCameraAlignIntrinsic', 'OBCameraDistortion', 'OBCameraDistortionModel', 'OBCameraIntrinsic', 'OBCameraParam', 'OBCmdVersion', 'OBColorPoint', 'OBCommunicationType', 'OBCompressionMode', 'OBCompressionParams', 'OBConvertFormat', 'OBCoordinateSystemType', 'OBD2CTransform', 'OBDCPowerState', 'OBDDONoiseRemovalType', 'OBDataBundle', 'OBDataTranState', 'OBDepthCroppingMode', 'OBDepthPrecisionLevel', 'OBDepthWorkMode', 'OBDepthWorkModeList', 'OBDeviceDevelopmentMode', 'OBDeviceIpAddrConfig', 'OBDeviceSyncConfig', 'OBDeviceTemperature', 'OBDeviceTimestampResetConfig', 'OBDeviceType', 'OBEdgeNoiseRemovalFilterParams', 'OBEdgeNoiseRemovalType', 'OBError', 'OBException', 'OBFileTranState', 'OBFilterList', 'OBFloatPropertyRange', 'OBFormat', 'OBFrameAggregateOutputMode', 'OBFrameMetadataType', 'OBFrameType', 'OBGyroIntrinsic', 'OBGyroSampleRate', 'OBHdrConfig', 'OBHoleFillingMode', 'OBIntPropertyRange', 'OBLogLevel', 'OBMediaState', 'OBMediaType', 'OBMultiDeviceSyncConfig', 'OBMultiDeviceSyncMode', 'OBNoiseRemovalFilterParams', 'OBPermissionType', 'OBPoint', 'OBPoint2f', 'OBPowerLineFreqMode', 'OBPropertyID', 'OBPropertyItem', 'OBPropertyType', 'OBProtocolVersion', 'OBRect', 'OBRegionOfInterest', 'OBRotateDegreeType', 'OBSensorType', 'OBSequenceIdItem', 'OBSpatialAdvancedFilterParams', 'OBStatus', 'OBStreamType', 'OBSyncMode', 'OBTofExposureThresholdControl', 'OBTofFilterRange', 'OBUSBPowerState', 'OBUint16PropertyRange', 'OBUint8PropertyRange', 'OBUpgradeState', 'Pipeline', 'Playback', 'PointCloudFilter', 'PointsFrame', 'Recorder', 'Sensor', 'SensorList', 'SequenceIdFilter', 'SpatialAdvancedFilter', 'StreamProfile', 'StreamProfileList', 'TemporalFilter', 'ThresholdFilter', 'VideoFrame', 'VideoStreamProfile', 'calibration_2d_to_3d', 'calibration_2d_to_3d_undistortion', 'calibration_3d_to_2d', 'calibration_3d_to_3d', 'get_version']
+__all__ = ['AccelFrame', 'AccelStreamProfile', 'AlignFilter', 'CameraParamList', 'ColorFrame', 'Config', 'Context', 'DecimationFilter', 'DepthFrame', 'Device', 'DeviceInfo', 'DeviceList', 'DevicePresetList', 'DisparityTransform', 'EdgeNoiseRemovalFilter', 'Filter', 'FormatConvertFilter', 'Frame', 'FrameSet', 'GyroFrame', 'GyroStreamProfile', 'HDRMergeFilter', 'HoleFillingFilter', 'IRFrame', 'NoiseRemovalFilter', 'OBAccelFullScaleRange', 'OBAccelIntrinsic', 'OBAccelValue', 'OBAlignMode', 'OBBaselineCalibrationParam', 'OBCalibrationParam', 'OBCameraAlignIntrinsic', 'OBCameraDistortion', 'OBCameraDistortionModel', 'OBCameraIntrinsic', 'OBCameraParam', 'OBCmdVersion', 'OBColorPoint', 'OBCommunicationType', 'OBCompressionMode', 'OBCompressionParams', 'OBConvertFormat', 'OBCoordinateSystemType', 'OBD2CTransform', 'OBDCPowerState', 'OBDDONoiseRemovalType', 'OBDataBundle', 'OBDataTranState', 'OBDepthCroppingMode', 'OBDepthPrecisionLevel', 'OBDepthWorkMode', 'OBDepthWorkModeList', 'OBDeviceDevelopmentMode', 'OBDeviceIpAddrConfig', 'OBDeviceSyncConfig', 'OBDeviceTemperature', 'OBDeviceTimestampResetConfig', 'OBDeviceType', 'OBEdgeNoiseRemovalFilterParams', 'OBEdgeNoiseRemovalType', 'OBError', 'OBException', 'OBFileTranState', 'OBFilterList', 'OBFloatPropertyRange', 'OBFormat', 'OBFrameAggregateOutputMode', 'OBFrameMetadataType', 'OBFrameType', 'OBGyroIntrinsic', 'OBGyroSampleRate', 'OBHdrConfig', 'OBHoleFillingMode', 'OBIntPropertyRange', 'OBLogLevel', 'OBMediaState', 'OBMediaType', 'OBMultiDeviceSyncConfig', 'OBMultiDeviceSyncMode', 'OBNoiseRemovalFilterParams', 'OBPermissionType', 'OBPoint', 'OBPoint2f', 'OBPowerLineFreqMode', 'OBPropertyID', 'OBPropertyItem', 'OBPropertyType', 'OBProtocolVersion', 'OBRect', 'OBRegionOfInterest', 'OBRotateDegreeType', 'OBSensorType', 'OBSequenceIdItem', 'OBSpatialAdvancedFilterParams', 'OBStatus', 'OBStreamType', 'OBSyncMode', 'OBTofExposureThresholdControl', 'OBTofFilterRange', 'OBUSBPowerState', 'OBUint16PropertyRange', 'OBUint8PropertyRange', 'OBUpgradeState', 'Pipeline', 'Playback', 'PlaybackReader', 'PointCloudFilter', 'PointsFrame', 'Recorder', 'Sensor', 'SensorList', 'SequenceIdFilter', 'SpatialAdvancedFilter', 'StreamProfile', 'StreamProfileList', 'TemporalFilter', 'ThresholdFilter', 'VideoFrame', 'VideoStreamProfile', 'calibration_2d_to_2d_array', 'calibration_2d_to_3d', 'calibration_2d_to_3d_array', 'calibration_2d_to_3d_undistortion', 'calibration_2d_to_3d_undistortion_array', 'calibration_3d_to_2d', 'calibration_3d_to_2d_array', 'calibration_3d_to_3d', 'calibration_3d_to_3d_array', 'get_version']
 class AccelFrame(Frame):
     def __init__(self, arg0: Frame) -> None:
         ...
@@ -371,6 +371,10 @@ class Frame:
         ...
     def get_data_size(self) -> int:
         ...
+    def get_data_view(self) -> numpy.ndarray[numpy.uint8]:
+        """
+        Get a read-only uint8 view of the frame data without copying, the view keeps the frame alive
+        """
     def get_format(self) -> OBFormat:
         ...
     def get_global_timestamp_us(self) -> int:
@@ -396,14 +400,20 @@ class Frame:
 class FrameSet(Frame):
     def __repr__(self) -> None:
         ...
-    def convert_to_color_points(self, arg0: OBCameraParam) -> list:
-        ...
-    def convert_to_points(self, arg0: OBCameraParam) -> list:
-        ...
+    def convert_to_color_points(self, param: OBCameraParam, as_array: bool = False) -> typing.Union[list, numpy.ndarray]:
+        """
+        Convert to a list of OBColorPoint, or to a structured (x, y, z, r, g, b) float32 array when as_array is set
+        """
+    def convert_to_points(self, param: OBCameraParam, as_array: bool = False) -> typing.Union[list, numpy.ndarray]:
+        """
+        Convert to a list of OBPoint, or to a structured (x, y, z) float32 array when as_array is set
+        """
     def get_color_frame(self) -> ColorFrame:
         ...
-    def get_color_point_cloud(self, arg0: OBCameraParam) -> numpy.ndarray[numpy.float32]:
-        ...
+    def get_color_point_cloud(self, param: OBCameraParam, out: typing.Optional[numpy.ndarray] = None, remove_zero_depth: bool = False) -> numpy.ndarray[numpy.float32]:
+        """
+        Get the (N, 6) float32 colored point cloud, optionally written into a preallocated out array and without zero depth points
+        """
     def get_depth_frame(self) -> DepthFrame:
         ...
     def get_frame(self, arg0: OBFrameType) -> Frame:
@@ -416,8 +426,10 @@ class FrameSet(Frame):
         ...
     def get_ir_frame(self) -> IRFrame:
         ...
-    def get_point_cloud(self, arg0: OBCameraParam) -> numpy.ndarray[numpy.float32]:
-        ...
+    def get_point_cloud(self, param: OBCameraParam, out: typing.Optional[numpy.ndarray] = None, remove_zero_depth: bool = False) -> numpy.ndarray[numpy.float32]:
+        """
+        Get the (N, 3) float32 point cloud, optionally written into a preallocated out array and without zero depth points
+        """
     def get_points_frame(self) -> PointsFrame:
         ...
 class GyroFrame(Frame):
@@ -3315,6 +3327,49 @@ class Playback:
         ...
     def stop(self) -> None:
         ...
+class PlaybackReader:
+    def __init__(self, path: str, media_type: OBMediaType = ..., max_queued: int = 8, build_index: bool = False, timeout_ms: int = 5000) -> None:
+        """
+        Iterate the frame sets of a bag. Playback runs at the recorded frame rate, with build_index a bag without a cached <path>.obindex is played once to index it, which takes as long as the recording
+        """
+    def __iter__(self) -> PlaybackReader:
+        ...
+    def __len__(self) -> int:
+        """
+        Number of frame sets, needs the index. Raises TypeError without it, list() then reads the bag without a length hint
+        """
+    def __next__(self) -> FrameSet:
+        ...
+    def build_index(self) -> None:
+        """
+        Play the whole bag once to index its frame sets and cache the index in <path>.obindex, takes as long as the recording
+        """
+    def close(self) -> None:
+        ...
+    def get_playback(self) -> Playback:
+        ...
+    def get_timestamps(self) -> numpy.ndarray[numpy.uint64]:
+        """
+        timestamp_us of every frame set, the depth frame stamps a set
+        """
+    def has_index(self) -> bool:
+        ...
+    def read_frame(self, position: int) -> typing.Optional[FrameSet]:
+        """
+        Frame set number position, None past the end of the bag. Costs a seek to position
+        """
+    def seek(self, position: int) -> None:
+        """
+        Seek to frame set number position. Playback cannot jump, a forward seek plays through the sets in between and a backward seek restarts from the first set, the cost grows with the target position
+        """
+    def seek_timestamp(self, timestamp_us: int) -> int:
+        """
+        Seek to the first frame set at or after timestamp_us, returns its number. Needs the index and costs a seek to that number
+        """
+    def tell(self) -> int:
+        """
+        Number of the frame set the next read returns
+        """
 class PointCloudFilter(Filter):
     def __init__(self) -> None:
         ...
@@ -3461,6 +3516,10 @@ class VideoFrame(Frame):
         ...
     def as_points_frame(self) -> ...:
         ...
+    def get_data_view(self) -> numpy.ndarray:
+        """
+        Get a read-only view of the frame data without copying, shaped (height, width) uint16 for depth/IR and (height, width, channels) uint8 for packed color formats, compressed formats stay flat
+        """
     def get_height(self) -> int:
         ...
     def get_metadata(self) -> numpy.ndarray[numpy.uint8]:
@@ -3486,17 +3545,37 @@ class VideoStreamProfile(StreamProfile):
         ...
     def get_width(self) -> int:
         ...
+def calibration_2d_to_2d_array(arg0: OBCalibrationParam, arg1: numpy.ndarray[numpy.float32], arg2: numpy.ndarray[numpy.float32], arg3: OBSensorType, arg4: OBSensorType) -> numpy.ndarray[numpy.float32]:
+    """
+    Map (N, 2) pixels with (N,) depth values into the target sensor image, e.g. depth to color, returns (N, 2) float32 pixels, NaN where the mapping failed
+    """
 def calibration_2d_to_3d(arg0: OBCalibrationParam, arg1: OBPoint2f, arg2: float, arg3: OBSensorType, arg4: OBSensorType) -> OBPoint:
     ...
+def calibration_2d_to_3d_array(arg0: OBCalibrationParam, arg1: numpy.ndarray[numpy.float32], arg2: numpy.ndarray[numpy.float32], arg3: OBSensorType, arg4: OBSensorType) -> numpy.ndarray[numpy.float32]:
+    """
+    Unproject (N, 2) pixels with (N,) depth values into the target sensor, returns (N, 3) float32, NaN where the mapping failed
+    """
 def calibration_2d_to_3d_undistortion(arg0: OBCalibrationParam, arg1: OBPoint2f, arg2: float, arg3: OBSensorType, arg4: OBSensorType) -> OBPoint:
     ...
+def calibration_2d_to_3d_undistortion_array(arg0: OBCalibrationParam, arg1: numpy.ndarray[numpy.float32], arg2: numpy.ndarray[numpy.float32], arg3: OBSensorType, arg4: OBSensorType) -> numpy.ndarray[numpy.float32]:
+    """
+    calibration_2d_to_3d_array with lens undistortion of the source pixels
+    """
 @typing.overload
 def calibration_3d_to_2d(arg0: OBCalibrationParam, arg1: OBPoint, arg2: OBSensorType, arg3: OBSensorType) -> OBPoint2f:
     ...
 @typing.overload
 def calibration_3d_to_2d(arg0: OBCalibrationParam, arg1: OBPoint, arg2: OBSensorType, arg3: OBSensorType) -> OBPoint2f:
     ...
+def calibration_3d_to_2d_array(arg0: OBCalibrationParam, arg1: numpy.ndarray[numpy.float32], arg2: OBSensorType, arg3: OBSensorType) -> numpy.ndarray[numpy.float32]:
+    """
+    Project (N, 3) points into the target sensor image, returns (N, 2) float32 pixels, NaN where the projection failed
+    """
 def calibration_3d_to_3d(arg0: OBCalibrationParam, arg1: OBPoint, arg2: OBSensorType, arg3: OBSensorType) -> OBPoint:
     ...
+def calibration_3d_to_3d_array(arg0: OBCalibrationParam, arg1: numpy.ndarray[numpy.float32], arg2: OBSensorType, arg3: OBSensorType) -> numpy.ndarray[numpy.float32]:
+    """
+    Map (N, 3) points between sensor coordinate systems, returns (N, 3) float32, NaN where the mapping failed
+    """
 def get_version() -> str:
     ...
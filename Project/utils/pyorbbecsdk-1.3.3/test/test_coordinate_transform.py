@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from pyorbbecsdk import *
+
+
+def make_intrinsic(fx, fy, cx, cy, width, height):
+    intrinsic = OBCameraIntrinsic()
+    intrinsic.fx, intrinsic.fy, intrinsic.cx, intrinsic.cy = fx, fy, cx, cy
+    intrinsic.width, intrinsic.height = width, height
+    return intrinsic
+
+
+def make_transform(rot, trans):
+    transform = OBD2CTransform()
+    transform.rot = np.asarray(rot, dtype=np.float32)
+    transform.transform = np.asarray(trans, dtype=np.float32)
+    return transform
+
+
+class CoordinateTransformArrayTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        depth, color = int(OBSensorType.DEPTH_SENSOR), int(OBSensorType.COLOR_SENSOR)
+        self.param = OBCalibrationParam()
+        self.param.set_intrinsic(depth, make_intrinsic(504.0, 504.0, 320.0, 288.0, 640, 576))
+        self.param.set_intrinsic(color, make_intrinsic(1123.0, 1123.0, 960.0, 540.0, 1920, 1080))
+        self.param.set_distortion(depth, OBCameraDistortion())
+        self.param.set_distortion(color, OBCameraDistortion())
+        self.param.set_extrinsic(depth, color, make_transform(np.eye(3), [-32.0, 1.5, 2.0]))
+        self.param.set_extrinsic(color, depth, make_transform(np.eye(3), [32.0, -1.5, -2.0]))
+        self.param.set_extrinsic(depth, depth, make_transform(np.eye(3), [0.0, 0.0, 0.0]))
+        rng = np.random.default_rng(0)
+        self.pixels = rng.uniform([0, 0], [640, 576], size=(100, 2)).astype(np.float32)
+        self.depths = rng.uniform(500, 3000, size=100).astype(np.float32)
+        self.points = rng.uniform([-500, -500, 500], [500, 500, 3000], size=(100, 3)).astype(np.float32)
+
+    def point3f(self, point):
+        result = OBPoint()
+        result.x, result.y, result.z = (float(v) for v in point)
+        return result
+
+    def point2f(self, pixel):
+        result = OBPoint2f()
+        result.x, result.y = (float(v) for v in pixel)
+        return result
+
+    def test_3d_to_3d_array_matches_single(self):
+        result = calibration_3d_to_3d_array(self.param, self.points, OBSensorType.DEPTH_SENSOR,
+                                            OBSensorType.COLOR_SENSOR)
+        self.assertEqual(result.shape, (100, 3))
+        self.assertEqual(result.dtype, np.float32)
+        for point, mapped in zip(self.points, result):
+            single = calibration_3d_to_3d(self.param, self.point3f(point), OBSensorType.DEPTH_SENSOR,
+                                          OBSensorType.COLOR_SENSOR)
+            np.testing.assert_allclose(mapped, [single.x, single.y, single.z], rtol=1e-5)
+
+    def test_3d_to_2d_array_matches_single(self):
+        result = calibration_3d_to_2d_array(self.param, self.points, OBSensorType.DEPTH_SENSOR,
+                                            OBSensorType.COLOR_SENSOR)
+        self.assertEqual(result.shape, (100, 2))
+        for point, mapped in zip(self.points, result):
+            single = calibration_3d_to_2d(self.param, self.point3f(point), OBSensorType.DEPTH_SENSOR,
+                                          OBSensorType.COLOR_SENSOR)
+            if np.isnan(mapped).any():
+                continue
+            np.testing.assert_allclose(mapped, [single.x, single.y], rtol=1e-5)
+
+    def test_2d_to_3d_array_matches_single(self):
+        result = calibration_2d_to_3d_array(self.param, self.pixels, self.depths, OBSensorType.DEPTH_SENSOR,
+                                            OBSensorType.DEPTH_SENSOR)
+        self.assertEqual(result.shape, (100, 3))
+        for pixel, depth, mapped in zip(self.pixels, self.depths, result):
+            single = calibration_2d_to_3d(self.param, self.point2f(pixel), float(depth),
+                                          OBSensorType.DEPTH_SENSOR, OBSensorType.DEPTH_SENSOR)
+            np.testing.assert_allclose(mapped, [single.x, single.y, single.z], rtol=1e-5)
+
+    def test_2d_to_2d_array_accepts_uint16_depth(self):
+        depths = self.depths.astype(np.uint16)
+        result = calibration_2d_to_2d_array(self.param, self.pixels, depths, OBSensorType.DEPTH_SENSOR,
+                                            OBSensorType.COLOR_SENSOR)
+        self.assertEqual(result.shape, (100, 2))
+        self.assertEqual(result.dtype, np.float32)
+
+    def test_rejects_wrong_shapes(self):
+        with self.assertRaises(ValueError):
+            calibration_3d_to_3d_array(self.param, self.pixels, OBSensorType.DEPTH_SENSOR,
+                                       OBSensorType.COLOR_SENSOR)
+        with self.assertRaises(ValueError):
+            calibration_2d_to_3d_array(self.param, self.pixels, self.depths[:10], OBSensorType.DEPTH_SENSOR,
+                                       OBSensorType.COLOR_SENSOR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from pyorbbecsdk import *
+
+
+class FrameTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.context = Context()
+        device_list = self.context.query_devices()
+        self.assertIsNotNone(device_list)
+        self.assertGreater(device_list.get_count(), 0)
+        self.device = device_list.get_device_by_index(0)
+        self.assertIsNotNone(self.device)
+        self.pipeline = Pipeline(self.device)
+        self.assertIsNotNone(self.pipeline)
+        config = Config()
+        profile_list = self.pipeline.get_stream_profile_list(OBSensorType.DEPTH_SENSOR)
+        config.enable_stream(profile_list.get_default_video_stream_profile())
+        self.pipeline.start(config)
+
+    def tearDown(self) -> None:
+        self.pipeline.stop()
+        self.pipeline = None
+        self.device = None
+        self.context = None
+
+    def wait_for_depth_frame(self):
+        for _ in range(100):
+            frames = self.pipeline.wait_for_frames(100)
+            if frames is not None and frames.get_depth_frame() is not None:
+                return frames
+        self.fail("No depth frame received")
+
+    def test_get_data_view(self):
+        depth_frame = self.wait_for_depth_frame().get_depth_frame()
+        view = depth_frame.get_data_view()
+        self.assertEqual(view.dtype, np.uint16)
+        self.assertEqual(view.shape, (depth_frame.get_height(), depth_frame.get_width()))
+        self.assertFalse(view.flags.writeable)
+        data = np.frombuffer(depth_frame.get_data(), dtype=np.uint16)
+        self.assertTrue(np.array_equal(view.ravel(), data[:view.size]))
+
+    def test_get_data_view_keeps_frame_alive(self):
+        depth_frame = self.wait_for_depth_frame().get_depth_frame()
+        expected = np.frombuffer(depth_frame.get_data(), dtype=np.uint16).copy()
+        view = Frame.get_data_view(depth_frame)
+        depth_frame = None
+        self.assertEqual(view.dtype, np.uint8)
+        self.assertTrue(np.array_equal(view.view(np.uint16), expected))
+
+    def test_get_point_cloud(self):
+        frames = self.wait_for_depth_frame()
+        camera_param = self.pipeline.get_camera_param()
+        points = frames.get_point_cloud(camera_param)
+        self.assertEqual(points.dtype, np.float32)
+        self.assertEqual(points.shape[1], 3)
+        valid_points = frames.get_point_cloud(camera_param, remove_zero_depth=True)
+        self.assertTrue(np.array_equal(valid_points, points[points[:, 2] != 0]))
+
+    def test_get_point_cloud_into_out(self):
+        frames = self.wait_for_depth_frame()
+        camera_param = self.pipeline.get_camera_param()
+        expected = frames.get_point_cloud(camera_param)
+        out = np.empty((expected.shape[0] + 1, 3), dtype=np.float32)
+        points = frames.get_point_cloud(camera_param, out=out)
+        self.assertEqual(points.shape, expected.shape)
+        self.assertTrue(np.array_equal(out[:expected.shape[0]], expected))
+        with self.assertRaises(ValueError):
+            frames.get_point_cloud(camera_param, out=np.empty((1, 3), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            frames.get_point_cloud(camera_param, out=np.empty(out.shape, dtype=np.float64))
+
+    def test_convert_to_points_as_array(self):
+        frames = self.wait_for_depth_frame()
+        camera_param = self.pipeline.get_camera_param()
+        points = frames.convert_to_points(camera_param, as_array=True)
+        self.assertEqual(points.dtype.names, ('x', 'y', 'z'))
+        expected = frames.get_point_cloud(camera_param)
+        self.assertEqual(points.shape, (expected.shape[0],))
+        self.assertTrue(np.array_equal(points['z'], expected[:, 2]))
+
+
+if __name__ == '__main__':
+    print("Start test Frame interface, Please make sure you have connected a device to your computer.")
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyorbbecsdk import *
+
+RECORD_FRAMES = 60
+
+
+class PlaybackReaderTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.bag_path = os.path.join(cls.temp_dir.name, "test.bag")
+        pipeline = Pipeline()
+        config = Config()
+        profile_list = pipeline.get_stream_profile_list(OBSensorType.DEPTH_SENSOR)
+        config.enable_stream(profile_list.get_default_video_stream_profile())
+        pipeline.start(config)
+        pipeline.start_recording(cls.bag_path)
+        recorded = 0
+        while recorded < RECORD_FRAMES:
+            frames = pipeline.wait_for_frames(100)
+            if frames is not None and frames.get_depth_frame() is not None:
+                recorded += 1
+        pipeline.stop_recording()
+        pipeline.stop()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.temp_dir.cleanup()
+
+    def setUp(self) -> None:
+        self.reader = PlaybackReader(self.bag_path, OBMediaType.DEPTH_STREAM, build_index=True)
+
+    def tearDown(self) -> None:
+        self.reader.close()
+        self.reader = None
+
+    def test_index_is_cached(self):
+        self.assertTrue(self.reader.has_index())
+        self.assertTrue(os.path.exists(self.bag_path + ".obindex"))
+        reopened = PlaybackReader(self.bag_path, OBMediaType.DEPTH_STREAM, build_index=False)
+        self.assertTrue(reopened.has_index())
+        self.assertEqual(len(reopened), len(self.reader))
+        reopened.close()
+
+    def test_iterates_every_frame_set(self):
+        timestamps = self.reader.get_timestamps()
+        self.assertGreater(len(timestamps), 0)
+        self.assertTrue((timestamps[1:] >= timestamps[:-1]).all())
+        read = [frames.get_depth_frame().get_timestamp_us() for frames in self.reader]
+        self.assertEqual(read, timestamps.tolist())
+
+    def test_read_frame_seeks_both_ways(self):
+        timestamps = self.reader.get_timestamps()
+        last = len(timestamps) - 1
+        for position in (last // 2, 1, last, 0):
+            frames = self.reader.read_frame(position)
+            self.assertIsNotNone(frames)
+            self.assertEqual(frames.get_depth_frame().get_timestamp_us(), timestamps[position])
+            self.assertEqual(self.reader.tell(), position + 1)
+        with self.assertRaises(IndexError):
+            self.reader.seek(len(timestamps) + 1)
+
+    def test_seek_timestamp(self):
+        timestamps = self.reader.get_timestamps()
+        position = self.reader.seek_timestamp(int(timestamps[len(timestamps) // 2]) - 1)
+        self.assertEqual(position, len(timestamps) // 2)
+        self.assertEqual(next(self.reader).get_depth_frame().get_timestamp_us(), timestamps[position])
+
+    def test_seek_farther_than_timeout(self):
+        # 60 sets play for about 2 s, far longer than the 200 ms timeout
+        timestamps = self.reader.get_timestamps()
+        last = len(timestamps) - 1
+        reader = PlaybackReader(self.bag_path, OBMediaType.DEPTH_STREAM, timeout_ms=200)
+        for position in (last, 0, last):
+            frames = reader.read_frame(position)
+            self.assertIsNotNone(frames)
+            self.assertEqual(frames.get_depth_frame().get_timestamp_us(), timestamps[position])
+        reader.close()
+
+    def test_list_without_index(self):
+        bag_path = os.path.join(self.temp_dir.name, "unindexed.bag")
+        shutil.copyfile(self.bag_path, bag_path)
+        reader = PlaybackReader(bag_path, OBMediaType.DEPTH_STREAM)
+        self.assertFalse(reader.has_index())
+        with self.assertRaises(TypeError):
+            len(reader)
+        read = [frames.get_depth_frame().get_timestamp_us() for frames in list(reader)]
+        self.assertEqual(read, self.reader.get_timestamps().tolist())
+        reader.close()
+
+
+if __name__ == '__main__':
+    print("Start test PlaybackReader, Please make sure you have connected a device to your computer.")
+    unittest.main()